@@ -1,2 +1,24 @@
+import importlib
+
 __all__ = ['m3d', 'quat', 'rbt', 'sphcoord', 'texfunc', 'pfmimg', 'ppmimg', 'pagedfile',
-    'numpyext', 'cspace', 'lrudict', 'meshproc', 'plyfile', 'polygonsoup', 'ransac', 'linkedlist']
\ No newline at end of file
+  'numpyext', 'cspace', 'lrudict', 'meshproc', 'plyfile', 'polygonsoup', 'ransac', 'linkedlist',
+  'linearfitting', 'transformtree', 'camerapath', 'viewcamera', 'jsonstream', 'sfmdata',
+  'sfmcameras', 'sfmgraph', 'sfmproject', 'sfmresidual', 'viewindex', 'triangulation',
+  'bundleadjust', 'sfmmerge', 'sfmbatch']
+
+# submodules are imported on first attribute access, so that importing vcpy does not load
+# numba, scipy, lz4 or bson
+def __getattr__(name):
+  if name.startswith('_'):
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+  try:
+    module = importlib.import_module('.' + name, __name__)
+  except ModuleNotFoundError as e:
+    if e.name != __name__ + '.' + name:
+      raise
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name)) from None
+  globals()[name] = module
+  return module
+
+def __dir__():
+  return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,354 @@
+import numpy as np
+from scipy import sparse
+from scipy.linalg import cho_factor, cho_solve
+from scipy.sparse.linalg import spsolve
+from scipy.spatial.transform import Rotation
+from vcpy.sfmdata import Intrinsics, Tracks
+
+# number of distortion parameters refined per model, PBA is not supported
+_NUM_DISTORTIONS = {
+  Intrinsics.NoDistortion: 0,
+  Intrinsics.DistortionRadial1: 1,
+  Intrinsics.DistortionRadial3: 3,
+  Intrinsics.DistortionRadial3Brown2: 5
+}
+
+def _skew(v):
+  result = np.zeros(v.shape[:-1] + (3, 3))
+  result[..., 0, 1] = -v[..., 2]
+  result[..., 0, 2] = v[..., 1]
+  result[..., 1, 0] = v[..., 2]
+  result[..., 1, 2] = -v[..., 0]
+  result[..., 2, 0] = -v[..., 1]
+  result[..., 2, 1] = v[..., 0]
+  return result
+
+# left jacobian of SO(3) for rotation vectors phi: [n, 3]
+def _left_jacobian(phi):
+  theta2 = np.sum(phi * phi, axis=1)
+  theta = np.sqrt(theta2)
+  small = theta < 1e-6
+  safe = np.where(small, 1.0, theta)
+  a = np.where(small, 0.5 - theta2 / 24.0, (1.0 - np.cos(safe)) / safe ** 2)
+  b = np.where(small, 1.0 / 6.0 - theta2 / 120.0, (safe - np.sin(safe)) / safe ** 3)
+  K = _skew(phi)
+  return np.identity(3) + a[:, None, None] * K + b[:, None, None] * (K @ K)
+
+# BundleProblem holds the observations of a SfMData and the layout of the parameter vector:
+# intrinsics [fx, fy, cx, cy, distortions...], poses [rotation vector, center] and landmarks X.
+# Rotations are refined as R0 exp(r) around the initial camera frame rotation R0.
+class BundleProblem:
+  def __init__(self, sfm_data, refine_intrinsics=True, refine_poses=True, refine_structure=True,
+      min_views=2):
+    self.sfm_data = sfm_data
+    self.refine_intrinsics = refine_intrinsics
+    self.refine_poses = refine_poses
+    self.refine_structure = refine_structure
+    tracks = sfm_data.tracks
+    self.tracks = tracks
+    view_arrays = sfm_data.view_arrays()
+    self.intrinsics = view_arrays.intrinsics
+    for intrin in self.intrinsics:
+      if intrin.distortion_type not in _NUM_DISTORTIONS:
+        raise RuntimeError('Distortion type {} unsupported'.format(intrin.distortion_type))
+
+    # views sharing an Extrinsic share its parameters
+    self.poses = []
+    pose_index = {}
+    view_pose_index = np.full(len(view_arrays.view_ids), -1, dtype=np.int64)
+    for i, view_id in enumerate(view_arrays.view_ids.tolist()):
+      pose = sfm_data.views[view_id].pose
+      if view_arrays.valid[i]:
+        if id(pose) not in pose_index:
+          pose_index[id(pose)] = len(self.poses)
+          self.poses.append(pose)
+        view_pose_index[i] = pose_index[id(pose)]
+
+    view_index = view_arrays.index_of(tracks.view_ids)
+    landmark_index = tracks.landmark_index()
+    usable = view_arrays.valid[view_index]
+    lengths = np.bincount(landmark_index[usable], minlength=tracks.num_landmarks())
+    usable &= lengths[landmark_index] >= min_views
+    # refined landmarks and their positions in tracks
+    self.landmarks = np.flatnonzero(lengths >= min_views)
+    self.obs_landmark = np.searchsorted(self.landmarks, landmark_index[usable])
+    self.obs_intrinsic = view_arrays.intrinsic_index[view_index[usable]]
+    self.obs_pose = view_pose_index[view_index[usable]]
+    self.x = tracks.x[usable]
+
+    self.rotations0 = np.array([pose.camera_frame[:3, :3] for pose in self.poses],
+      dtype=float).reshape((-1, 3, 3))
+    self.centers0 = np.array([pose.camera_frame[:3, 3] for pose in self.poses],
+      dtype=float).reshape((-1, 3))
+    self.X0 = tracks.X[self.landmarks]
+    self.num_distortions = np.array([_NUM_DISTORTIONS[intrin.distortion_type]
+      for intrin in self.intrinsics], dtype=np.int64)
+    self.intrinsics0 = np.zeros((len(self.intrinsics), 9))
+    for i, intrin in enumerate(self.intrinsics):
+      self.intrinsics0[i, :4] = [intrin.fx, intrin.fy, intrin.cx, intrin.cy]
+      self.intrinsics0[i, 4:4 + self.num_distortions[i]] = intrin.distortions[:self.num_distortions[i]]
+
+    num_intrinsic_params = 4 + self.num_distortions
+    self.intrinsic_offsets = np.concatenate(([0], np.cumsum(num_intrinsic_params)))
+    self.num_intrinsic_params = int(self.intrinsic_offsets[-1]) if refine_intrinsics else 0
+    self.num_pose_params = 6 * len(self.poses) if refine_poses else 0
+    self.num_structure_params = 3 * len(self.landmarks) if refine_structure else 0
+
+  def num_params(self):
+    return self.num_intrinsic_params + self.num_pose_params + self.num_structure_params
+
+  def num_residuals(self):
+    return 2 * self.x.shape[0]
+
+  def x0(self):
+    intrinsics = [self.intrinsics0[i, :n] for i, n in enumerate(self.intrinsic_offsets[1:] -
+      self.intrinsic_offsets[:-1])] if self.refine_intrinsics else []
+    poses = [np.zeros(3 * len(self.poses)), self.centers0] if self.refine_poses else []
+    structure = [self.X0] if self.refine_structure else []
+    return np.concatenate([np.ravel(a) for a in intrinsics + poses + structure] + [np.zeros(0)])
+
+  # params -> ([n, 9] padded intrinsics, [p, 3] rotation vectors, [p, 3] centers, [l, 3] X)
+  def unpack(self, params):
+    intrinsics = self.intrinsics0
+    rotvecs = np.zeros((len(self.poses), 3))
+    centers = self.centers0
+    X = self.X0
+    k = 0
+    if self.refine_intrinsics:
+      intrinsics = np.zeros_like(self.intrinsics0)
+      for i in range(len(self.intrinsics)):
+        start, end = self.intrinsic_offsets[i], self.intrinsic_offsets[i + 1]
+        intrinsics[i, :end - start] = params[start:end]
+      k += self.num_intrinsic_params
+    if self.refine_poses:
+      poses = params[k:k + self.num_pose_params].reshape((2, -1, 3))
+      rotvecs, centers = poses[0], poses[1]
+      k += self.num_pose_params
+    if self.refine_structure:
+      X = params[k:k + self.num_structure_params].reshape((-1, 3))
+    return intrinsics, rotvecs, centers, X
+
+  def rotations(self, rotvecs):
+    return self.rotations0 @ Rotation.from_rotvec(rotvecs).as_matrix()
+
+  # returns [2k] residuals in pixels and, with jacobian, the [2k, num_params] sparse jacobian
+  def evaluate(self, params, jacobian=False):
+    intrinsics, rotvecs, centers, X = self.unpack(params)
+    R = self.rotations(rotvecs)[self.obs_pose]
+    K = intrinsics[self.obs_intrinsic]
+    f, c, d = K[:, :2], K[:, 2:4], K[:, 4:]
+    p = X[self.obs_landmark] - centers[self.obs_pose]
+    v = np.einsum('kji,kj->ki', R, p)
+    u = v[:, :2] / v[:, 2:]
+
+    # Brown with zero padded coefficients covers every supported model
+    x, y = u[:, 0], u[:, 1]
+    r2 = x * x + y * y
+    coeff = 1.0 + r2 * (d[:, 0] + r2 * (d[:, 1] + r2 * d[:, 2]))
+    t1, t2 = d[:, 3], d[:, 4]
+    distorted = np.column_stack((x * coeff + t2 * (r2 + 2.0 * x * x) + 2.0 * t1 * x * y,
+      y * coeff + t1 * (r2 + 2.0 * y * y) + 2.0 * t2 * x * y))
+    residuals = (f * distorted + c - self.x).ravel()
+    if not jacobian:
+      return residuals
+
+    num_obs = self.x.shape[0]
+    blocks = []
+    if self.refine_intrinsics:
+      J = np.zeros((num_obs, 2, 9))
+      J[:, 0, 0] = distorted[:, 0]
+      J[:, 1, 1] = distorted[:, 1]
+      J[:, 0, 2] = 1.0
+      J[:, 1, 3] = 1.0
+      J[:, :, 4] = u * r2[:, None]
+      J[:, :, 5] = u * (r2 * r2)[:, None]
+      J[:, :, 6] = u * (r2 * r2 * r2)[:, None]
+      J[:, :, 7] = np.column_stack((2.0 * x * y, r2 + 2.0 * y * y))
+      J[:, :, 8] = np.column_stack((r2 + 2.0 * x * x, 2.0 * x * y))
+      J[:, :, 4:] *= f[:, :, None]
+      num_params = 4 + self.num_distortions[self.obs_intrinsic]
+      cols = self.intrinsic_offsets[self.obs_intrinsic][:, None] + np.arange(9)
+      blocks.append((J, cols, np.arange(9) < num_params[:, None]))
+
+    if self.refine_poses or self.refine_structure:
+      dcoeff = d[:, 0] + r2 * (2.0 * d[:, 1] + 3.0 * r2 * d[:, 2])
+      J_du = np.empty((num_obs, 2, 2))
+      J_du[:, 0, 0] = coeff + 2.0 * x * x * dcoeff + 6.0 * t2 * x + 2.0 * t1 * y
+      J_du[:, 0, 1] = 2.0 * x * y * dcoeff + 2.0 * t2 * y + 2.0 * t1 * x
+      J_du[:, 1, 0] = 2.0 * x * y * dcoeff + 2.0 * t1 * x + 2.0 * t2 * y
+      J_du[:, 1, 1] = coeff + 2.0 * y * y * dcoeff + 6.0 * t1 * y + 2.0 * t2 * x
+      J_uv = np.zeros((num_obs, 2, 3))
+      J_uv[:, 0, 0] = 1.0 / v[:, 2]
+      J_uv[:, 1, 1] = 1.0 / v[:, 2]
+      J_uv[:, :, 2] = -u / v[:, 2:]
+      J_pv = f[:, :, None] * (J_du @ J_uv)
+      J_point = J_pv @ np.transpose(R, (0, 2, 1))
+      all_cols = np.ones((num_obs, 1), dtype=bool)
+
+      if self.refine_poses:
+        # v = exp(-r) R0^T p, so dv/dr = [v]x J_l(-r)
+        J_rot = J_pv @ _skew(v) @ _left_jacobian(-rotvecs)[self.obs_pose]
+        rot_cols = self.num_intrinsic_params + 3 * self.obs_pose[:, None] + np.arange(3)
+        center_cols = rot_cols + 3 * len(self.poses)
+        blocks.append((J_rot, rot_cols, all_cols))
+        blocks.append((-J_point, center_cols, all_cols))
+      if self.refine_structure:
+        point_cols = (self.num_intrinsic_params + self.num_pose_params +
+          3 * self.obs_landmark[:, None] + np.arange(3))
+        blocks.append((J_point, point_cols, all_cols))
+
+    rows, cols, values = [], [], []
+    for J, block_cols, mask in blocks:
+      mask = np.broadcast_to(mask[:, None, :], J.shape)
+      rows.append(np.broadcast_to((2 * np.arange(num_obs)[:, None] + np.arange(2))[:, :, None],
+        J.shape)[mask])
+      cols.append(np.broadcast_to(block_cols[:, None, :], J.shape)[mask])
+      values.append(J[mask])
+    if not blocks:
+      return residuals, sparse.csr_matrix((self.num_residuals(), self.num_params()))
+    return residuals, sparse.csr_matrix((np.concatenate(values),
+      (np.concatenate(rows), np.concatenate(cols))), shape=(self.num_residuals(), self.num_params()))
+
+  # writes params back into the Intrinsics, Extrinsic and tracks of sfm_data
+  def apply(self, params):
+    intrinsics, rotvecs, centers, X = self.unpack(params)
+    if self.refine_intrinsics:
+      for i, intrin in enumerate(self.intrinsics):
+        intrin.fx, intrin.fy, intrin.cx, intrin.cy = intrinsics[i, :4].tolist()
+        intrin.distortions = intrinsics[i, 4:4 + self.num_distortions[i]].tolist()
+    if self.refine_poses:
+      rotations = self.rotations(rotvecs)
+      for i, pose in enumerate(self.poses):
+        camera_frame = pose.camera_frame.copy()
+        camera_frame[:3, :3] = rotations[i]
+        camera_frame[:3, 3] = centers[i]
+        pose.camera_frame = camera_frame
+    if self.refine_structure:
+      tracks = self.tracks
+      new_X = np.array(tracks.X, dtype=float)
+      new_X[self.landmarks] = X
+      self.sfm_data.tracks = Tracks(tracks.landmark_ids, new_X, tracks.offsets, tracks.view_ids,
+        tracks.feat_ids, tracks.x)
+    else:
+      self.sfm_data.invalidate_caches()
+
+# reweighting factors per observation, applied to both residual rows: ([k] weights, robust cost)
+def _robust_weights(residuals, loss, f_scale):
+  e2 = np.sum(residuals.reshape((-1, 2)) ** 2, axis=1)
+  if loss == 'linear':
+    return np.ones_like(e2), float(np.sum(e2))
+  elif loss == 'huber':
+    e = np.sqrt(e2)
+    inlier = e <= f_scale
+    weights = np.where(inlier, 1.0, f_scale / np.maximum(e, f_scale))
+    return weights, float(np.sum(np.where(inlier, e2, 2.0 * f_scale * e - f_scale * f_scale)))
+  raise RuntimeError('Unknown loss {}'.format(loss))
+
+# [l, 3, 3] diagonal blocks of a block diagonal sparse matrix
+def _diagonal_blocks(matrix):
+  n = matrix.shape[0] // 3
+  result = np.zeros((n, 3, 3))
+  for k in range(-2, 3):
+    diagonal = matrix.diagonal(k)
+    for i in range(max(0, -k), min(3, 3 - k)):
+      result[:, i, i + k] = diagonal[3 * np.arange(n) + min(i, i + k)]
+  return result
+
+# the reduced camera system is solved densely when it is small or mostly filled in,
+# shared intrinsics and wide covisibility fill it quickly
+_DENSE_SOLVE_SIZE = 2000
+_DENSE_SOLVE_DENSITY = 0.05
+
+# S: symmetric positive definite sparse matrix
+def _solve_spd(S, b):
+  n = S.shape[0]
+  if n <= _DENSE_SOLVE_SIZE or S.nnz >= _DENSE_SOLVE_DENSITY * n * n:
+    return cho_solve(cho_factor(S.toarray()), b)
+  return spsolve(S.tocsc(), b, permc_spec='MMD_AT_PLUS_A')
+
+# blocks of the normal equations H = J^T J split into camera and landmark parameters:
+# (U camera x camera, W camera x landmark, [l, 3, 3] landmark diagonal blocks V)
+def _normal_blocks(J, num_camera_params):
+  Jc = J[:, :num_camera_params].tocsc()
+  Jp = J[:, num_camera_params:].tocsc()
+  U = (Jc.T @ Jc).tocsr()
+  W = (Jc.T @ Jp).tocsr()
+  V = _diagonal_blocks(Jp.T @ Jp) if Jp.shape[1] else None
+  return U, W, V
+
+# solves (H + lam diag(H)) delta = g, eliminating the landmarks with the Schur complement
+def _solve_damped(blocks, g, lam):
+  U, W, V = blocks
+  num_camera_params = U.shape[0]
+  U = U + sparse.diags(lam * np.maximum(U.diagonal(), 1e-12))
+  if V is None:
+    return _solve_spd(U, g)
+  diagonal = np.arange(3)
+  V = V.copy()
+  V[:, diagonal, diagonal] += lam * np.maximum(V[:, diagonal, diagonal], 1e-12)
+  num_landmarks = V.shape[0]
+  V_inv = sparse.bsr_matrix((np.linalg.inv(V), np.arange(num_landmarks),
+    np.arange(num_landmarks + 1)), shape=(3 * num_landmarks, 3 * num_landmarks))
+  g_c, g_p = g[:num_camera_params], g[num_camera_params:]
+  if num_camera_params == 0:
+    return V_inv @ g_p
+  T = W @ V_inv
+  delta_c = _solve_spd(U - T @ W.T, g_c - T @ g_p)
+  return np.concatenate((delta_c, V_inv @ (g_p - W.T @ delta_c)))
+
+# BundleResult: initial and final robust cost (sum of squared pixel residuals for the linear
+# loss), number of iterations and whether the relative cost decrease fell below ftol
+class BundleResult:
+  def __init__(self, initial_cost, cost, iterations, converged, num_observations):
+    self.initial_cost = initial_cost
+    self.cost = cost
+    self.iterations = iterations
+    self.converged = converged
+    self.num_observations = num_observations
+
+  def rms(self):
+    return float(np.sqrt(self.cost / max(self.num_observations, 1)))
+
+# refines intrinsics, poses and landmark positions of sfm_data in place by minimizing the
+# reprojection error with Levenberg-Marquardt, analytic sparse jacobians and a Schur complement
+# over the landmarks. Observations of landmarks seen by less than min_views posed views are
+# left out. loss: 'linear' or 'huber' with f_scale pixels, solved by reweighting.
+def bundle_adjust(sfm_data, refine_intrinsics=True, refine_poses=True, refine_structure=True,
+    min_views=2, loss='linear', f_scale=1.0, max_iterations=50, ftol=1e-8):
+  problem = BundleProblem(sfm_data, refine_intrinsics, refine_poses, refine_structure, min_views)
+  params = problem.x0()
+  if params.shape[0] == 0 or problem.num_residuals() == 0:
+    raise RuntimeError('Nothing to refine')
+  num_camera_params = problem.num_intrinsic_params + problem.num_pose_params
+
+  _, cost = _robust_weights(problem.evaluate(params), loss, f_scale)
+  initial_cost = cost
+  lam = 1e-4
+  converged = False
+  iterations = 0
+  while iterations < max_iterations and not converged:
+    iterations += 1
+    residuals, J = problem.evaluate(params, True)
+    weights, _ = _robust_weights(residuals, loss, f_scale)
+    sqrt_w = np.repeat(np.sqrt(weights), 2)
+    Jw = sparse.diags(sqrt_w) @ J
+    g = Jw.T @ (sqrt_w * residuals)
+    blocks = _normal_blocks(Jw, num_camera_params)
+    while True:
+      try:
+        candidate = params - _solve_damped(blocks, g, lam)
+        _, candidate_cost = _robust_weights(problem.evaluate(candidate), loss, f_scale)
+      except np.linalg.LinAlgError:
+        candidate_cost = np.inf
+      if np.isfinite(candidate_cost) and candidate_cost < cost:
+        converged = (cost - candidate_cost) <= ftol * cost
+        params, cost = candidate, candidate_cost
+        lam = max(lam / 10.0, 1e-12)
+        break
+      lam *= 10.0
+      if lam > 1e12:
+        converged = True
+        break
+
+  problem.apply(params)
+  return BundleResult(initial_cost, cost, iterations, converged, problem.x.shape[0])
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from vcpy.sfmdata import Intrinsics, Tracks
+from vcpy.sfmresidual import reprojection_errors
+from vcpy.bundleadjust import BundleProblem, bundle_adjust
+from vcpy.sfmdata_test import make_scene
+
+class TestBundleAdjust(unittest.TestCase):
+  def test_jacobian_matches_finite_differences(self):
+    sfm_data = make_scene(num_views=4, num_landmarks=15, seed=2)
+    intrin = sfm_data.intrinsics[0]
+    intrin.distortion_type = Intrinsics.DistortionRadial3Brown2
+    intrin.distortions = [0.01, -0.002, 0.0005, 0.001, -0.002]
+    problem = BundleProblem(sfm_data)
+    params = problem.x0() + np.random.default_rng(0).normal(0.0, 0.01, problem.num_params())
+    _, J = problem.evaluate(params, True)
+    numeric = np.zeros(J.shape)
+    for i in range(params.shape[0]):
+      step = np.zeros_like(params)
+      step[i] = 1e-6 * max(1.0, abs(params[i]))
+      numeric[:, i] = (problem.evaluate(params + step) - problem.evaluate(params - step)) / (2.0 * step[i])
+    np.testing.assert_allclose(J.toarray(), numeric, atol=1e-5 * np.abs(numeric).max())
+
+  def test_recovers_perturbed_scene(self):
+    sfm_data = make_scene(num_views=6, num_landmarks=200, seed=4)
+    rms = reprojection_errors(sfm_data).rms()
+    rng = np.random.default_rng(1)
+    for extrin in sfm_data.extrinsics.values():
+      extrin.camera_frame[:3, 3] += rng.normal(0.0, 0.02, 3)
+    sfm_data.intrinsics[0].fx *= 1.01
+    tracks = sfm_data.tracks
+    sfm_data.tracks = Tracks(tracks.landmark_ids, tracks.X + rng.normal(0.0, 0.01, tracks.X.shape),
+      tracks.offsets, tracks.view_ids, tracks.feat_ids, tracks.x)
+    self.assertGreater(reprojection_errors(sfm_data).rms(), 3.0 * rms)
+
+    result = bundle_adjust(sfm_data, max_iterations=10)
+    self.assertLess(result.cost, result.initial_cost)
+    self.assertLess(result.rms(), rms)
+    # observations of single view tracks are left out of the adjustment
+    self.assertLess(reprojection_errors(sfm_data).rms(), 1.5 * rms)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,103 @@
+import numpy as np
+from vcpy.quat import QuatArray
+
+# CameraPath interpolates keyframe camera frames (camera to world) and frustum parameters.
+# Rotations use squad (or slerp) and translations a Catmull-Rom style cubic Hermite spline
+# over the keyframe times, frustum parameters are interpolated linearly.
+# rotations: [k, 4] keyframe quaternions, made sign continuous
+# translations: [k, 3] keyframe camera centers
+# frustums: [k, m] keyframe frustum parameters, e.g. (left, right, bottom, top, near, far)
+# times: [k] strictly increasing keyframe times
+class CameraPath:
+  def __init__(self, rotations, translations, frustums, times=None, method='squad'):
+    rotations = np.asarray(rotations, dtype=float).reshape((-1, 4))
+    if rotations.shape[0] < 2:
+      raise RuntimeError('Camera path needs at least 2 keyframes')
+    if method not in ('squad', 'slerp'):
+      raise RuntimeError('Unsupported rotation interpolation {}'.format(method))
+    rotations = rotations / np.linalg.norm(rotations, axis=-1, keepdims=True)
+    self.rotations = QuatArray.continuous(QuatArray(rotations)).v
+    self.translations = np.asarray(translations, dtype=float).reshape((-1, 3))
+    self.frustums = np.asarray(frustums, dtype=float).reshape((rotations.shape[0], -1))
+    if times is None:
+      times = np.arange(rotations.shape[0], dtype=float)
+    self.times = np.asarray(times, dtype=float).reshape(-1)
+    if self.times.shape[0] != rotations.shape[0]:
+      raise RuntimeError('Camera path needs one time per keyframe')
+    if not np.all(np.diff(self.times) > 0):
+      raise RuntimeError('Camera path keyframe times must be strictly increasing')
+    self.method = method
+
+    # squad inner control quaternions
+    self.controls = QuatArray.squad_controls(QuatArray(self.rotations)).v
+
+    # translation tangents, central differences inside and one sided at the ends
+    self.tangents = np.gradient(self.translations, self.times, axis=0)
+
+  @staticmethod
+  def from_rbts(rbts, frustums, times=None, method='squad'):
+    return CameraPath([rbt.r.v for rbt in rbts], [rbt.t for rbt in rbts], frustums, times, method)
+
+  # keyframes from a ViewCameras, frustums are (left, right, bottom, top, znear, zfar)
+  @staticmethod
+  def from_view_cameras(view_cameras, times=None, method='squad'):
+    frames = np.linalg.inv(view_cameras.view_mats)
+    rotations = QuatArray.from_mat(frames).v
+    frustums = np.column_stack((view_cameras.frustums, view_cameras.znear, view_cameras.zfar))
+    return CameraPath(rotations, frames[:, :3, 3], frustums, times, method)
+
+  # frame_times: [n], returns ([n, 4, 4] camera frames, [n, m] frustums)
+  def frames(self, frame_times):
+    frame_times = np.asarray(frame_times, dtype=float).reshape(-1)
+    segment = np.clip(np.searchsorted(self.times, frame_times, side='right') - 1, 0,
+      len(self.times) - 2)
+    dt = self.times[segment + 1] - self.times[segment]
+    h = np.clip((frame_times - self.times[segment]) / dt, 0.0, 1.0)
+
+    q0 = QuatArray(self.rotations[segment])
+    q1 = QuatArray(self.rotations[segment + 1])
+    if self.method == 'squad':
+      rotations = QuatArray.squad(q0, q1, QuatArray(self.controls[segment]),
+        QuatArray(self.controls[segment + 1]), h)
+    else:
+      rotations = QuatArray.slerp(q0, q1, h)
+
+    h2 = h * h
+    h3 = h2 * h
+    p = ((2 * h3 - 3 * h2 + 1)[:, None] * self.translations[segment] +
+      ((h3 - 2 * h2 + h) * dt)[:, None] * self.tangents[segment] +
+      (-2 * h3 + 3 * h2)[:, None] * self.translations[segment + 1] +
+      ((h3 - h2) * dt)[:, None] * self.tangents[segment + 1])
+
+    frames = np.zeros((frame_times.shape[0], 4, 4))
+    frames[:, :3, :3] = rotations.to_mat3()
+    frames[:, :3, 3] = p
+    frames[:, 3, 3] = 1.0
+    frustums = (self.frustums[segment] * (1.0 - h)[:, None] +
+      self.frustums[segment + 1] * h[:, None])
+    return frames, frustums
+
+  # frame_times: [n], returns ([n, 4, 4] view matrices, [n, m] frustums)
+  def view_mats(self, frame_times):
+    frames, frustums = self.frames(frame_times)
+    rotations = np.swapaxes(frames[:, :3, :3], 1, 2)
+    result = np.zeros_like(frames)
+    result[:, :3, :3] = rotations
+    result[:, :3, 3] = -np.einsum('nij,nj->ni', rotations, frames[:, :3, 3])
+    result[:, 3, 3] = 1.0
+    return result, frustums
+
+  # num_frames evenly spaced frame times from the first to the last keyframe
+  def frame_times(self, num_frames):
+    return np.linspace(self.times[0], self.times[-1], num_frames)
+
+  def sample(self, num_frames):
+    return self.view_mats(self.frame_times(num_frames))
+
+  # yields (view matrices, frustums) for batch_size frames at a time, so that very long
+  # paths are never held in memory at once
+  def iter_frames(self, num_frames, batch_size=4096):
+    for start in range(0, num_frames, batch_size):
+      stop = min(start + batch_size, num_frames)
+      t = np.arange(start, stop, dtype=float) / max(num_frames - 1, 1)
+      yield self.view_mats(self.times[0] + t * (self.times[-1] - self.times[0]))
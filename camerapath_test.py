@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from vcpy.quat import Quat
+from vcpy.rbt import Rbt
+from vcpy.camerapath import CameraPath
+from vcpy.viewcamera import ViewCamera, ViewCameras
+
+def make_keyframes(num_keyframes, seed=0):
+  rng = np.random.default_rng(seed)
+  rbts = [Rbt(rng.normal(size=3), Quat.normalize(Quat(rng.normal(size=4))))
+    for _ in range(num_keyframes)]
+  frustums = rng.uniform(0.5, 1.0, size=(num_keyframes, 6))
+  return rbts, frustums
+
+class TestCameraPath(unittest.TestCase):
+  def test_keyframes(self):
+    rbts, frustums = make_keyframes(5)
+    times = np.array([0.0, 1.0, 1.5, 4.0, 5.0])
+    path = CameraPath.from_rbts(rbts, frustums, times)
+    frames, path_frustums = path.frames(times)
+    for frame, rbt in zip(frames, rbts):
+      self.assertTrue(np.allclose(frame, rbt.to_mat()))
+    self.assertTrue(np.allclose(path_frustums, frustums))
+    view_mats, _ = path.view_mats(times)
+    self.assertTrue(np.allclose(view_mats, np.linalg.inv(frames)))
+
+  def test_invalid_times(self):
+    rbts, frustums = make_keyframes(3)
+    for times in ([0.0, 1.0, 1.0], [0.0, 2.0, 1.0], [0.0, 1.0]):
+      with self.assertRaises(RuntimeError):
+        CameraPath.from_rbts(rbts, frustums, times)
+
+  def test_slerp(self):
+    rbts, frustums = make_keyframes(2)
+    q0, q1 = rbts[0].r, rbts[1].r
+    if Quat.dot(q0, q1) < 0:
+      q1 = Quat.scaled(q1, -1)
+    for method in ('slerp', 'squad'):
+      path = CameraPath.from_rbts(rbts, frustums, method=method)
+      frames, path_frustums = path.frames([0.3])
+      expected = (q0 * (Quat.inv(q0) * q1) ** 0.3).to_mat()
+      self.assertTrue(np.allclose(frames[0, :3, :3], expected[:3, :3]))
+      self.assertTrue(np.allclose(path_frustums[0], 0.7 * frustums[0] + 0.3 * frustums[1]))
+
+  def test_iter_frames(self):
+    rbts, frustums = make_keyframes(4)
+    path = CameraPath.from_rbts(rbts, frustums)
+    view_mats, path_frustums = path.sample(100)
+    batches = list(path.iter_frames(100, batch_size=32))
+    self.assertEqual(len(batches), 4)
+    self.assertTrue(np.allclose(np.concatenate([b[0] for b in batches]), view_mats))
+    self.assertTrue(np.allclose(np.concatenate([b[1] for b in batches]), path_frustums))
+
+  def test_from_view_cameras(self):
+    rbts, frustums = make_keyframes(3)
+    views = []
+    for rbt, frustum in zip(rbts, frustums):
+      view = ViewCamera()
+      view.view_mat = np.linalg.inv(rbt.to_mat())
+      view.left, view.right, view.bottom, view.top, view.znear, view.zfar = frustum
+      views.append(view)
+    path = CameraPath.from_view_cameras(ViewCameras.from_cameras(views))
+    view_mats, path_frustums = path.view_mats([0.0, 1.0, 2.0])
+    self.assertTrue(np.allclose(view_mats, [view.view_mat for view in views]))
+    self.assertTrue(np.allclose(path_frustums, frustums))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,209 @@
+import json, re
+import numpy as np
+
+_WHITESPACE = b' \t\r\n'
+_SCALAR = re.compile(rb'-?[0-9][0-9.eE+\-]*|true|false|null')
+
+# byte classes the scanner cares about: quotes, brackets and commas
+_EVENT_BYTES = np.zeros(256, dtype=bool)
+_EVENT_BYTES[[ord(c) for c in '"[]{},']] = True
+
+# Scanner tracks string and bracket nesting state over consecutive chunks of a JSON
+# document. Only quotes, brackets and commas are looked at, vectorized with numpy,
+# so that big sections can be skipped or split at C speed.
+class Scanner:
+  def __init__(self, depth=0):
+    self.depth = depth
+    self.in_string = 0
+    self.backslash_run = 0
+
+  def _escaped(self, data, p):
+    run = 0
+    while p > 0 and data[p - 1] == 92:
+      run += 1
+      p -= 1
+    if p == 0:
+      run += self.backslash_run
+    return run % 2 == 1
+
+  # returns arrays over the quote, bracket and comma bytes of data:
+  # pos: index of the byte in data
+  # char: the byte
+  # depth: nesting depth after the byte
+  # in_string: 1 if inside a string after the byte
+  # structural: byte is outside strings and is not a quote
+  def scan(self, data):
+    a = np.frombuffer(data, dtype=np.uint8)
+    pos = np.flatnonzero(_EVENT_BYTES[a])
+    char = a[pos]
+
+    quote = char == 34
+    if self.backslash_run or data.find(b'\\"') >= 0:
+      for i in np.flatnonzero(quote):
+        if self._escaped(data, pos[i]):
+          quote[i] = False
+    trailing = len(data) - len(data.rstrip(b'\\'))
+    self.backslash_run = trailing + self.backslash_run if trailing == len(data) else trailing
+
+    quote_count = np.cumsum(quote, dtype=np.int64)
+    in_string = (self.in_string + quote_count) & 1
+    structural = (((self.in_string + quote_count - quote) & 1) == 0) & ~quote
+
+    delta = np.zeros(pos.shape[0], dtype=np.int64)
+    delta[structural & ((char == 91) | (char == 123))] = 1
+    delta[structural & ((char == 93) | (char == 125))] = -1
+    depth = np.cumsum(delta)
+    depth += self.depth
+
+    if pos.shape[0]:
+      self.depth = int(depth[-1])
+      self.in_string = int(in_string[-1])
+    return pos, char, depth, in_string, structural
+
+# JsonStream reads a JSON document from a binary file incrementally.
+# Small values are decoded with json.loads, arrays can be decoded in batches of
+# elements and any value can be skipped without decoding it.
+class JsonStream:
+  def __init__(self, file, chunk_size=1 << 20):
+    self.file = file
+    self.chunk_size = chunk_size
+    self.buffer = b''
+    self.pos = 0
+    self.buffer_offset = file.tell()
+
+  # absolute file offset of the cursor
+  def tell(self):
+    return self.buffer_offset + self.pos
+
+  def seek(self, offset):
+    self.file.seek(offset)
+    self.buffer = b''
+    self.pos = 0
+    self.buffer_offset = offset
+
+  # drops the consumed part of the buffer and appends a chunk, returns the number of bytes dropped
+  # or None at EOF
+  def _fill(self):
+    chunk = self.file.read(self.chunk_size)
+    if not chunk:
+      return None
+    shift = self.pos
+    self.buffer = self.buffer[shift:] + chunk
+    self.buffer_offset += shift
+    self.pos = 0
+    return shift
+
+  def _skip_ws(self):
+    while True:
+      n = len(self.buffer)
+      while self.pos < n and self.buffer[self.pos] in _WHITESPACE:
+        self.pos += 1
+      if self.pos < n or self._fill() is None:
+        return
+
+  def peek(self):
+    self._skip_ws()
+    return self.buffer[self.pos:self.pos + 1]
+
+  def try_consume(self, token):
+    if self.peek() == token:
+      self.pos += 1
+      return True
+    return False
+
+  def expect(self, token):
+    if not self.try_consume(token):
+      raise ValueError('Expected {} at offset {}, got {}'.format(token, self.tell(), self.peek()))
+
+  # scans from the cursor until stop(pos, char, depth, in_string, structural) returns a byte
+  # index, returns the buffer index just past it; if keep is False the scanned bytes are dropped
+  def _scan_until(self, scanner, stop, keep=True):
+    scanned = self.pos
+    while True:
+      hit = stop(*scanner.scan(self.buffer[scanned:]))
+      if hit is not None:
+        return scanned + hit + 1
+      scanned = len(self.buffer)
+      if not keep:
+        self.pos = scanned
+      shift = self._fill()
+      if shift is None:
+        raise ValueError('Unexpected EOF in JSON value')
+      scanned -= shift
+
+  def _value_end(self, keep=True):
+    first = self.peek()
+    if first in (b'[', b'{'):
+      def stop(pos, char, depth, in_string, structural):
+        hits = np.flatnonzero(depth == 0)
+        return int(pos[hits[0]]) if hits.size else None
+      return self._scan_until(Scanner(), stop, keep)
+    elif first == b'"':
+      def stop(pos, char, depth, in_string, structural):
+        # the opening quote is the first event of the first chunk and leaves in_string at 1
+        hits = np.flatnonzero(in_string == 0)
+        return int(pos[hits[0]]) if hits.size else None
+      return self._scan_until(Scanner(), stop, keep)
+    else:
+      # a scalar is complete once it is followed by another byte or EOF
+      while True:
+        match = _SCALAR.match(self.buffer, self.pos)
+        if match is not None and match.end() < len(self.buffer):
+          return match.end()
+        if self._fill() is None:
+          if match is None:
+            raise ValueError('Unexpected token at offset {}'.format(self.tell()))
+          return match.end()
+
+  def read_value(self):
+    end = self._value_end()
+    result = json.loads(self.buffer[self.pos:end])
+    self.pos = end
+    return result
+
+  def skip_value(self):
+    self.pos = self._value_end(keep=False)
+
+  # yields the keys of an object, the caller must consume each value before resuming
+  def iter_object(self):
+    self.expect(b'{')
+    if self.try_consume(b'}'):
+      return
+    while True:
+      key = self.read_value()
+      self.expect(b':')
+      yield key
+      if self.try_consume(b','):
+        continue
+      self.expect(b'}')
+      return
+
+  # yields lists of decoded array elements, one list per scanned chunk, so that only
+  # a chunk worth of elements is decoded at a time
+  def iter_array(self):
+    self.expect(b'[')
+    scanner = Scanner(depth=1)
+    element_start = self.pos
+    scanned = self.pos
+    while True:
+      pos, char, depth, _, structural = scanner.scan(self.buffer[scanned:])
+      hits = np.flatnonzero(depth == 0)
+      end = int(hits[0]) if hits.size else pos.shape[0]
+      commas = np.flatnonzero(structural[:end] & (char[:end] == 44) & (depth[:end] == 1))
+      if commas.size:
+        last = scanned + int(pos[commas[-1]])
+        yield json.loads(b'[' + self.buffer[element_start:last] + b']')
+        element_start = last + 1
+      if hits.size:
+        last = scanned + int(pos[end])
+        if self.buffer[element_start:last].strip():
+          yield json.loads(b'[' + self.buffer[element_start:last] + b']')
+        self.pos = last + 1
+        return
+      scanned = len(self.buffer)
+      self.pos = element_start
+      shift = self._fill()
+      if shift is None:
+        raise ValueError('Unexpected EOF in JSON array')
+      scanned -= shift
+      element_start -= shift
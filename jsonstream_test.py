@@ -0,0 +1,42 @@
+import unittest, io, json
+from vcpy.jsonstream import JsonStream
+
+class TestJsonStream(unittest.TestCase):
+  doc = {
+    'name': 'a "quoted" \\\\ name ]}',
+    'items': [1, -2.5e-3, 'x\\\\', '"[{', {'k': [[], {}]}, None, True, False, 'é'],
+    'skipped': {'a': ['}', '\\\\"', [1, 2, {'b': 3}]]},
+    'empty': [],
+    'last': 7
+  }
+
+  def _read(self, data, chunk_size):
+    stream = JsonStream(io.BytesIO(data), chunk_size)
+    result = {}
+    for key in stream.iter_object():
+      if key in ('items', 'empty'):
+        result[key] = [element for batch in stream.iter_array() for element in batch]
+      elif key == 'skipped':
+        stream.skip_value()
+      else:
+        result[key] = stream.read_value()
+    self.assertEqual(stream.peek(), b'')
+    return result
+
+  def test_chunk_boundaries(self):
+    expected = dict(self.doc)
+    del expected['skipped']
+    for indent in (None, 2):
+      for ensure_ascii in (True, False):
+        data = json.dumps(self.doc, indent=indent, ensure_ascii=ensure_ascii).encode()
+        for chunk_size in (1, 2, 3, 5, 1 << 20):
+          self.assertEqual(self._read(data, chunk_size), expected)
+
+  def test_errors(self):
+    with self.assertRaises(ValueError):
+      self._read(b'{"items": [1, 2', 4)
+    with self.assertRaises(ValueError):
+      self._read(b'[1]', 4)
+
+if __name__ == '__main__':
+  unittest.main()
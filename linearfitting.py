@@ -1,7 +1,6 @@
 import math
 import numpy as np
-from scipy.optimize import lsq_linear
-from vcpy.quat import Quat
+from vcpy.quat import Quat, QuatArray
 
 def fit_plane(pts):
   pts = np.column_stack([pts, np.ones(pts.shape[0], dtype=pts.dtype)])
@@ -9,6 +8,8 @@ def fit_plane(pts):
   return vh[-1, :]
 
 def fit_circle(pts):
+  # scipy.optimize is slow to import and only needed here
+  from scipy.optimize import lsq_linear
   pts = np.column_stack([pts, np.ones(pts.shape[0], dtype=pts.dtype)])
   b = np.sum(pts[:, :2] ** 2, axis=1)
   circle = lsq_linear(pts, b).x
@@ -46,21 +47,14 @@ def fit_circle3(pts):
   return center, normal, radius
 
 def frame_offset(src_frames, dst_frames):
-  src_quats = [Quat.from_mat(m[:3, :3]) for m in src_frames]
-  dst_quats = [Quat.from_mat(m[:3, :3]) for m in dst_frames]
-  delta_quats = [d * Quat.inv(s) for s, d in zip(src_quats, dst_quats)]
-  for q in delta_quats:
-    if q.v[0] < 0:
-      q.scale(-1)
-
-  delta_quats = [q.v for q in delta_quats]
-  delta_quat = Quat(np.mean(delta_quats, axis=0))
-  delta_quat = Quat.normalize(delta_quat)
-
-  src_positions = [m[:, 3] for m in src_frames]
-  dst_positions = [m[:, 3] for m in dst_frames]
-  rotated_positions = [delta_quat.apply(p) for p in src_positions]
-  delta_translation = np.mean(np.array(dst_positions) - np.array(rotated_positions), axis=0)
+  src_frames = np.asarray(src_frames)
+  dst_frames = np.asarray(dst_frames)
+  src_quats = QuatArray.from_mat(src_frames)
+  dst_quats = QuatArray.from_mat(dst_frames)
+  delta_quat = QuatArray.average(QuatArray.normalize(dst_quats * QuatArray.inv(src_quats)))
+
+  rotated_positions = delta_quat.apply(src_frames[:, :, 3])
+  delta_translation = np.mean(dst_frames[:, :, 3] - rotated_positions, axis=0)
 
   result = delta_quat.to_mat()
   result[:3, 3] = delta_translation[:3]
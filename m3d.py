@@ -43,6 +43,24 @@ def gl_frustum(left, right, bottom, top, near, far):
         [0.0, 0.0, -(far + near) * inv_fmn, -2 * far * near * inv_fmn],
         [0.0, 0.0, -1.0, 0.0]])
 
+# batched gl_frustum, arguments are arrays of [n] (or broadcastable), returns [n, 4, 4]
+def gl_frustums(left, right, bottom, top, near, far):
+    left, right, bottom, top, near, far = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (left, right, bottom, top, near, far)))
+    inv_fmn = 1.0 / (far - near)
+    inv_tmb = 1.0 / (top - bottom)
+    inv_rml = 1.0 / (right - left)
+
+    result = np.zeros(left.shape + (4, 4))
+    result[..., 0, 0] = 2 * near * inv_rml
+    result[..., 0, 2] = (right + left) * inv_rml
+    result[..., 1, 1] = 2 * near * inv_tmb
+    result[..., 1, 2] = (top + bottom) * inv_tmb
+    result[..., 2, 2] = -(far + near) * inv_fmn
+    result[..., 2, 3] = -2 * far * near * inv_fmn
+    result[..., 3, 2] = -1.0
+    return result
+
 def mitsuba_frustum(left, right, bottom, top, near, far):
     inv_fmn = 1.0 / (far - near)
     inv_tmb = 1.0 / (top - bottom)
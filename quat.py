@@ -1,5 +1,6 @@
-from itertools import combinations_with_replacement
-from numpy import *
+from numpy import (arange, arccos, arctan2, argmax, array, asarray, broadcast_arrays,
+  broadcast_shapes, clip, concatenate, cos, cross, cumprod, dot, einsum, empty, hstack, identity,
+  integer, linalg, matmul, newaxis, result_type, sign, sin, sqrt, stack, tile, where, zeros)
 
 class Quat:
   def __init__(self, vals=array([1.0, 0, 0, 0])):
@@ -60,6 +61,8 @@ class Quat:
     return Quat(self.v - other.v)
 
   def __mul__(self, other):
+    if isinstance(other, QuatArray):
+      return NotImplemented
     u = self.v[1:]
     v = other.v[1:]
     result = Quat()
@@ -82,9 +85,25 @@ class Quat:
   def norm(self):
     return sqrt(dot(self.v, self.v))
 
-  def apply(self, pos):
-    r = self * (Quat(array([0, pos[0], pos[1], pos[2]])) * Quat.inv(self))
-    return array([r.v[1], r.v[2], r.v[3], pos[3]])
+  # 3x3 rotation matrix, cached until v changes
+  def rotation_mat(self):
+    key = self.v.tobytes()
+    cache = getattr(self, '_rotation_cache', None)
+    if cache is None or cache[0] != key:
+      cache = (key, self.to_mat()[:3, :3])
+      self._rotation_cache = cache
+    return cache[1]
+
+  # pos: homogeneous point [4], or points [n, 3] / homogeneous [n, 4] whose w is kept;
+  # all points are rotated with one matrix product, into out if given (may be pos)
+  def apply(self, pos, out=None):
+    pos = asarray(pos)
+    if out is None:
+      out = empty(pos.shape, dtype=result_type(pos.dtype, float))
+    if out is not pos:
+      out[..., 3:] = pos[..., 3:]
+    matmul(pos[..., :3], self.rotation_mat().T, out=out[..., :3])
+    return out
 
   def to_mat(q):
     r = identity(4)
@@ -147,6 +166,242 @@ class Quat:
       result[3] = big_val;
     return Quat(result)
 
+# QuatArray holds n quaternions in a [n, 4] array (w, x, y, z) with the semantics of Quat,
+# operations broadcast between arrays of the same length, length 1 arrays and single Quats
+class QuatArray:
+  def __init__(self, vals=array([[1.0, 0, 0, 0]])):
+    self.v = array(vals, dtype=float).reshape((-1, 4))
+
+  @classmethod
+  def identity(cls, n):
+    return QuatArray(tile(array([1.0, 0, 0, 0]), (n, 1)))
+
+  @classmethod
+  def from_quats(cls, quats):
+    return QuatArray(array([q.v for q in quats], dtype=float))
+
+  # axes: [n, 3] unit axes, angles: [n]
+  @classmethod
+  def axis_angle(cls, axes, angles):
+    half = asarray(angles, dtype=float).reshape((-1, 1)) * 0.5
+    return QuatArray(hstack((cos(half), asarray(axes, dtype=float).reshape((-1, 3)) * sin(half))))
+
+  @classmethod
+  def scaled(cls, q, s):
+    return QuatArray(q.v * asarray(s, dtype=float).reshape((-1, 1)))
+
+  @classmethod
+  def conj(cls, q):
+    return QuatArray(q.v * array([1.0, -1.0, -1.0, -1.0]))
+
+  @classmethod
+  def inv(cls, q):
+    return QuatArray(q.v * array([1.0, -1.0, -1.0, -1.0]) / q.norm2()[:, newaxis])
+
+  # [n] dot products
+  @classmethod
+  def dot(cls, q0, q1):
+    return einsum('ij,ij->i', *broadcast_arrays(q0.v, _quat_vals(q1)))
+
+  @classmethod
+  def normalize(cls, q):
+    return QuatArray(q.v / q.norm()[:, newaxis])
+
+  def __len__(self):
+    return self.v.shape[0]
+
+  # an int index returns a Quat, anything else a QuatArray
+  def __getitem__(self, index):
+    if isinstance(index, (int, integer)):
+      return Quat(self.v[index])
+    return QuatArray(self.v[index])
+
+  def __iter__(self):
+    return (Quat(v) for v in self.v)
+
+  def __str__(self):
+    return self.v.__str__()
+
+  def __add__(self, other):
+    return QuatArray(self.v + _quat_vals(other))
+
+  def __sub__(self, other):
+    return QuatArray(self.v - _quat_vals(other))
+
+  def __mul__(self, other):
+    return QuatArray(_quat_mul(self.v, _quat_vals(other)))
+
+  def __rmul__(self, other):
+    return QuatArray(_quat_mul(_quat_vals(other), self.v))
+
+  # power: scalar or [n], assumes unit quaternions like Quat.__pow__
+  def __pow__(self, power):
+    k = self.v[:, 1:]
+    nk = sqrt(einsum('ij,ij->i', k, k))
+    theta = arctan2(nk, self.v[:, 0]) * asarray(power, dtype=float)
+    # the rotation axis of an identity quaternion does not matter
+    axis = k / where(nk > 0, nk, 1.0)[:, newaxis]
+    return QuatArray(hstack((cos(theta)[:, newaxis], sin(theta)[:, newaxis] * axis)))
+
+  def scale(self, s):
+    self.v *= asarray(s, dtype=float).reshape((-1, 1))
+
+  def norm2(self):
+    return einsum('ij,ij->i', self.v, self.v)
+
+  def norm(self):
+    return sqrt(self.norm2())
+
+  # pts: [n, 3] or homogeneous [n, 4] points, the w components are kept as in Quat.apply,
+  # into out if given (may be pts); v' = v + 2 (w (u x v) + u x (u x v)) / |q|^2
+  def apply(self, pts, out=None):
+    pts = asarray(pts, dtype=float)
+    u = self.v[:, 1:]
+    uv = cross(u, pts[:, :3])
+    uuv = cross(u, uv)
+    two_over_n = (2.0 / self.norm2())[:, newaxis]
+    if out is None:
+      out = empty(broadcast_shapes(pts.shape, (len(self), pts.shape[-1])))
+    if out is not pts:
+      out[:, 3:] = pts[:, 3:]
+    out[:, :3] = pts[:, :3] + (self.v[:, :1] * uv + uuv) * two_over_n
+    return out
+
+  # log of unit quaternions, returns [n, 3] rotation axes scaled by half the rotation angle
+  def log(self):
+    k = self.v[:, 1:]
+    nk = sqrt(einsum('ij,ij->i', k, k))
+    theta = arctan2(nk, self.v[:, 0])
+    return k * where(nk > 1e-12, theta / where(nk > 1e-12, nk, 1.0), 1.0)[:, newaxis]
+
+  # inverse of log, v: [n, 3]
+  @classmethod
+  def exp(cls, v):
+    v = asarray(v, dtype=float).reshape((-1, 3))
+    theta = sqrt(einsum('ij,ij->i', v, v))
+    sinc = where(theta > 1e-12, sin(theta) / where(theta > 1e-12, theta, 1.0), 1.0)
+    return QuatArray(hstack((cos(theta)[:, newaxis], v * sinc[:, newaxis])))
+
+  # flips signs so that each quaternion is in the hemisphere of its predecessor
+  @classmethod
+  def continuous(cls, q):
+    signs = sign(einsum('ij,ij->i', q.v[1:], q.v[:-1]))
+    signs[signs == 0] = 1.0
+    return QuatArray(q.v * concatenate(([1.0], cumprod(signs)))[:, newaxis])
+
+  # q0, q1: unit quaternions, t: scalar or [n], interpolates along the shorter arc;
+  # shortest=False interpolates between q0 and q1 as given, as squad needs
+  @classmethod
+  def slerp(cls, q0, q1, t, shortest=True):
+    a, b = broadcast_arrays(_quat_vals(q0), _quat_vals(q1))
+    t = asarray(t, dtype=float).reshape(-1)
+    cos_theta = einsum('ij,ij->i', a, b)
+    if shortest:
+      b = where(cos_theta[:, newaxis] < 0, -b, b)
+      cos_theta = abs(cos_theta)
+    theta = arccos(clip(cos_theta, -1.0, 1.0))
+    sin_theta = sin(theta)
+    # nearly parallel quaternions fall back to linear interpolation
+    small = sin_theta < 1e-6
+    safe_sin = where(small, 1.0, sin_theta)
+    wa = where(small, 1.0 - t, sin((1.0 - t) * theta) / safe_sin)
+    wb = where(small, t, sin(t * theta) / safe_sin)
+    result = a * wa[:, newaxis] + b * wb[:, newaxis]
+    return QuatArray(result / sqrt(einsum('ij,ij->i', result, result))[:, newaxis])
+
+  # inner control quaternions of squad for a sequence of unit keyframes q,
+  # s_i = q_i exp(-(log(q_i^-1 q_i+1) + log(q_i^-1 q_i-1)) / 4), the end keyframes are their own
+  @classmethod
+  def squad_controls(cls, q):
+    q = QuatArray.continuous(q)
+    result = q.v.copy()
+    if len(q) > 2:
+      inner = q[1:-1]
+      inv = QuatArray.conj(inner)
+      tangent = (inv * q[2:]).log() + (inv * q[:-2]).log()
+      result[1:-1] = (inner * QuatArray.exp(-0.25 * tangent)).v
+    return QuatArray(result)
+
+  # squad between keyframes q0, q1 with inner controls s0, s1 at t: scalar or [n]; the
+  # slerps do not flip to the shorter arc, the outer one would jump when the inner results
+  # cross hemispheres
+  @classmethod
+  def squad(cls, q0, q1, s0, s1, t):
+    t = asarray(t, dtype=float).reshape(-1)
+    return QuatArray.slerp(QuatArray.slerp(q0, q1, t, False), QuatArray.slerp(s0, s1, t, False),
+      2.0 * t * (1.0 - t), False)
+
+  # weighted rotation average of unit quaternions (Markley et al. 2007): the eigenvector of the
+  # largest eigenvalue of sum(w_i q_i q_i^T), insensitive to quaternion signs; returns a Quat
+  @classmethod
+  def average(cls, q, weights=None):
+    if weights is None:
+      m = q.v.T @ q.v
+    else:
+      m = (q.v * asarray(weights, dtype=float)[:, newaxis]).T @ q.v
+    _, eigvecs = linalg.eigh(m)
+    result = eigvecs[:, -1]
+    return Quat(-result if result[0] < 0 else result)
+
+  # returns [n, 3, 3] rotation matrices
+  def to_mat3(self):
+    w, x, y, z = self.v.T
+    two_over_n = 2.0 / self.norm2()
+    r = empty((self.v.shape[0], 3, 3))
+    r[:, 0, 0] = 1.0 - (y * y + z * z) * two_over_n
+    r[:, 0, 1] = (x * y - w * z) * two_over_n
+    r[:, 0, 2] = (x * z + y * w) * two_over_n
+    r[:, 1, 0] = (x * y + w * z) * two_over_n
+    r[:, 1, 1] = 1.0 - (x * x + z * z) * two_over_n
+    r[:, 1, 2] = (y * z - x * w) * two_over_n
+    r[:, 2, 0] = (x * z - y * w) * two_over_n
+    r[:, 2, 1] = (y * z + x * w) * two_over_n
+    r[:, 2, 2] = 1.0 - (x * x + y * y) * two_over_n
+    return r
+
+  # returns [n, 4, 4] like Quat.to_mat
+  def to_mat(self):
+    r = tile(identity(4), (self.v.shape[0], 1, 1))
+    r[:, :3, :3] = self.to_mat3()
+    return r
+
+  # m: [n, 3, 3] or [n, 4, 4], Quat.from_mat's largest component method without branches:
+  # all four candidates are computed and the one of the largest component is selected
+  @classmethod
+  def from_mat(cls, m):
+    m = asarray(m, dtype=float)
+    m00, m11, m22 = m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]
+    four_big2_minus_1 = stack((m00 + m11 + m22, m00 - m11 - m22, m11 - m00 - m22,
+      m22 - m00 - m11), axis=1)
+    biggest_idx = argmax(four_big2_minus_1, axis=1)
+    rows = arange(m.shape[0])
+    big_val = sqrt(four_big2_minus_1[rows, biggest_idx] + 1) * 0.5
+    mult = 0.25 / big_val
+
+    a = m[:, 2, 1] - m[:, 1, 2]
+    b = m[:, 0, 2] - m[:, 2, 0]
+    c = m[:, 1, 0] - m[:, 0, 1]
+    d = m[:, 1, 0] + m[:, 0, 1]
+    e = m[:, 0, 2] + m[:, 2, 0]
+    f = m[:, 2, 1] + m[:, 1, 2]
+    candidates = stack((
+      stack((big_val, a * mult, b * mult, c * mult), axis=1),
+      stack((a * mult, big_val, d * mult, e * mult), axis=1),
+      stack((b * mult, d * mult, big_val, f * mult), axis=1),
+      stack((c * mult, e * mult, f * mult, big_val), axis=1)), axis=1)
+    return QuatArray(candidates[rows, biggest_idx])
+
+def _quat_vals(q):
+  return q.v.reshape((-1, 4))
+
+# a, b: [..., 4] broadcastable
+def _quat_mul(a, b):
+  a, b = broadcast_arrays(a, b)
+  result = empty(a.shape)
+  result[..., 0] = a[..., 0] * b[..., 0] - einsum('...i,...i->...', a[..., 1:], b[..., 1:])
+  result[..., 1:] = b[..., 1:] * a[..., :1] + a[..., 1:] * b[..., :1] + cross(a[..., 1:], b[..., 1:])
+  return result
+
 if __name__ == '__main__':
   q0 = Quat(array([0.483, 0.837, -0.224, 0.129]))
   q1 = Quat(array([0.853, 0.492, 0.150, 0.087]))
@@ -0,0 +1,103 @@
+import unittest
+import numpy as np
+from vcpy.quat import Quat, QuatArray
+
+def random_quats(n, seed=0):
+  return QuatArray.normalize(QuatArray(np.random.default_rng(seed).normal(size=(n, 4))))
+
+class TestQuatArray(unittest.TestCase):
+  def test_matches_quat(self):
+    a = random_quats(20, 0)
+    b = random_quats(20, 1)
+    pts = np.random.default_rng(2).normal(size=(20, 4))
+    products = a * b
+    inverses = QuatArray.inv(QuatArray.scaled(a, 2.0))
+    powers = a ** 0.3
+    rotated = a.apply(pts)
+    mats = a.to_mat()
+    for i, (qa, qb) in enumerate(zip(a, b)):
+      self.assertTrue(np.allclose(products.v[i], (qa * qb).v))
+      self.assertTrue(np.allclose(inverses.v[i], Quat.inv(Quat.scaled(qa, 2.0)).v))
+      self.assertTrue(np.allclose(powers.v[i], (qa ** 0.3).v))
+      self.assertTrue(np.allclose(rotated[i], qa.apply(pts[i])))
+      self.assertTrue(np.allclose(mats[i], qa.to_mat()))
+    self.assertTrue(np.allclose(a.apply(pts[:, :3]), rotated[:, :3]))
+    self.assertTrue(np.allclose(QuatArray.dot(a, b), np.sum(a.v * b.v, axis=1)))
+
+  def test_broadcast(self):
+    a = random_quats(5)
+    q = Quat.normalize(Quat(np.array([0.483, 0.837, -0.224, 0.129])))
+    self.assertTrue(np.allclose((a * q).v, [(qa * q).v for qa in a]))
+    self.assertTrue(np.allclose((q * a).v, [(q * qa).v for qa in a]))
+    self.assertTrue(np.allclose((a * a[:1]).v, [(qa * a[0]).v for qa in a]))
+
+  def test_from_mat(self):
+    # rotations of pi around each axis exercise all four largest component branches
+    a = QuatArray(np.vstack((random_quats(16).v, np.identity(4))))
+    mats = a.to_mat3()
+    converted = QuatArray.from_mat(mats)
+    for i, m in enumerate(mats):
+      self.assertTrue(np.allclose(converted.v[i], Quat.from_mat(m).v))
+    self.assertTrue(np.allclose(QuatArray.from_mat(a.to_mat()).to_mat3(), mats))
+
+class TestQuatApply(unittest.TestCase):
+  def test(self):
+    q = Quat.scaled(Quat(np.array([0.483, 0.837, -0.224, 0.129])), 2.0)
+    pts = np.random.default_rng(0).normal(size=(10, 4))
+    # rotation by the quaternion product q p q^-1
+    expected = np.array([(q * (Quat(np.hstack(([0.0], p[:3]))) * Quat.inv(q))).v[1:] for p in pts])
+    self.assertTrue(np.allclose(q.apply(pts)[:, :3], expected))
+    self.assertTrue(np.array_equal(q.apply(pts)[:, 3], pts[:, 3]))
+    self.assertTrue(np.allclose(q.apply(pts[:, :3]), expected))
+    self.assertTrue(np.allclose(q.apply(pts[0]), q.apply(pts)[0]))
+    out = pts.copy()
+    self.assertIs(q.apply(out, out=out), out)
+    self.assertTrue(np.allclose(out, q.apply(pts)))
+    # the cached rotation follows changes to v
+    q.set(1.0, 0.0, 0.0, 0.0)
+    self.assertTrue(np.allclose(q.apply(pts), pts))
+
+class TestQuatInterpolation(unittest.TestCase):
+  def test_slerp(self):
+    a = random_quats(10, 0)
+    b = random_quats(10, 1)
+    t = np.linspace(0.0, 1.0, 10)
+    result = QuatArray.slerp(a, b, t)
+    for i, (qa, qb) in enumerate(zip(a, b)):
+      if Quat.dot(qa, qb) < 0:
+        qb = Quat.scaled(qb, -1)
+      expected = qa * (Quat.inv(qa) * qb) ** t[i]
+      self.assertTrue(np.allclose(result.v[i], expected.v))
+    self.assertTrue(np.allclose(QuatArray.slerp(a, a, 0.5).v, a.v))
+    self.assertTrue(np.allclose(QuatArray.exp(a.log()).v, a.v))
+
+  def test_squad(self):
+    q = QuatArray.continuous(random_quats(5))
+    s = QuatArray.squad_controls(q)
+    self.assertTrue(np.allclose(s.v[[0, -1]], q.v[[0, -1]]))
+    for t in (0.0, 1.0):
+      result = QuatArray.squad(q[:-1], q[1:], s[:-1], s[1:], t)
+      self.assertTrue(np.allclose(result.v, q.v[:-1] if t == 0.0 else q.v[1:]))
+
+  def test_squad_continuous(self):
+    # slerp(s0, s1, t) crosses the hemisphere of q0 = q1 mid segment, squad stays continuous
+    z = np.array([[0.0, 0.0, 1.0]])
+    q = QuatArray.axis_angle(z, 0.0)
+    s0 = QuatArray.axis_angle(z, np.radians(80.0))
+    s1 = QuatArray.axis_angle(z, np.radians(200.0))
+    result = QuatArray.squad(q, q, s0, s1, np.linspace(0.0, 1.0, 1001)).v
+    self.assertGreater(np.min(np.einsum('ij,ij->i', result[1:], result[:-1])), 0.999)
+    self.assertFalse(np.allclose(QuatArray.slerp(q, s1, 0.5, False).v,
+      QuatArray.slerp(q, s1, 0.5).v))
+
+  def test_average(self):
+    axis = np.array([[0.0, 0.0, 1.0]])
+    q = QuatArray.axis_angle(np.repeat(axis, 4, axis=0), np.array([0.1, 0.3, -0.2, 0.6]))
+    # signs do not matter
+    q.v[1] *= -1
+    self.assertTrue(np.allclose(QuatArray.average(q).v, QuatArray.axis_angle(axis, 0.2).v[0], atol=1e-3))
+    weighted = QuatArray.average(q, np.array([1.0, 0.0, 1.0, 0.0]))
+    self.assertTrue(np.allclose(weighted.v, QuatArray.axis_angle(axis, -0.05).v[0], atol=1e-3))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,5 +1,5 @@
-from pylab import *
-from .quat import *
+from numpy import array, asarray, integer, zeros
+from .quat import Quat, QuatArray
 from . import m3d
 
 class Rbt():
@@ -27,11 +27,19 @@ class Rbt():
     return Rbt(r=self.r)
 
   def __mul__(self, other):
+    if isinstance(other, RbtArray):
+      return NotImplemented
     return Rbt(self.t + self.r.apply(m3d.v3v4(other.t, 0))[:3],
       self.r * other.r)
 
-  def apply(self, pos):
-    return m3d.v3v4(self.t, 0) * pos[3] + self.r.apply(pos)
+  # pos: homogeneous point [4], or points [n, 3] / homogeneous [n, 4], into out if given
+  def apply(self, pos, out=None):
+    out = self.r.apply(pos, out)
+    if out.shape[-1] == 4:
+      out[..., :3] += asarray(self.t) * out[..., 3:]
+    else:
+      out += asarray(self.t)
+    return out
 
   @classmethod
   def inv(cls, rbt):
@@ -53,6 +61,78 @@ class Rbt():
     r = Quat.from_mat(m)
     return Rbt(eye, r)
 
+# RbtArray holds n rigid body transforms as [n, 3] translations and a QuatArray of rotations
+# with the semantics of Rbt, operations broadcast between arrays of the same length, length 1
+# arrays and single Rbts
+class RbtArray:
+  def __init__(self, t=None, r=None):
+    if r is None:
+      n = 1 if t is None else asarray(t).reshape((-1, 3)).shape[0]
+      r = QuatArray.identity(n)
+    self.r = r if isinstance(r, QuatArray) else QuatArray(r)
+    if t is None:
+      t = zeros((len(self.r), 3))
+    self.t = array(t, dtype=float).reshape((-1, 3))
+
+  @classmethod
+  def identity(cls, n):
+    return RbtArray(zeros((n, 3)), QuatArray.identity(n))
+
+  @classmethod
+  def from_rbts(cls, rbts):
+    return RbtArray(array([rbt.t for rbt in rbts], dtype=float),
+      QuatArray.from_quats([rbt.r for rbt in rbts]))
+
+  # m: [n, 4, 4] rigid transforms
+  @classmethod
+  def from_mat(cls, m):
+    m = asarray(m, dtype=float)
+    return RbtArray(m[:, :3, 3], QuatArray.from_mat(m))
+
+  @classmethod
+  def inv(cls, rbt):
+    r_inv = QuatArray.inv(rbt.r)
+    return RbtArray(-r_inv.apply(rbt.t), r_inv)
+
+  def __len__(self):
+    return self.t.shape[0]
+
+  # an int index returns an Rbt, anything else an RbtArray
+  def __getitem__(self, index):
+    if isinstance(index, (int, integer)):
+      return Rbt(self.t[index].copy(), self.r[index])
+    return RbtArray(self.t[index], self.r[index])
+
+  def __iter__(self):
+    return (self[i] for i in range(len(self)))
+
+  def __mul__(self, other):
+    other = _rbt_array(other)
+    return RbtArray(self.t + self.r.apply(other.t), self.r * other.r)
+
+  def __rmul__(self, other):
+    return _rbt_array(other) * self
+
+  # pts: [n, 3] points or homogeneous [n, 4], transformed by the rbt of the same row,
+  # into out if given
+  def apply(self, pts, out=None):
+    out = self.r.apply(pts, out)
+    if out.shape[-1] == 4:
+      out[:, :3] += self.t * out[:, 3:]
+    else:
+      out += self.t
+    return out
+
+  # returns [n, 4, 4]
+  def to_mat(self):
+    m = self.r.to_mat()
+    m[:, :3, 3] = self.t
+    return m
+
+def _rbt_array(rbt):
+  if isinstance(rbt, RbtArray):
+    return rbt
+  return RbtArray(asarray(rbt.t, dtype=float), QuatArray(rbt.r.v))
 
 if __name__ == '__main__':
   pass
\ No newline at end of file
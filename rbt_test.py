@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from vcpy.quat import Quat
+from vcpy.rbt import Rbt, RbtArray
+
+class TestRbtApply(unittest.TestCase):
+  def test(self):
+    rbt = Rbt(np.array([1.0, -2.0, 0.5]), Quat.normalize(Quat(np.array([0.483, 0.837, -0.224, 0.129]))))
+    pts = np.random.default_rng(0).normal(size=(10, 4))
+    expected = np.array([rbt.to_mat() @ p for p in pts])
+    self.assertTrue(np.allclose(rbt.apply(pts), expected))
+    self.assertTrue(np.allclose(rbt.apply(pts[3]), expected[3]))
+    self.assertTrue(np.allclose(rbt.apply(pts[:, :3]), (rbt.to_mat()[:3, :3] @ pts[:, :3].T).T + rbt.t))
+    out = np.empty_like(pts)
+    rbt.apply(pts, out=out)
+    self.assertTrue(np.allclose(out, expected))
+
+def random_rbts(n, seed=0):
+  rng = np.random.default_rng(seed)
+  return [Rbt(rng.normal(size=3), Quat.normalize(Quat(rng.normal(size=4)))) for _ in range(n)]
+
+class TestRbtArray(unittest.TestCase):
+  def test_matches_rbt(self):
+    a = random_rbts(10, 0)
+    b = random_rbts(10, 1)
+    array_a = RbtArray.from_rbts(a)
+    array_b = RbtArray.from_rbts(b)
+    pts = np.random.default_rng(2).normal(size=(10, 4))
+    composed = (array_a * array_b).to_mat()
+    inverses = RbtArray.inv(array_a).to_mat()
+    applied = array_a.apply(pts)
+    for i in range(10):
+      self.assertTrue(np.allclose(composed[i], (a[i] * b[i]).to_mat()))
+      self.assertTrue(np.allclose(inverses[i], Rbt.inv(a[i]).to_mat()))
+      self.assertTrue(np.allclose(applied[i], a[i].apply(pts[i])))
+    self.assertTrue(np.allclose(array_a.apply(pts[:, :3]), applied[:, :3] + (1 - pts[:, 3:]) * array_a.t))
+    self.assertTrue(np.allclose(RbtArray.from_mat(array_a.to_mat()).to_mat(), array_a.to_mat()))
+
+  def test_broadcast(self):
+    rig = random_rbts(1, 0)[0]
+    poses = RbtArray.from_rbts(random_rbts(5, 1))
+    for result in (poses * rig, rig * poses, poses * RbtArray.from_rbts([rig])):
+      self.assertEqual(len(result), 5)
+    self.assertTrue(np.allclose((poses * rig).to_mat(), [(p * rig).to_mat() for p in poses]))
+    self.assertTrue(np.allclose((rig * poses).to_mat(), [(rig * p).to_mat() for p in poses]))
+    pt = np.array([[1.0, 2.0, 3.0]])
+    self.assertTrue(np.allclose(poses.apply(pt), [p.apply(np.array([1.0, 2.0, 3.0, 1.0]))[:3]
+      for p in poses]))
+
+if __name__ == '__main__':
+  unittest.main()
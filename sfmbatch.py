@@ -0,0 +1,93 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import collections, itertools, multiprocessing, os
+import numpy as np
+from vcpy import sfmcameras
+from vcpy.sfmdata import load_sfm_data, sfm_data_to_arrays, sfm_data_from_arrays
+
+# Workers send back (meta, arrays) pairs instead of object graphs, so that a result is pickled
+# as a small dict and a few contiguous numpy buffers.
+
+def _load_sfm_data_arrays(path, load_structure, cache):
+  sfm_data = load_sfm_data(path, load_structure, cache=cache, mmap=False)
+  return sfm_data_to_arrays(sfm_data, load_structure)
+
+def _sfm_cameras_to_arrays(cameras):
+  intrinsics_index = {}
+  intrinsics = []
+  views = []
+  for camera in cameras:
+    if id(camera.intrinsics) not in intrinsics_index:
+      intrinsics_index[id(camera.intrinsics)] = len(intrinsics)
+      intrinsics.append(vars(camera.intrinsics))
+    views.append((camera.filename, intrinsics_index[id(camera.intrinsics)]))
+  meta = {'intrinsics': intrinsics, 'views': views}
+  arrays = {'camera_frames': np.array([camera.camera_frame for camera in cameras],
+    dtype=np.double).reshape((-1, 4, 4))}
+  return meta, arrays
+
+def _sfm_cameras_from_arrays(meta, arrays):
+  intrinsics = []
+  for data in meta['intrinsics']:
+    intrin = sfmcameras.Intrinsics()
+    vars(intrin).update(data)
+    intrinsics.append(intrin)
+  result = []
+  for (filename, intrinsics_index), camera_frame in zip(meta['views'], arrays['camera_frames']):
+    camera = sfmcameras.SfMCamera()
+    camera.filename = filename
+    camera.intrinsics = intrinsics[intrinsics_index]
+    camera.camera_frame = camera_frame
+    result.append(camera)
+  return result
+
+def _load_sfm_cameras_arrays(path):
+  return _sfm_cameras_to_arrays(sfmcameras.load_sfm_cameras(path))
+
+# forking a process that already ran numba parallel kernels can deadlock the workers, they
+# are forked from a clean server process instead; Windows has no forkserver and spawns them
+def process_pool_context():
+  if 'forkserver' in multiprocessing.get_all_start_methods():
+    return multiprocessing.get_context('forkserver')
+  return multiprocessing.get_context('spawn')
+
+# yields (path, result of load(path, *args)) in submission order, or as they complete if
+# ordered is False; an error loading a file is raised when its result is reached. At most
+# two loads per worker are in flight, so results do not pile up ahead of the consumer.
+def _load_batch(load, paths, args, processes, ordered):
+  if processes is not None and processes <= 1:
+    for path in paths:
+      yield path, load(path, *args)
+    return
+  window = 2 * (processes or os.cpu_count() or 1)
+  with ProcessPoolExecutor(max_workers=processes, mp_context=process_pool_context()) as executor:
+    paths = iter(paths)
+    futures = {}
+    order = collections.deque()
+    while True:
+      for path in itertools.islice(paths, window - len(futures)):
+        future = executor.submit(load, path, *args)
+        futures[future] = path
+        if ordered:
+          order.append(future)
+      if not futures:
+        return
+      if ordered:
+        future = order.popleft()
+      else:
+        future = next(iter(wait(futures, return_when=FIRST_COMPLETED).done))
+      yield futures.pop(future), future.result()
+
+# loads many sfm_data files in a process pool, yields (path, SfMData)
+# processes: pool size, None for one per core, 1 loads in the calling process
+# ordered: yield in the order of paths, otherwise as soon as each file is loaded
+# as_arrays: yield the compact (meta, arrays) of sfmdata.sfm_data_to_arrays instead
+def load_sfm_data_batch(paths, load_structure=True, processes=None, ordered=True, cache=False,
+    as_arrays=False):
+  for path, (meta, arrays) in _load_batch(_load_sfm_data_arrays, paths, (load_structure, cache),
+      processes, ordered):
+    yield path, (meta, arrays) if as_arrays else sfm_data_from_arrays(meta, arrays)
+
+# loads the cameras of many sfm_data files in a process pool, yields (path, [SfMCamera])
+def load_sfm_cameras_batch(paths, processes=None, ordered=True):
+  for path, (meta, arrays) in _load_batch(_load_sfm_cameras_arrays, paths, (), processes, ordered):
+    yield path, _sfm_cameras_from_arrays(meta, arrays)
@@ -0,0 +1,54 @@
+import unittest, json, tempfile
+from pathlib import Path
+import numpy as np
+from vcpy.sfmdata import load_sfm_data
+from vcpy.sfmcameras import load_sfm_cameras
+from vcpy.sfmbatch import load_sfm_data_batch, load_sfm_cameras_batch
+from vcpy.sfmdata_test import make_openmvg_doc, assert_same_sfm_data
+
+class TestBatch(unittest.TestCase):
+  def test_batch(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      paths = []
+      for i in range(4):
+        path = Path(tmp) / 'sfm_data_{}.json'.format(i)
+        path.write_text(json.dumps(make_openmvg_doc(num_views=3 + i, seed=i)))
+        paths.append(path)
+
+      for processes in (1, 2):
+        results = list(load_sfm_data_batch(paths, processes=processes))
+        self.assertEqual([path for path, _ in results], paths)
+        for path, sfm_data in results:
+          assert_same_sfm_data(self, load_sfm_data(path), sfm_data)
+
+      results = dict(load_sfm_cameras_batch(paths, processes=2, ordered=False))
+      self.assertEqual(sorted(results), paths)
+      for path, cameras in results.items():
+        expected = load_sfm_cameras(path)
+        self.assertEqual([c.filename for c in cameras], [c.filename for c in expected])
+        for camera, other in zip(cameras, expected):
+          self.assertTrue(np.array_equal(camera.camera_frame, other.camera_frame))
+          self.assertEqual(vars(camera.intrinsics), vars(other.intrinsics))
+
+  def test_bounded_submission(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      paths = []
+      for i in range(10):
+        path = Path(tmp) / 'sfm_data_{}.json'.format(i)
+        path.write_text(json.dumps(make_openmvg_doc(num_views=3, num_landmarks=5, seed=i)))
+        paths.append(path)
+      pulled = []
+      def iter_paths():
+        for path in paths:
+          pulled.append(path)
+          yield path
+      results = load_sfm_cameras_batch(iter_paths(), processes=2)
+      self.assertEqual(next(results)[0], paths[0])
+      # two loads per worker are in flight
+      self.assertLessEqual(len(pulled), 5)
+      self.assertEqual([path for path, _ in results], paths[1:])
+      unordered = load_sfm_cameras_batch(paths, processes=2, ordered=False)
+      self.assertEqual(sorted(path for path, _ in unordered), paths)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,5 +1,6 @@
-import json
 import numpy as np
+from vcpy.jsonstream import JsonStream
+from vcpy.m3d import gl_frustums
 
 class Intrinsics:
   def __init__(self):
@@ -83,9 +84,25 @@ def _parse_extrinsics(doc):
     result[key] = camera_frame
   return result
 
+_CAMERA_SECTIONS = ('views', 'intrinsics', 'extrinsics')
+
+# reads the camera sections only, structure and control_points are skipped by bracket
+# matching without being decoded and reading stops once all camera sections are read
+def _load_camera_sections(f):
+  stream = JsonStream(f)
+  doc = {}
+  for key in stream.iter_object():
+    if key in _CAMERA_SECTIONS:
+      doc[key] = stream.read_value()
+      if len(doc) == len(_CAMERA_SECTIONS):
+        break
+    else:
+      stream.skip_value()
+  return doc
+
 def load_sfm_cameras(filename):
-  with open(filename) as f:
-    doc = json.load(f)
+  with open(filename, 'rb') as f:
+    doc = _load_camera_sections(f)
 
   views = _parse_views(doc)
   intrinsics = _parse_intrinsics(doc)
@@ -103,8 +120,50 @@ def load_sfm_cameras(filename):
       print('{} has no camera parameter'.format(view[2]))
   return result
 
+# camera_frame: [4, 4] or [n, 4, 4]
 def sfm_to_gl_camera_frame(camera_frame):
   result = camera_frame.copy()
-  result[:, 1] = -result[:, 1]
-  result[:, 2] = -result[:, 2]
+  result[..., 1] = -result[..., 1]
+  result[..., 2] = -result[..., 2]
   return result
+
+# SfMCameraArray stacks a list of SfMCamera for batch rendering
+# camera_frames: [n, 4, 4] sfm camera frames
+# width, height, fx, fy, cx, cy: [n] intrinsics fields
+# filenames: [n] image filenames
+class SfMCameraArray:
+  def __init__(self, cameras):
+    self.camera_frames = np.array([camera.camera_frame for camera in cameras],
+      dtype=np.double).reshape((-1, 4, 4))
+    for field in ('width', 'height', 'fx', 'fy', 'cx', 'cy'):
+      setattr(self, field, np.array([getattr(camera.intrinsics, field) for camera in cameras],
+        dtype=np.double))
+    self.filenames = [camera.filename for camera in cameras]
+
+  def __len__(self):
+    return len(self.filenames)
+
+  # returns [n, 4, 4] GL camera frames
+  def gl_camera_frames(self):
+    return sfm_to_gl_camera_frame(self.camera_frames)
+
+  # returns [n, 4, 4] GL view matrices, the inverses of the rigid GL camera frames
+  def gl_view_mats(self):
+    frames = self.gl_camera_frames()
+    rotations = np.swapaxes(frames[:, :3, :3], 1, 2)
+    result = np.zeros_like(frames)
+    result[:, :3, :3] = rotations
+    result[:, :3, 3] = -np.einsum('nij,nj->ni', rotations, frames[:, :3, 3])
+    result[:, 3, 3] = 1.0
+    return result
+
+  # batched projection_from_intrinsics, returns [n, 6] (left, right, bottom, top, near, far)
+  def frustum_vecs(self, z_near, z_far):
+    return np.column_stack(np.broadcast_arrays(*projection_from_intrinsics(self, z_near, z_far)))
+
+  # returns [n, 4, 4] GL projection matrices
+  def gl_projection_mats(self, z_near, z_far):
+    return gl_frustums(*self.frustum_vecs(z_near, z_far).T)
+
+def load_sfm_camera_array(filename):
+  return SfMCameraArray(load_sfm_cameras(filename))
@@ -0,0 +1,47 @@
+import unittest, json, tempfile
+from pathlib import Path
+import numpy as np
+from vcpy.m3d import gl_frustum
+from vcpy.sfmcameras import load_sfm_cameras, SfMCameraArray, projection_from_intrinsics, \
+  sfm_to_gl_camera_frame
+from vcpy.sfmdata_test import make_openmvg_doc
+
+class TestLoadSfMCameras(unittest.TestCase):
+  def test_skips_structure(self):
+    doc = make_openmvg_doc(num_views=4, num_landmarks=50)
+    # structure first, with strings that look like camera sections
+    doc['structure'][0]['value']['note'] = '"views": [{"key": ]'
+    reordered = {'structure': doc['structure']}
+    reordered.update((key, value) for key, value in doc.items() if key != 'structure')
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(reordered))
+      cameras = load_sfm_cameras(path)
+    self.assertEqual([camera.filename for camera in cameras], ['img_{}.jpg'.format(i) for i in range(4)])
+    for i, camera in enumerate(cameras):
+      self.assertEqual(camera.intrinsics.fx, 50.0)
+      self.assertTrue(np.array_equal(camera.camera_frame[:3, 3], [float(i), 0.0, -5.0]))
+
+class TestSfMCameraArray(unittest.TestCase):
+  def test(self):
+    doc = make_openmvg_doc(num_views=3, num_landmarks=0)
+    doc['extrinsics'][1]['value']['rotation'] = [[0.0, 1.0, 0.0], [-1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(doc))
+      cameras = load_sfm_cameras(path)
+    array = SfMCameraArray(cameras)
+    self.assertEqual(len(array), 3)
+    self.assertEqual(array.filenames, [camera.filename for camera in cameras])
+    view_mats = array.gl_view_mats()
+    frustums = array.frustum_vecs(0.1, 100.0)
+    projections = array.gl_projection_mats(0.1, 100.0)
+    for i, camera in enumerate(cameras):
+      expected = np.linalg.inv(sfm_to_gl_camera_frame(camera.camera_frame))
+      self.assertTrue(np.allclose(view_mats[i], expected))
+      frustum = projection_from_intrinsics(camera.intrinsics, 0.1, 100.0)
+      self.assertTrue(np.allclose(frustums[i], frustum))
+      self.assertTrue(np.allclose(projections[i], gl_frustum(*frustum)))
+
+if __name__ == '__main__':
+  unittest.main()
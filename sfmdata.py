@@ -1,8 +1,10 @@
-import json
+import array, copy, hashlib, itertools, json, os, struct, tempfile, warnings
 from pathlib import Path
 import numpy as np
 import bson
 from vcpy.m3d import gl_frustum
+from vcpy.lrudict import LRUDict
+from vcpy.jsonstream import JsonStream
 
 class NamedTag:
   def __init__(self, id=0, x=0, y=0):
@@ -31,9 +33,21 @@ class View:
     self.id = -1
     self.intrinsics = None
     self.pose = None
-    self.observations = {}
+    self._observations = {}
+    self._sfm_data = None
     self.tags = []
 
+  # observations are linked in when the owning SfMData builds its structure
+  @property
+  def observations(self):
+    if self._sfm_data is not None:
+      self._sfm_data.structure
+    return self._observations
+
+  @observations.setter
+  def observations(self, observations):
+    self._observations = observations
+
   def project(self, p, distort=True):
     if self.intrinsics is None or self.pose is None:
       return None
@@ -116,15 +130,50 @@ class Intrinsics:
       r_coeff = 1.0 + k1 * r2 + k2 * r4 + k3 * r6
       t_x = t2 * (r2 + 2.0 * x_u * x_u) + 2.0 * t1 * x_u * y_u
       t_y = t1 * (r2 + 2.0 * y_u * y_u) + 2.0 * t2 * x_u * y_u
-      return np.array([self.cx + (x_u * r_coeff + t_x) * self.fx,
-        self.cy + (y_u * r_coeff + t_y) * self.fy])
+      return np.array([x_u * r_coeff + t_x, y_u * r_coeff + t_y])
     else:
       raise RuntimeError('Distortion type {} unsupported'.format(self.distortion_type))
 
+  # pts: array of [2, n] distorted, solved by fixed point iteration on add_disto; warns with
+  # the number of points that did not converge within iterations, e.g. with strong
+  # distortion near the image border
+  def remove_disto(self, pts, iterations=20, eps=1e-10):
+    if self.distortion_type == Intrinsics.NoDistortion:
+      return pts
+    result = np.array(pts, dtype=float)
+    step = np.zeros_like(result)
+    # diverging points overflow, they are reported below
+    with np.errstate(over='ignore', invalid='ignore'):
+      for _ in range(iterations):
+        step = pts - self.add_disto(result)
+        result += step
+        if np.max(np.abs(step), initial=0.0) < eps:
+          break
+    unconverged = np.count_nonzero(~np.all(np.abs(step) < eps, axis=0))
+    if unconverged:
+      warnings.warn('remove_disto did not converge for {} of {} points'.format(unconverged,
+        result.shape[1]), RuntimeWarning, stacklevel=2)
+    return result
+
+  # pts: array of [2, n] in pixels, returns undistorted coords on the z = 1 plane
+  def unproject(self, pts, undistort=True):
+    pts_2d = self.img_2_cam(pts)
+    if undistort:
+      pts_2d = self.remove_disto(pts_2d)
+    return pts_2d
+
   # pts: array of [2, n]
   def cam_2_img(self, p):
     return ([self.fx, self.fy] * p.T + np.array([self.cx, self.cy], dtype=p.dtype)).T
 
+  # pts: array of [2, n]
+  def img_2_cam(self, p):
+    return ((p.T - [self.cx, self.cy]) / [self.fx, self.fy]).T
+
+  def params_key(self):
+    return (self.width, self.height, self.fx, self.fy, self.cx, self.cy,
+      self.distortion_type, tuple(self.distortions))
+
 class Extrinsic:
   def __init__(self):
     self.camera_frame = np.identity(4, dtype=float)
@@ -150,15 +199,327 @@ class Observation:
     self.id_feat = -1
     self.x = np.zeros(2, dtype=float)
 
+# Tracks stores the structure in columnar arrays
+# landmark_ids: [m] structure keys
+# X: [m, 3] 3D coords in world frame
+# offsets: [m + 1] observations of landmark i are in [offsets[i], offsets[i + 1])
+# view_ids: [k] id of the view each observation is in
+# feat_ids: [k] local feature index of each observation
+# x: [k, 2] sub-pixel 2D image coords of each observation
+class Tracks:
+  def __init__(self, landmark_ids=None, X=None, offsets=None, view_ids=None, feat_ids=None, x=None):
+    self.landmark_ids = np.zeros(0, dtype=np.int64) if landmark_ids is None else landmark_ids
+    self.X = np.zeros((0, 3), dtype=float) if X is None else X
+    self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+    self.view_ids = np.zeros(0, dtype=np.int64) if view_ids is None else view_ids
+    self.feat_ids = np.zeros(0, dtype=np.int64) if feat_ids is None else feat_ids
+    self.x = np.zeros((0, 2), dtype=float) if x is None else x
+
+  def num_landmarks(self):
+    return self.X.shape[0]
+
+  def num_observations(self):
+    return self.x.shape[0]
+
+  def track_lengths(self):
+    return np.diff(self.offsets)
+
+  # index into landmark_ids/X for every observation
+  def landmark_index(self):
+    return np.repeat(np.arange(self.num_landmarks()), self.track_lengths())
+
+  @classmethod
+  def from_structure(cls, structure):
+    num_obs = sum(len(landmark.observations) for landmark in structure.values())
+    landmark_ids = np.fromiter(structure.keys(), dtype=np.int64, count=len(structure))
+    X = np.zeros((len(structure), 3), dtype=float)
+    offsets = np.zeros(len(structure) + 1, dtype=np.int64)
+    view_ids = np.zeros(num_obs, dtype=np.int64)
+    feat_ids = np.zeros(num_obs, dtype=np.int64)
+    x = np.zeros((num_obs, 2), dtype=float)
+    k = 0
+    for i, landmark in enumerate(structure.values()):
+      X[i] = landmark.X
+      for view, ob in landmark.observations.items():
+        view_ids[k] = view.id
+        feat_ids[k] = ob.id_feat
+        x[k] = ob.x
+        k += 1
+      offsets[i + 1] = k
+    return cls(landmark_ids, X, offsets, view_ids, feat_ids, x)
+
+  # views: dict{view id: View}, observations are linked into the views too
+  def to_structure(self, views):
+    result = {}
+    landmark_ids = self.landmark_ids.tolist()
+    offsets = self.offsets.tolist()
+    view_ids = self.view_ids.tolist()
+    feat_ids = self.feat_ids.tolist()
+    for i, key in enumerate(landmark_ids):
+      landmark = Landmark()
+      landmark.id = key
+      landmark.X = self.X[i].copy()
+      for k in range(offsets[i], offsets[i + 1]):
+        view = views[view_ids[k]]
+        ob = Observation()
+        ob.id_feat = feat_ids[k]
+        ob.x = self.x[k].copy()
+        landmark.observations[view] = ob
+        view.observations[landmark] = ob
+      result[key] = landmark
+    return result
+
+# ViewArrays stores per view camera parameters in arrays, sorted by view id
+# view_ids: [v] sorted view ids
+# camera_frames: [v, 4, 4] camera frames, identity for views without pose
+# has_pose: [v] whether the view has a pose
+# intrinsics: [n] distinct Intrinsics objects
+# intrinsic_index: [v] index into intrinsics, -1 for views without intrinsics
+class ViewArrays:
+  def __init__(self, views):
+    self.view_ids = np.array(sorted(views.keys()), dtype=np.int64)
+    self.camera_frames = np.tile(np.identity(4, dtype=float), (len(self.view_ids), 1, 1))
+    self.has_pose = np.zeros(len(self.view_ids), dtype=bool)
+    self.intrinsics = []
+    self.intrinsic_index = np.full(len(self.view_ids), -1, dtype=np.int64)
+    intrinsic_index = {}
+    for i, view_id in enumerate(self.view_ids.tolist()):
+      view = views[view_id]
+      if view.pose is not None:
+        self.camera_frames[i] = view.pose.camera_frame
+        self.has_pose[i] = True
+      if view.intrinsics is not None:
+        if id(view.intrinsics) not in intrinsic_index:
+          intrinsic_index[id(view.intrinsics)] = len(self.intrinsics)
+          self.intrinsics.append(view.intrinsics)
+        self.intrinsic_index[i] = intrinsic_index[id(view.intrinsics)]
+
+  @property
+  def valid(self):
+    return self.has_pose & (self.intrinsic_index >= 0)
+
+  # positions of view ids in the arrays, raises KeyError for a view id that does not exist
+  def index_of(self, view_ids):
+    view_ids = np.asarray(view_ids, dtype=np.int64)
+    index = np.searchsorted(self.view_ids, view_ids)
+    found = index < len(self.view_ids)
+    if len(self.view_ids):
+      found &= self.view_ids[np.where(found, index, 0)] == view_ids
+    if not np.all(found):
+      raise KeyError(int(view_ids[~found].flat[0]))
+    return index
+
+  # pts: array of [n, 3] in world frame, view_index: [n] positions of the views
+  # returns array of [n, 2], nan for invalid views
+  def project(self, pts, view_index, distort=True):
+    frames = self.camera_frames[view_index]
+    view_pts = np.einsum('nji,nj->ni', frames[:, :3, :3], pts - frames[:, :3, 3])
+    result = np.full((pts.shape[0], 2), np.nan)
+    view_index = np.where(self.has_pose[view_index], view_index, -1)
+    intrinsic_index = np.where(view_index >= 0, self.intrinsic_index[view_index], -1)
+    for i, intrin in enumerate(self.intrinsics):
+      mask = intrinsic_index == i
+      if np.any(mask):
+        result[mask] = intrin.project(view_pts[mask].T, distort).T
+    return result
+
+# pts: [n, 2], polygon: [p, 2] vertices, even-odd rule
+def _points_in_polygon(pts, polygon):
+  result = np.zeros(pts.shape[0], dtype=bool)
+  x, y = pts[:, 0], pts[:, 1]
+  for (x0, y0), (x1, y1) in zip(polygon, np.roll(polygon, 1, axis=0)):
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    result ^= crosses & (x < x_cross)
+  return result
+
+# sort key of (id, value) items: integer ids in order, then other ids (e.g. the camera name
+# keys of tag intrinsics) by their string
+def _id_order(item):
+  key = item[0]
+  if isinstance(key, (int, np.integer)):
+    return (0, int(key), '')
+  return (1, 0, str(key))
+
 class SfMData:
   def __init__(self):
     self.root_path = ''
     self.views = {}
     self.intrinsics = {}
     self.extrinsics = {}
-    self.structure = {}
+    self._structure = {}
+    self._tracks = None
+    self._tracks_loader = None
+    self._covisibility = None
+
+  # structure is built from tracks on first access if it was loaded in columnar form
+  @property
+  def structure(self):
+    if self._structure is None:
+      tracks = self.tracks
+      for view in self.views.values():
+        view._sfm_data = None
+      self._structure = tracks.to_structure(self.views)
+    return self._structure
+
+  @structure.setter
+  def structure(self, structure):
+    for view in self.views.values():
+      view._sfm_data = None
+    self._structure = structure
+    self._tracks = None
+    self._tracks_loader = None
+    self.invalidate_caches()
+
+  # columnar copy of structure, built on first access
+  @property
+  def tracks(self):
+    if self._tracks is None:
+      if self._structure is None:
+        self._tracks = Tracks() if self._tracks_loader is None else self._tracks_loader()
+        self._tracks_loader = None
+      else:
+        self._tracks = Tracks.from_structure(self._structure)
+    return self._tracks
+
+  @tracks.setter
+  def tracks(self, tracks):
+    self._detach_structure()
+    self._tracks = tracks
+    self.invalidate_caches()
+
+  # loader() returns Tracks, it is called on first access to structure, tracks or
+  # View.observations
+  def set_tracks_loader(self, loader):
+    self._detach_structure()
+    self._tracks = None
+    self._tracks_loader = loader
+    self.invalidate_caches()
+
+  def _detach_structure(self):
+    for view in self.views.values():
+      view.observations = {}
+      view._sfm_data = self
+    self._structure = None
+
+  def view_arrays(self):
+    return ViewArrays(self.views)
+
+  # sparse view x view shared landmark counts, built on first access; sfmgraph is imported
+  # here so that loading sfm data does not need scipy
+  def covisibility(self):
+    if self._covisibility is None:
+      from vcpy.sfmgraph import CovisibilityGraph
+      self._covisibility = CovisibilityGraph.from_tracks(self.tracks,
+        np.array(sorted(self.views.keys()), dtype=np.int64))
+    return self._covisibility
+
+  # call after editing structure or poses in place
+  def invalidate_caches(self):
+    # tracks are a cache only once structure has been built
+    if self._structure is not None:
+      self._tracks = None
+    self._covisibility = None
+
+  # new SfMData with the given views and the observations in them, landmarks with less than
+  # min_views remaining observations are dropped
+  # remap_ids: renumber views, intrinsics, extrinsics and landmarks from 0 in id order,
+  # integer ids before other ids; raises KeyError for a view id that does not exist
+  def subset(self, view_ids, min_views=1, remap_ids=False):
+    view_ids = np.unique(np.asarray(view_ids, dtype=np.int64))
+    for view_id in view_ids.tolist():
+      if view_id not in self.views:
+        raise KeyError(view_id)
+    return self._extract(view_ids, None, min_views, remap_ids)
+
+  # new SfMData with the landmarks inside the axis aligned box [box_min, box_max] and the
+  # views observing them
+  def crop_box(self, box_min, box_max, min_views=1, remap_ids=False):
+    X = self.tracks.X
+    mask = np.all((X >= box_min) & (X <= box_max), axis=1)
+    return self._extract(None, mask, min_views, remap_ids)
+
+  # new SfMData with the landmarks whose x, y lie inside polygon [p, 2] and z inside
+  # z_range (z_min, z_max) if given, and the views observing them
+  def crop_polygon(self, polygon, z_range=None, min_views=1, remap_ids=False):
+    X = self.tracks.X
+    mask = _points_in_polygon(X[:, :2], np.asarray(polygon, dtype=float))
+    if z_range is not None:
+      mask &= (X[:, 2] >= z_range[0]) & (X[:, 2] <= z_range[1])
+    return self._extract(None, mask, min_views, remap_ids)
+
+  # view_ids: sorted views to keep, None to keep the views observing the kept landmarks
+  # landmark_mask: [m] landmarks to keep, None for all
+  def _extract(self, view_ids, landmark_mask, min_views, remap_ids):
+    tracks = self.tracks
+    landmark_index = tracks.landmark_index()
+    obs_mask = np.ones(tracks.num_observations(), dtype=bool)
+    if view_ids is not None:
+      obs_mask &= np.isin(tracks.view_ids, view_ids)
+    if landmark_mask is not None:
+      obs_mask &= landmark_mask[landmark_index]
+    lengths = np.bincount(landmark_index[obs_mask], minlength=tracks.num_landmarks())
+    keep = lengths >= max(min_views, 1)
+    obs_mask &= keep[landmark_index]
+    if view_ids is None:
+      view_ids = np.unique(tracks.view_ids[obs_mask])
+
+    result = SfMData()
+    result.root_path = self.root_path
+    view_key = {view_id: i if remap_ids else view_id for i, view_id in enumerate(view_ids.tolist())}
+    intrinsics = {}
+    extrinsics = {}
+    for view_id, key in view_key.items():
+      view = self.views[view_id]
+      v = View()
+      v.filename = view.filename
+      v.camera_name = view.camera_name
+      v.width = view.width
+      v.height = view.height
+      v.id = key
+      v.tags = list(view.tags)
+      if view.intrinsics is not None:
+        if id(view.intrinsics) not in intrinsics:
+          intrin = copy.copy(view.intrinsics)
+          intrin.distortions = list(view.intrinsics.distortions)
+          intrinsics[id(view.intrinsics)] = intrin
+        v.intrinsics = intrinsics[id(view.intrinsics)]
+      if view.pose is not None:
+        if id(view.pose) not in extrinsics:
+          extrin = Extrinsic()
+          extrin.camera_frame = view.pose.camera_frame.copy()
+          extrinsics[id(view.pose)] = extrin
+        v.pose = extrinsics[id(view.pose)]
+      result.views[key] = v
+
+    for source, copies, target in ((self.intrinsics, intrinsics, result.intrinsics),
+        (self.extrinsics, extrinsics, result.extrinsics)):
+      for key, value in sorted(source.items(), key=_id_order) if remap_ids else source.items():
+        if id(value) in copies:
+          target[len(target) if remap_ids else key] = copies[id(value)]
+
+    new_view_ids = tracks.view_ids[obs_mask]
+    landmark_ids = tracks.landmark_ids[keep]
+    if remap_ids:
+      new_view_ids = np.searchsorted(view_ids, new_view_ids)
+      # new ids follow the order of the old ids, not of the tracks
+      rank = np.empty(landmark_ids.shape[0], dtype=np.int64)
+      rank[np.argsort(landmark_ids, kind='stable')] = np.arange(landmark_ids.shape[0])
+      landmark_ids = rank
+    result.tracks = Tracks(landmark_ids, tracks.X[keep],
+      np.concatenate(([0], np.cumsum(lengths[keep]))).astype(np.int64),
+      new_view_ids, tracks.feat_ids[obs_mask], tracks.x[obs_mask])
+    return result
+
+  # version 2 stores cameras and tracks as packed little endian arrays
+  def dump_to_tag(self, f, version=1):
+    if version == 2:
+      f.write(bson.dumps(_tag_v2_content(self)))
+      return
+    elif version != 1:
+      raise RuntimeError('Unsupported tag format version {}'.format(version))
 
-  def dump_to_tag(self, f):
     placeholder_R = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
     placeholder_t = [0.0, 0.0, 0.0]
     content = {
@@ -191,7 +552,7 @@ class SfMData:
           {
             'tag_id': point_id,
             'type': 'TagCenterTrack',
-            'world_pt': landmark.X,
+            'world_pt': np.asarray(landmark.X).tolist(),
             'obs': [
               {
                 'image_pt': obs.x.tolist(),
@@ -205,81 +566,183 @@ class SfMData:
 
     f.write(bson.dumps(content))
 
-  def dump_to_openmvg(self, f):
-    raise NotImplementedError('current implementation is wrong')
-    intrinsics = {value: key for key, value in self.intrinsics.items()}
-    extrinsics = {value: key for key, value in self.extrinsics.items()}
-    content = {
-      'sfm_data_version': '0.3',
-      'root_path': self.root_path,
-      'views':[
-        {
-          'key': key,
-          'value': {
-            'polymorphic_id': 1073741824,
-            'ptr_wrapper': {
-              'id': 2147483649,
-              'data': {
-                'local_path': '',
-                'filename': view.filename,
-                'width': view.width,
-                'height': view.height,
-                'id_view': view.id,
-                'id_intrinsic': intrinsics[view.intrinsics] if view.intrinsics else -1,
-                'id_pose': extrinsics[view.pose] if view.pose else -1
-              }
-            }
-          }
-        } for key, view in self.views.items()
-      ],
-      'intrinsics': [
-        {
-          'key': key,
-          'value': {
-            'polymorphic_id': 2147483649,
-            'polymorphic_name': 'pinhole_radial_k3',
-            'ptr_wrapper': {
-              'id': 2147483793,
-              'data': {
-                'width': intrinsics.width,
-                'height': intrinsics.height,
-                'focal_length': (intrinsics.fx + intrinsics.fy) / 2,
-                'principal_point': [intrinsics.cx, intrinsics.cy],
-                'disto_k3': intrinsics.distortions
-              }
+  # streams the openMVG JSON document to the text file f; structure is written from
+  # tracks chunk_size landmarks at a time so memory does not grow with the scene
+  def dump_to_openmvg(self, f, chunk_size=10000):
+    intrinsics_keys = _openmvg_keys(self.intrinsics)
+    extrinsics_keys = _openmvg_keys(self.extrinsics)
+    f.write('{{\n    "sfm_data_version": "0.3",\n    "root_path": {},\n'.format(
+      json.dumps(self.root_path or '')))
+
+    # cereal numbers shared pointers in order of appearance
+    ptr_id = _OPENMVG_NEW_POINTER
+    f.write('    "views": [')
+    for i, (key, view) in enumerate(self.views.items()):
+      f.write(('\n' if i == 0 else ',\n') + json.dumps({
+        'key': int(key),
+        'value': {
+          'polymorphic_id': _OPENMVG_NON_POLYMORPHIC,
+          'ptr_wrapper': {
+            'id': ptr_id,
+            'data': {
+              'local_path': '',
+              'filename': view.filename,
+              'width': view.width,
+              'height': view.height,
+              'id_view': int(view.id),
+              'id_intrinsic': intrinsics_keys.get(id(view.intrinsics), _OPENMVG_UNDEFINED_INDEX),
+              'id_pose': extrinsics_keys.get(id(view.pose), _OPENMVG_UNDEFINED_INDEX)
             }
           }
-        } for key, intrinsics in self.intrinsics.items()
-      ],
-      'extrinsics': [
-        {
-          'key': key,
-          'value': {
-            'rotation': [list(row) for row in extrinsic.camera_frame[:3, :3].T],
-            'center': list(extrinsic.camera_frame[:3, 3])
-          }
-        } for key, extrinsic in self.extrinsics.items()
-      ],
-      'structure': [
-        {
-          'key': key,
-          'value': {
-            'X': list(landmark.X),
-            'observations': [
-              {
-                'key': view.id,
-                'value': {
-                  'id_feat': observation.id_feat,
-                  'x': list(observation.x)
-                }
-              } for view, observation in landmark.observations.items()
-            ]
-          }
-        } for key, landmark in self.structure.items()
-      ],
-      'control_points': []
+        }
+      }))
+      ptr_id += 1
+    f.write('\n    ],\n')
+
+    # cereal registers each polymorphic type by name on first use
+    polymorphic_ids = {}
+    f.write('    "intrinsics": [')
+    for i, intrin in enumerate(self.intrinsics.values()):
+      name, disto_name = _OPENMVG_INTRINSICS_NAMES[intrin.distortion_type]
+      data = {
+        'width': intrin.width,
+        'height': intrin.height,
+        'focal_length': float(intrin.fx) if intrin.fx == intrin.fy else [float(intrin.fx), float(intrin.fy)],
+        'principal_point': [float(intrin.cx), float(intrin.cy)]
+      }
+      if disto_name is not None:
+        data[disto_name] = [float(d) for d in intrin.distortions]
+      value = {}
+      if name in polymorphic_ids:
+        value['polymorphic_id'] = polymorphic_ids[name]
+      else:
+        polymorphic_ids[name] = len(polymorphic_ids) + 1
+        value['polymorphic_id'] = _OPENMVG_NEW_POINTER - 1 + polymorphic_ids[name]
+        value['polymorphic_name'] = name
+      value['ptr_wrapper'] = {'id': ptr_id, 'data': data}
+      ptr_id += 1
+      f.write(('\n' if i == 0 else ',\n') + json.dumps({'key': intrinsics_keys[id(intrin)],
+        'value': value}))
+    f.write('\n    ],\n')
+
+    f.write('    "extrinsics": [')
+    for i, extrin in enumerate(self.extrinsics.values()):
+      f.write(('\n' if i == 0 else ',\n') + json.dumps({
+        'key': extrinsics_keys[id(extrin)],
+        'value': {
+          'rotation': extrin.camera_frame[:3, :3].T.tolist(),
+          'center': extrin.camera_frame[:3, 3].tolist()
+        }
+      }))
+    f.write('\n    ],\n')
+
+    f.write('    "structure": [')
+    separator = '\n'
+    for tracks in self._track_chunks(chunk_size):
+      if tracks.num_landmarks():
+        f.write(separator + ',\n'.join(_openmvg_landmark_lines(tracks)))
+        separator = ',\n'
+    f.write('\n    ],\n    "control_points": []\n}\n')
+
+  # yields Tracks of chunk_size landmarks at a time; structure built from objects is
+  # converted chunk by chunk instead of building and caching tracks for all of it
+  def _track_chunks(self, chunk_size):
+    if self._tracks is None and self._structure is not None:
+      items = iter(self._structure.items())
+      while True:
+        chunk = dict(itertools.islice(items, chunk_size))
+        if not chunk:
+          return
+        yield Tracks.from_structure(chunk)
+    tracks = self.tracks
+    offsets = tracks.offsets
+    for start in range(0, tracks.num_landmarks(), chunk_size):
+      end = min(start + chunk_size, tracks.num_landmarks())
+      obs = slice(int(offsets[start]), int(offsets[end]))
+      yield Tracks(tracks.landmark_ids[start:end], tracks.X[start:end],
+        offsets[start:end + 1] - offsets[start], tracks.view_ids[obs], tracks.feat_ids[obs],
+        tracks.x[obs])
+
+# openMVG JSON lines of the landmarks in tracks; JSON has no nan or inf, so non finite
+# coordinates raise
+def _openmvg_landmark_lines(tracks):
+  invalid = ~np.all(np.isfinite(tracks.X), axis=1)
+  invalid[tracks.landmark_index()[~np.all(np.isfinite(tracks.x), axis=1)]] = True
+  if np.any(invalid):
+    raise RuntimeError('Landmark {} has non finite coordinates, JSON can not represent them'.format(
+      tracks.landmark_ids[np.argmax(invalid)]))
+  landmark_ids = tracks.landmark_ids.tolist()
+  X = tracks.X.tolist()
+  offsets = tracks.offsets.tolist()
+  view_ids = tracks.view_ids.tolist()
+  feat_ids = tracks.feat_ids.tolist()
+  x = tracks.x.tolist()
+  lines = []
+  for i, key in enumerate(landmark_ids):
+    observations = ','.join(_OPENMVG_OBSERVATION_FORMAT % (view_ids[k], feat_ids[k], x[k][0], x[k][1])
+      for k in range(offsets[i], offsets[i + 1]))
+    lines.append(_OPENMVG_LANDMARK_FORMAT % (key, X[i][0], X[i][1], X[i][2], observations))
+  return lines
+
+# openMVG keys are integers: {id(value): key} with the keys of mapping if they all are, else
+# numbered in order (e.g. the camera name keys of tag intrinsics)
+def _openmvg_keys(mapping):
+  if all(isinstance(key, (int, np.integer)) and not isinstance(key, bool) for key in mapping):
+    return {id(value): int(key) for key, value in mapping.items()}
+  return {id(value): i for i, value in enumerate(mapping.values())}
+
+def _tag_v2_content(sfm_data):
+  views = list(sfm_data.views.values())
+  R = np.tile(np.identity(3), (len(views), 1, 1))
+  t = np.zeros((len(views), 3))
+  for i, view in enumerate(views):
+    if view.pose is not None:
+      R[i] = view.pose.camera_frame[:3, :3].T
+      t[i] = -R[i] @ view.pose.camera_frame[:3, 3]
+  tracks = sfm_data.tracks
+  return {
+    'format_version': 2,
+    'intrinsics': {
+      'names': list(sfm_data.intrinsics.keys()),
+      # width, height, fx, fy, px, py
+      'params': np.array([[intrin.width, intrin.height, intrin.fx, intrin.fy, intrin.cx, intrin.cy]
+        for intrin in sfm_data.intrinsics.values()], dtype='<f8').tobytes(),
+      'distortion_params': np.array([distortion_from_openmvg_to_cv(list(intrin.distortions))
+        for intrin in sfm_data.intrinsics.values()], dtype='<f8').tobytes()
+    },
+    'views': {
+      'ids': np.array([view.id for view in views], dtype='<i8').tobytes(),
+      'names': [Path(view.filename).stem for view in views],
+      'filenames': [view.filename for view in views],
+      'camera_names': [view.camera_name for view in views],
+      'R': R.astype('<f8').tobytes(),
+      't': t.astype('<f8').tobytes(),
+      'valid_frame': np.array([view.pose is not None for view in views], dtype=np.uint8).tobytes(),
+      'tags': [[tag.to_json() for tag in view.tags] for view in views]
+    },
+    'structure': {
+      'type': 'TagCenterTrack',
+      'tag_ids': tracks.landmark_ids.astype('<i8').tobytes(),
+      'world_pts': tracks.X.astype('<f8').tobytes(),
+      'offsets': tracks.offsets.astype('<i8').tobytes(),
+      'view_ids': tracks.view_ids.astype('<i8').tobytes(),
+      'image_pts': tracks.x.astype('<f8').tobytes()
     }
-    json.dump(content, f, indent=4)
+  }
+
+_OPENMVG_NEW_POINTER = 2147483649
+_OPENMVG_NON_POLYMORPHIC = 1073741824
+_OPENMVG_UNDEFINED_INDEX = 4294967295
+_OPENMVG_INTRINSICS_NAMES = {
+  Intrinsics.NoDistortion: ('pinhole', None),
+  Intrinsics.DistortionRadial1: ('pinhole_radial_k1', 'disto_k1'),
+  Intrinsics.DistortionRadial3: ('pinhole_radial_k3', 'disto_k3'),
+  Intrinsics.DistortionRadial1_PBA: ('pinhole_radial_k1_pba', 'disto_k1_pba'),
+  Intrinsics.DistortionRadial3Brown2: ('pinhole_brown_t2', 'disto_t2')
+}
+# %r writes the shortest repr that round trips
+_OPENMVG_LANDMARK_FORMAT = '{"key":%d,"value":{"X":[%r,%r,%r],"observations":[%s]}}'
+_OPENMVG_OBSERVATION_FORMAT = '{"key":%d,"value":{"id_feat":%d,"x":[%r,%r]}}'
 
 def __parse_intrinsics(intrinsics):
   result = {}
@@ -308,8 +771,11 @@ def __parse_intrinsics(intrinsics):
     elif 'disto_k1_pba' in data:
       intrin.distortion_type = Intrinsics.DistortionRadial1_PBA
       intrin.distortions = data['disto_k1_pba']
-    elif 'disto_t2_2' in value['ptr_wrapper']['data']:
-      intrin.distortions = value['ptr_wrapper']['data']['disto_t2_2']
+    elif 'disto_t2' in data:
+      intrin.distortion_type = Intrinsics.DistortionRadial3Brown2
+      intrin.distortions = data['disto_t2']
+    elif 'disto_t2_2' in data:
+      intrin.distortions = data['disto_t2_2']
     result[key] = intrin
   return result
 
@@ -453,6 +919,52 @@ def __parse_tag_structure(structure, views):
 
   return result
 
+# remap tables are shared by all intrinsics with the same parameters; the cache holds at
+# most UNDISTORTION_CACHE_CAPACITY entries and UNDISTORTION_CACHE_BYTES bytes of maps, a
+# float64 unprojection map of a 12 MP camera alone is about 190 MB
+UNDISTORTION_CACHE_CAPACITY = 8
+UNDISTORTION_CACHE_BYTES = 512 << 20
+_undistortion_cache = LRUDict(UNDISTORTION_CACHE_CAPACITY)
+
+def _cached_map(key, build):
+  if key in _undistortion_cache:
+    result = _undistortion_cache[key]
+  else:
+    result = build()
+    for value in result:
+      value.flags.writeable = False
+  # move to the back of the eviction queue
+  _undistortion_cache[key] = result
+  # evict least recently used maps, a map larger than the budget is not kept
+  nbytes = sum(value.nbytes for maps in _undistortion_cache.values() for value in maps)
+  while nbytes > UNDISTORTION_CACHE_BYTES:
+    front_key, front = _undistortion_cache.front()
+    nbytes -= sum(value.nbytes for value in front)
+    del _undistortion_cache[front_key]
+  return result
+
+def _pixel_grid(intrinsics):
+  x, y = np.meshgrid(np.arange(intrinsics.width, dtype=float),
+    np.arange(intrinsics.height, dtype=float))
+  return np.vstack((x.ravel(), y.ravel()))
+
+# maps for undistorting an image to the same K (cv2.remap style):
+# map_x, map_y: [h, w] pixel in the distorted image sampled by each undistorted pixel
+def undistortion_maps(intrinsics):
+  def build():
+    pts = intrinsics.cam_2_img(intrinsics.add_disto(intrinsics.img_2_cam(_pixel_grid(intrinsics))))
+    shape = (intrinsics.height, intrinsics.width)
+    return (pts[0].reshape(shape).astype(np.float32), pts[1].reshape(shape).astype(np.float32))
+  return _cached_map(('remap',) + intrinsics.params_key(), build)
+
+# undistorted coords on the z = 1 plane of every pixel in the distorted image, [h, w, 2]
+# multiply by depth to unproject a depth map
+def unprojection_map(intrinsics):
+  def build():
+    pts = intrinsics.unproject(_pixel_grid(intrinsics))
+    return (pts.T.reshape((intrinsics.height, intrinsics.width, 2)),)
+  return _cached_map(('unproject',) + intrinsics.params_key(), build)[0]
+
 def load_openmvg_sfm_data(file, load_structure):
   content = json.load(file)
   result = SfMData()
@@ -469,14 +981,284 @@ def load_openmvg_sfm_data(file, load_structure):
 
   return result
 
-def load_tag_sfm_data(file, load_structure):
-  content = bson.loads(file.read())
+# TracksBuilder accumulates structure into growable typed arrays
+class TracksBuilder:
+  def __init__(self):
+    self.landmark_ids = array.array('q')
+    self.X = array.array('d')
+    self.offsets = array.array('q', [0])
+    self.view_ids = array.array('q')
+    self.feat_ids = array.array('q')
+    self.x = array.array('d')
+
+  # structure: list of openMVG structure elements
+  def add_openmvg_structure(self, structure):
+    for s in structure:
+      self.landmark_ids.append(s['key'])
+      value = s['value']
+      self.X.extend(value['X'])
+      for observation in value['observations']:
+        self.view_ids.append(observation['key'])
+        value = observation['value']
+        self.feat_ids.append(value['id_feat'])
+        self.x.extend(value['x'])
+      self.offsets.append(len(self.view_ids))
+
+  def build(self):
+    return Tracks(np.frombuffer(self.landmark_ids, dtype=np.int64),
+      np.frombuffer(self.X, dtype=float).reshape((-1, 3)),
+      np.frombuffer(self.offsets, dtype=np.int64),
+      np.frombuffer(self.view_ids, dtype=np.int64),
+      np.frombuffer(self.feat_ids, dtype=np.int64),
+      np.frombuffer(self.x, dtype=float).reshape((-1, 2)))
+
+  # structure: tag format structure document
+  def add_tag_structure(self, structure):
+    for track in structure['tracks']:
+      self.landmark_ids.append(track['tag_id'])
+      self.X.extend(track['world_pt'])
+      for observation in track['obs']:
+        self.view_ids.append(observation['view_id'])
+        self.feat_ids.append(-1)
+        self.x.extend(observation['image_pt'])
+      self.offsets.append(len(self.view_ids))
+
+_OPENMVG_CAMERA_SECTIONS = ('root_path', 'views', 'intrinsics', 'extrinsics')
+
+def __openmvg_cameras(content):
+  result = SfMData()
+  result.root_path = content['root_path']
+  result.intrinsics = __parse_intrinsics(content['intrinsics'])
+  result.extrinsics = __parse_extrinsics(content['extrinsics'])
+  result.views = __parse_views(content['views'], result.intrinsics, result.extrinsics)
+  return result
+
+def __stream_openmvg_structure(stream):
+  builder = TracksBuilder()
+  for structure in stream.iter_array():
+    builder.add_openmvg_structure(structure)
+  return builder.build()
+
+# file: binary file, structure is streamed into columnar tracks without building the
+# whole JSON document; Landmark objects are only created when SfMData.structure is used
+def load_openmvg_sfm_data_stream(file, load_structure, chunk_size=1 << 20):
+  stream = JsonStream(file, chunk_size)
+  content = {}
+  tracks = None
+  for key in stream.iter_object():
+    if key == 'structure' and load_structure:
+      tracks = __stream_openmvg_structure(stream)
+    elif key in _OPENMVG_CAMERA_SECTIONS:
+      content[key] = stream.read_value()
+    else:
+      stream.skip_value()
+
+  result = __openmvg_cameras(content)
+  if tracks is not None:
+    result.tracks = tracks
+
+  return result
+
+def __file_stamp(path):
+  stat = path.stat()
+  return (stat.st_size, stat.st_mtime_ns)
+
+def __check_file_stamp(path, stamp):
+  if __file_stamp(path) != stamp:
+    raise RuntimeError('{} changed since it was loaded'.format(path))
+
+# parses cameras right away and only records where structure starts, it is parsed on
+# first access to SfMData.structure, SfMData.tracks or View.observations
+def load_openmvg_sfm_data_lazy(path):
+  path = Path(path)
+  stamp = __file_stamp(path)
+  content = {}
+  structure_offset = None
+  with path.open('rb') as f:
+    stream = JsonStream(f)
+    for key in stream.iter_object():
+      if key == 'structure':
+        stream.peek()
+        structure_offset = stream.tell()
+        # structure is usually followed by control_points only
+        if all(section in content for section in _OPENMVG_CAMERA_SECTIONS):
+          break
+        stream.skip_value()
+      elif key in _OPENMVG_CAMERA_SECTIONS:
+        content[key] = stream.read_value()
+        if structure_offset is not None and all(section in content for section in _OPENMVG_CAMERA_SECTIONS):
+          break
+      else:
+        stream.skip_value()
+
+  result = __openmvg_cameras(content)
+  if structure_offset is not None:
+    def load_tracks():
+      __check_file_stamp(path, stamp)
+      with path.open('rb') as f:
+        stream = JsonStream(f)
+        stream.seek(structure_offset)
+        return __stream_openmvg_structure(stream)
+    result.set_tracks_loader(load_tracks)
+
+  return result
+
+# value sizes of the fixed size element types: double, undefined, ObjectId, bool, datetime,
+# null, int32, timestamp, int64, decimal128, max key and min key
+_BSON_FIXED_SIZES = {1: 8, 6: 0, 7: 12, 8: 1, 9: 8, 10: 0, 16: 4, 17: 8, 18: 8, 19: 16,
+  0x7F: 0, 0xFF: 0}
+
+def _read_bson_cstring(f):
+  result = b''
+  while True:
+    part = f.read(64)
+    end = part.find(b'\x00')
+    if end >= 0:
+      return result + part[:end]
+    if not part:
+      raise RuntimeError('Truncated BSON document')
+    result += part
+
+# yields (name, offset, length) of the top level elements of a BSON document, where
+# offset and length cover the whole element; values are skipped by seeking
+def _bson_elements(f):
+  start = f.tell()
+  size, = struct.unpack('<i', f.read(4))
+  pos = start + 4
+  while pos < start + size - 1:
+    f.seek(pos)
+    header = f.read(1)
+    element_type = header[0]
+    name = _read_bson_cstring(f)
+    value_offset = pos + 1 + len(name) + 1
+    if element_type in _BSON_FIXED_SIZES:
+      value_length = _BSON_FIXED_SIZES[element_type]
+    elif element_type == 11:
+      # regex: pattern and options cstrings
+      f.seek(value_offset)
+      value_length = len(_read_bson_cstring(f)) + 1
+      f.seek(value_offset + value_length)
+      value_length += len(_read_bson_cstring(f)) + 1
+    else:
+      f.seek(value_offset)
+      length, = struct.unpack('<i', f.read(4))
+      if element_type in (3, 4, 15):
+        value_length = length
+      elif element_type in (2, 13, 14):
+        value_length = 4 + length
+      elif element_type == 5:
+        value_length = 5 + length
+      elif element_type == 12:
+        # DBPointer: string and ObjectId
+        value_length = 4 + length + 12
+      else:
+        raise RuntimeError('Unsupported BSON element type {}'.format(element_type))
+    element_length = value_offset + value_length - pos
+    yield name.decode('utf-8'), pos, element_length
+    pos += element_length
+
+# decodes a single top level element found by _bson_elements
+def _read_bson_element(f, offset, length):
+  f.seek(offset)
+  data = f.read(length)
+  return bson.loads(struct.pack('<i', length + 5) + data + b'\x00')
+
+def __tag_format_version(content):
+  version = content.get('format_version', 1)
+  if version not in (1, 2):
+    raise RuntimeError('Unsupported tag format version {}'.format(version))
+  return version
+
+# parses cameras right away and reads structure on first access to SfMData.structure,
+# SfMData.tracks or View.observations
+def load_tag_sfm_data_lazy(path):
+  path = Path(path)
+  stamp = __file_stamp(path)
+  content = {}
+  with path.open('rb') as f:
+    elements = {name: (offset, length) for name, offset, length in _bson_elements(f)}
+    for name in ('format_version', 'intrinsics', 'views'):
+      if name in elements:
+        content.update(_read_bson_element(f, *elements[name]))
+
+  version = __tag_format_version(content)
+  result = __tag_cameras(content, version)
+  if 'structure' in elements:
+    def load_tracks():
+      __check_file_stamp(path, stamp)
+      with path.open('rb') as f:
+        structure = _read_bson_element(f, *elements['structure'])['structure']
+      if version == 2:
+        return __parse_tag_v2_tracks(structure)
+      builder = TracksBuilder()
+      builder.add_tag_structure(structure)
+      return builder.build()
+    result.set_tracks_loader(load_tracks)
+
+  return result
+
+# converts version 2 camera arrays to the version 1 layout, there are few of them
+def __tag_v2_to_v1_cameras(content):
+  intrinsics = content['intrinsics']
+  params = np.frombuffer(intrinsics['params'], dtype='<f8').reshape((-1, 6))
+  distortion_params = np.frombuffer(intrinsics['distortion_params'], dtype='<f8').reshape((-1, 5))
+  views = content['views']
+  ids = np.frombuffer(views['ids'], dtype='<i8').tolist()
+  R = np.frombuffer(views['R'], dtype='<f8').reshape((-1, 3, 3))
+  t = np.frombuffer(views['t'], dtype='<f8').reshape((-1, 3))
+  valid_frame = np.frombuffer(views['valid_frame'], dtype=np.uint8)
+  return [
+    {
+      'name': name,
+      'width': int(p[0]),
+      'height': int(p[1]),
+      'fx': float(p[2]),
+      'fy': float(p[3]),
+      'px': float(p[4]),
+      'py': float(p[5]),
+      'distortion_params': d.tolist()
+    } for name, p, d in zip(intrinsics['names'], params, distortion_params)
+  ], [
+    {
+      'id': ids[i],
+      'name': views['names'][i],
+      'filename': views['filenames'][i],
+      'camera_name': views['camera_names'][i],
+      'R': R[i],
+      't': t[i],
+      'tags': views['tags'][i],
+      'valid_frame': bool(valid_frame[i])
+    } for i in range(len(ids))
+  ]
+
+def __parse_tag_v2_tracks(structure):
+  view_ids = np.frombuffer(structure['view_ids'], dtype='<i8')
+  return Tracks(np.frombuffer(structure['tag_ids'], dtype='<i8'),
+    np.frombuffer(structure['world_pts'], dtype='<f8').reshape((-1, 3)),
+    np.frombuffer(structure['offsets'], dtype='<i8'),
+    view_ids,
+    np.full(view_ids.shape, -1, dtype=np.int64),
+    np.frombuffer(structure['image_pts'], dtype='<f8').reshape((-1, 2)))
+
+def __tag_cameras(content, version):
+  if version == 2:
+    intrinsics, views = __tag_v2_to_v1_cameras(content)
+  else:
+    intrinsics, views = content['intrinsics'], content['views']
   result = SfMData()
   result.root_path = None
-  result.intrinsics = __parse_tag_intrinsics(content['intrinsics'])
-  result.extrinsics = __parse_tag_extrinsics(content['views'])
-  result.views = __parse_tag_views(content['views'], result.intrinsics, result.extrinsics)
-  if load_structure:
+  result.intrinsics = __parse_tag_intrinsics(intrinsics)
+  result.extrinsics = __parse_tag_extrinsics(views)
+  result.views = __parse_tag_views(views, result.intrinsics, result.extrinsics)
+  return result
+
+def load_tag_sfm_data(file, load_structure):
+  content = bson.loads(file.read())
+  version = __tag_format_version(content)
+  result = __tag_cameras(content, version)
+  if load_structure and version == 2:
+    result.tracks = __parse_tag_v2_tracks(content['structure'])
+  elif load_structure:
     result.structure = __parse_tag_structure(content['structure'], result.views)
 
     for landmark in result.structure.values():
@@ -485,11 +1267,250 @@ def load_tag_sfm_data(file, load_structure):
 
   return result
 
-def load_sfm_data(path, load_structure=True):
+# flattens SfMData into (meta, arrays): meta holds small JSON serializable values and
+# arrays holds numpy arrays for poses and tracks, so it can be cached or pickled cheaply
+def sfm_data_to_arrays(sfm_data, include_structure=True):
+  intrinsics_index = {id(intrin): i for i, intrin in enumerate(sfm_data.intrinsics.values())}
+  extrinsics_index = {id(extrin): i for i, extrin in enumerate(sfm_data.extrinsics.values())}
+  meta = {
+    'root_path': sfm_data.root_path,
+    'intrinsics': [
+      {
+        'key': key,
+        'width': intrin.width,
+        'height': intrin.height,
+        'fx': float(intrin.fx),
+        'fy': float(intrin.fy),
+        'cx': float(intrin.cx),
+        'cy': float(intrin.cy),
+        'distortion_type': intrin.distortion_type,
+        'distortions': [float(d) for d in intrin.distortions]
+      } for key, intrin in sfm_data.intrinsics.items()
+    ],
+    'extrinsics': list(sfm_data.extrinsics.keys()),
+    'views': [
+      {
+        'key': key,
+        'id': view.id,
+        'filename': view.filename,
+        'camera_name': view.camera_name,
+        'width': view.width,
+        'height': view.height,
+        'intrinsics': intrinsics_index.get(id(view.intrinsics), -1),
+        'pose': extrinsics_index.get(id(view.pose), -1),
+        'tags': [tag.to_json() for tag in view.tags]
+      } for key, view in sfm_data.views.items()
+    ],
+    'has_structure': include_structure
+  }
+  arrays = {
+    'camera_frames': np.array([extrin.camera_frame for extrin in sfm_data.extrinsics.values()],
+      dtype=float).reshape((-1, 4, 4))
+  }
+  if include_structure:
+    tracks = sfm_data.tracks
+    for name in ('landmark_ids', 'X', 'offsets', 'view_ids', 'feat_ids', 'x'):
+      arrays['tracks.' + name] = getattr(tracks, name)
+  return meta, arrays
+
+def sfm_data_from_arrays(meta, arrays):
+  result = SfMData()
+  result.root_path = meta['root_path']
+  intrinsics = []
+  for data in meta['intrinsics']:
+    intrin = Intrinsics()
+    intrin.width = data['width']
+    intrin.height = data['height']
+    intrin.fx = data['fx']
+    intrin.fy = data['fy']
+    intrin.cx = data['cx']
+    intrin.cy = data['cy']
+    intrin.distortion_type = data['distortion_type']
+    intrin.distortions = data['distortions']
+    result.intrinsics[data['key']] = intrin
+    intrinsics.append(intrin)
+  extrinsics = []
+  for key, camera_frame in zip(meta['extrinsics'], arrays['camera_frames']):
+    extrin = Extrinsic()
+    extrin.camera_frame = np.array(camera_frame)
+    result.extrinsics[key] = extrin
+    extrinsics.append(extrin)
+  for data in meta['views']:
+    v = View()
+    v.id = data['id']
+    v.filename = data['filename']
+    v.camera_name = data['camera_name']
+    v.width = data['width']
+    v.height = data['height']
+    if data['intrinsics'] >= 0:
+      v.intrinsics = intrinsics[data['intrinsics']]
+    if data['pose'] >= 0:
+      v.pose = extrinsics[data['pose']]
+    v.tags = [NamedTag.from_json(tag) for tag in data['tags']]
+    result.views[data['key']] = v
+  if meta['has_structure']:
+    result.tracks = Tracks(*(arrays['tracks.' + name]
+      for name in ('landmark_ids', 'X', 'offsets', 'view_ids', 'feat_ids', 'x')))
+  return result
+
+_CACHE_MAGIC = b'VCSFMC01'
+_CACHE_ALIGNMENT = 64
+
+def sfm_cache_path(path):
+  path = Path(path)
+  return path.with_name(path.name + '.cache')
+
+def __file_hash(path):
+  digest = hashlib.blake2b()
+  with path.open('rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+def __source_key(path):
+  stat = path.stat()
+  return {
+    'path': str(path.resolve()),
+    'size': stat.st_size,
+    'mtime_ns': stat.st_mtime_ns
+  }
+
+def __cache_data_start(header_size):
+  return -(-(len(_CACHE_MAGIC) + 8 + header_size) // _CACHE_ALIGNMENT) * _CACHE_ALIGNMENT
+
+# stamp and content hash of the sfm file at path, take it before parsing the file so that
+# a file changing during the parse is not cached under its new stamp
+def sfm_cache_source(path):
+  path = Path(path)
+  source = __source_key(path)
+  source['hash'] = __file_hash(path)
+  return source
+
+# cache layout: magic, uint64 header size, JSON header, then 64 byte aligned raw arrays
+# include_structure: False writes poses and cameras only
+# source: sfm_cache_source of path from before sfm_data was loaded, taken now if None
+def write_sfm_cache(sfm_data, path, include_structure=True, source=None):
+  path = Path(path)
+  meta, arrays = sfm_data_to_arrays(sfm_data, include_structure)
+  if source is None:
+    source = sfm_cache_source(path)
+
+  array_table = {}
+  offset = 0
+  for name, value in arrays.items():
+    value = np.ascontiguousarray(value)
+    arrays[name] = value
+    array_table[name] = {'dtype': value.dtype.str, 'shape': list(value.shape), 'offset': offset}
+    offset += -(-value.nbytes // _CACHE_ALIGNMENT) * _CACHE_ALIGNMENT
+  header = json.dumps({'source': source, 'meta': meta, 'arrays': array_table}).encode()
+  data_start = __cache_data_start(len(header))
+
+  # a unique temporary file, so concurrent writers do not interleave, renamed over the cache
+  cache_path = sfm_cache_path(path)
+  with tempfile.NamedTemporaryFile(dir=cache_path.parent, prefix=cache_path.name,
+      suffix='.tmp', delete=False) as f:
+    try:
+      f.write(_CACHE_MAGIC)
+      f.write(struct.pack('<Q', len(header)))
+      f.write(header)
+      for name, value in arrays.items():
+        f.seek(data_start + array_table[name]['offset'])
+        f.write(value.tobytes())
+      f.truncate(data_start + offset)
+    except BaseException:
+      f.close()
+      os.unlink(f.name)
+      raise
+  os.replace(f.name, cache_path)
+
+# rewrites the source stamp of a cache whose file content matched by hash, so the next read
+# does not hash again; the header is space padded in place, a stamp that does not fit the
+# header size is left for the next read to hash
+def __refresh_cache_source(cache_path, header, header_size, key):
+  header['source'].update(key)
+  data = json.dumps(header).encode()
+  if len(data) > header_size:
+    return
+  try:
+    with cache_path.open('r+b') as f:
+      f.seek(len(_CACHE_MAGIC) + 8)
+      f.write(data.ljust(header_size))
+  except OSError:
+    pass
+
+# returns the cached SfMData of path, or None if there is no valid cache; a truncated or
+# corrupt cache is a miss
+# mmap: memory map the arrays instead of reading them
+# load_structure: False skips the tracks, a cache without tracks is a miss when True
+def read_sfm_cache(path, mmap=True, load_structure=True):
+  path = Path(path)
+  cache_path = sfm_cache_path(path)
+  try:
+    with cache_path.open('rb') as f:
+      if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+        return None
+      header_size, = struct.unpack('<Q', f.read(8))
+      header = json.loads(f.read(header_size))
+      cache_size = os.fstat(f.fileno()).st_size
+    source = header['source']
+    meta = header['meta']
+    array_table = header['arrays']
+  except (OSError, ValueError, KeyError, TypeError, struct.error):
+    return None
+  if load_structure and not meta['has_structure']:
+    return None
+  data_start = __cache_data_start(header_size)
+
+  # a touched or copied file is still valid if its content did not change
+  key = __source_key(path)
+  if any(source[name] != key[name] for name in key):
+    if source['size'] != key['size'] or source['hash'] != __file_hash(path):
+      return None
+    __refresh_cache_source(cache_path, header, header_size, key)
+
+  arrays = {}
+  for name, info in array_table.items():
+    if name.startswith('tracks.') and not load_structure:
+      continue
+    dtype = np.dtype(info['dtype'])
+    shape = tuple(info['shape'])
+    count = int(np.prod(shape))
+    if data_start + info['offset'] + count * dtype.itemsize > cache_size:
+      return None
+    if mmap and count > 0:
+      arrays[name] = np.memmap(cache_path, dtype=dtype, mode='r',
+        offset=data_start + info['offset'], shape=shape)
+    else:
+      arrays[name] = np.fromfile(cache_path, dtype=dtype, count=count,
+        offset=data_start + info['offset']).reshape(shape)
+  result = sfm_data_from_arrays(dict(meta, has_structure=load_structure), arrays)
+  if not load_structure:
+    result.structure = {}
+  return result
+
+# lazy: parse cameras only and defer structure until it is used
+# cache: read parsed data from a binary sidecar file next to path, written on first load;
+# a cold load reads the file twice, once more to hash it, so that a touched or copied file
+# with the same content still hits the cache
+def load_sfm_data(path, load_structure=True, lazy=False, cache=False, mmap=True):
   path = Path(path)
+  if cache:
+    result = read_sfm_cache(path, mmap, load_structure)
+    if result is None:
+      source = sfm_cache_source(path)
+      result = load_sfm_data(path, load_structure)
+      write_sfm_cache(result, path, load_structure, source)
+    return result
+
+  if lazy and load_structure:
+    if path.suffix == '.json':
+      return load_openmvg_sfm_data_lazy(path)
+    elif path.suffix == '.bson':
+      return load_tag_sfm_data_lazy(path)
+
   if path.suffix == '.json':
-    with path.open('r') as f:
-      return load_openmvg_sfm_data(f, load_structure)
+    with path.open('rb') as f:
+      return load_openmvg_sfm_data_stream(f, load_structure)
   elif path.suffix == '.bson':
     with path.open('rb') as f:
       return load_tag_sfm_data(f, load_structure)
@@ -0,0 +1,469 @@
+import unittest, copy, io, json, os, struct, tempfile, warnings
+from pathlib import Path
+import bson
+import numpy as np
+from vcpy import sfmdata
+from vcpy.sfmdata import SfMData, View, Intrinsics, Extrinsic, Landmark, Observation, Tracks, \
+  undistortion_maps, unprojection_map, load_openmvg_sfm_data, load_openmvg_sfm_data_stream, \
+  load_sfm_data, sfm_cache_path, sfm_cache_source, write_sfm_cache
+
+# scenes and documents shared by the sfm tests
+def make_openmvg_doc(num_views=3, num_landmarks=20, seed=0):
+  rng = np.random.default_rng(seed)
+  views = [{'key': i, 'value': {'polymorphic_id': 1073741824, 'ptr_wrapper': {'id': 2147483649 + i,
+    'data': {'local_path': '', 'filename': 'img_{}.jpg'.format(i), 'width': 64, 'height': 48,
+    'id_view': i, 'id_intrinsic': 0, 'id_pose': i}}}} for i in range(num_views)]
+  intrinsics = [{'key': 0, 'value': {'polymorphic_id': 2147483649, 'polymorphic_name': 'pinhole_radial_k3',
+    'ptr_wrapper': {'id': 2147483649 + num_views, 'data': {'width': 64, 'height': 48,
+    'focal_length': 50.0, 'principal_point': [32.0, 24.0], 'disto_k3': [0.01, 0.0, 0.0]}}}}]
+  extrinsics = [{'key': i, 'value': {'rotation': np.identity(3).tolist(),
+    'center': [float(i), 0.0, -5.0]}} for i in range(num_views)]
+  structure = [{'key': i * 2, 'value': {'X': rng.normal(size=3).tolist(), 'observations': [
+    {'key': v, 'value': {'id_feat': i, 'x': rng.uniform(0, 48, 2).tolist()}}
+    for v in range(num_views) if rng.uniform() < 0.8]}} for i in range(num_landmarks)]
+  return {'sfm_data_version': '0.3', 'root_path': '/images', 'views': views,
+    'intrinsics': intrinsics, 'extrinsics': extrinsics, 'structure': structure, 'control_points': []}
+
+def assert_same_sfm_data(test, a, b):
+  test.assertEqual(a.root_path, b.root_path)
+  test.assertEqual(sorted(a.views), sorted(b.views))
+  for key, view in a.views.items():
+    other = b.views[key]
+    test.assertEqual((view.filename, view.width, view.height, view.id),
+      (other.filename, other.width, other.height, other.id))
+    if view.pose is None:
+      test.assertIsNone(other.pose)
+    else:
+      test.assertTrue(np.allclose(view.pose.camera_frame, other.pose.camera_frame))
+    test.assertEqual(view.intrinsics.params_key(), other.intrinsics.params_key())
+    test.assertEqual(len(view.observations), len(other.observations))
+  test.assertEqual(list(a.structure), list(b.structure))
+  for key, landmark in a.structure.items():
+    other = b.structure[key]
+    test.assertTrue(np.allclose(landmark.X, other.X))
+    test.assertEqual([view.id for view in landmark.observations],
+      [view.id for view in other.observations])
+    for view, ob in landmark.observations.items():
+      other_ob = other.observations[b.views[view.id]]
+      test.assertEqual(ob.id_feat, other_ob.id_feat)
+      test.assertTrue(np.allclose(ob.x, other_ob.x))
+
+def make_intrinsics(distortion_type, distortions):
+  intrin = Intrinsics()
+  intrin.width, intrin.height = 64, 48
+  intrin.fx, intrin.fy, intrin.cx, intrin.cy = 50.0, 52.0, 31.5, 23.0
+  intrin.distortion_type = distortion_type
+  intrin.distortions = distortions
+  return intrin
+
+def make_scene(num_views=4, num_landmarks=50, seed=0):
+  rng = np.random.default_rng(seed)
+  sfm_data = SfMData()
+  intrin = Intrinsics()
+  intrin.width, intrin.height = 640, 480
+  intrin.fx, intrin.fy, intrin.cx, intrin.cy = 500.0, 510.0, 320.0, 240.0
+  intrin.distortion_type = Intrinsics.DistortionRadial3
+  intrin.distortions = [0.01, -0.002, 0.0005]
+  sfm_data.intrinsics[0] = intrin
+  for i in range(num_views):
+    extrin = Extrinsic()
+    extrin.camera_frame[:3, 3] = [i * 0.5, 0.0, -5.0]
+    sfm_data.extrinsics[i] = extrin
+    view = View()
+    view.id = i
+    view.intrinsics = intrin
+    view.pose = extrin
+    sfm_data.views[i] = view
+  structure = {}
+  for i in range(num_landmarks):
+    landmark = Landmark()
+    landmark.id = i
+    landmark.X = rng.uniform(-1.0, 1.0, 3)
+    for view in sfm_data.views.values():
+      if rng.uniform() < 0.7:
+        ob = Observation()
+        ob.id_feat = i
+        ob.x = view.project(landmark.X[:, np.newaxis])[:, 0] + rng.normal(0.0, 0.5, 2)
+        landmark.observations[view] = ob
+        view.observations[landmark] = ob
+    structure[i] = landmark
+  sfm_data.structure = structure
+  return sfm_data
+
+class TestUndistortion(unittest.TestCase):
+  cases = [
+    (Intrinsics.NoDistortion, []),
+    (Intrinsics.DistortionRadial1, [-0.1]),
+    (Intrinsics.DistortionRadial3, [-0.1, 0.02, -0.003]),
+    (Intrinsics.DistortionRadial3Brown2, [-0.1, 0.02, -0.003, 0.001, -0.002]),
+  ]
+
+  def test_remove_disto(self):
+    pts = np.random.default_rng(0).uniform(-0.6, 0.6, (2, 100))
+    for distortion_type, distortions in self.cases:
+      intrin = make_intrinsics(distortion_type, distortions)
+      undistorted = intrin.remove_disto(intrin.add_disto(pts))
+      self.assertTrue(np.allclose(undistorted, pts, atol=1e-8))
+
+  def test_remove_disto_not_converged(self):
+    intrin = make_intrinsics(Intrinsics.DistortionRadial1, [-0.5])
+    pts = np.array([[0.1, 1.2], [0.1, 1.2]])
+    with self.assertWarns(RuntimeWarning) as context:
+      intrin.remove_disto(pts)
+    self.assertIn('1 of 2 points', str(context.warning))
+    with warnings.catch_warnings():
+      warnings.simplefilter('error')
+      intrin.remove_disto(pts[:, :1])
+
+  def test_map_cache_bytes(self):
+    intrin = make_intrinsics(Intrinsics.DistortionRadial1, [-0.05])
+    budget = sfmdata.UNDISTORTION_CACHE_BYTES
+    # one 64 x 48 unprojection map is 49152 bytes
+    sfmdata.UNDISTORTION_CACHE_BYTES = 60000
+    try:
+      rays = unprojection_map(intrin)
+      self.assertIs(unprojection_map(intrin), rays)
+      unprojection_map(make_intrinsics(Intrinsics.DistortionRadial1, [-0.04]))
+      self.assertIsNot(unprojection_map(intrin), rays)
+      sfmdata.UNDISTORTION_CACHE_BYTES = 1000
+      self.assertIsNot(unprojection_map(intrin), unprojection_map(intrin))
+    finally:
+      sfmdata.UNDISTORTION_CACHE_BYTES = budget
+
+  def test_maps(self):
+    for distortion_type, distortions in self.cases:
+      intrin = make_intrinsics(distortion_type, distortions)
+      map_x, map_y = undistortion_maps(intrin)
+      self.assertEqual(map_x.shape, (intrin.height, intrin.width))
+      rays = unprojection_map(intrin)
+      self.assertEqual(rays.shape, (intrin.height, intrin.width, 2))
+      pixel = np.array([[5.0], [7.0]])
+      self.assertTrue(np.allclose(rays[7, 5], intrin.unproject(pixel)[:, 0]))
+      self.assertTrue(np.allclose(intrin.project(np.append(rays[7, 5], 1.0)[:, np.newaxis], True),
+        pixel))
+      # intrinsics with equal parameters share the tables
+      self.assertIs(unprojection_map(make_intrinsics(distortion_type, list(distortions))), rays)
+
+class TestOpenMVG(unittest.TestCase):
+  def test_stream_loader(self):
+    data = json.dumps(make_openmvg_doc(), indent=4).encode()
+    expected = load_openmvg_sfm_data(io.StringIO(data.decode()), True)
+    for chunk_size in (7, 64, 1 << 20):
+      result = load_openmvg_sfm_data_stream(io.BytesIO(data), True, chunk_size)
+      # observations are linked into views before structure is touched
+      self.assertEqual(len(result.views[1].observations), len(expected.views[1].observations))
+      assert_same_sfm_data(self, expected, result)
+    result = load_openmvg_sfm_data_stream(io.BytesIO(data), False)
+    self.assertEqual(len(result.structure), 0)
+
+  def test_dump(self):
+    doc = make_openmvg_doc()
+    expected = load_openmvg_sfm_data(io.StringIO(json.dumps(doc)), True)
+    brown = Intrinsics()
+    brown.width, brown.height, brown.fx, brown.fy, brown.cx, brown.cy = 64, 48, 50.0, 51.0, 32.0, 24.0
+    brown.distortion_type = Intrinsics.DistortionRadial3Brown2
+    brown.distortions = [0.01, 0.0, 0.0, 0.001, 0.0]
+    expected.intrinsics[1] = brown
+    expected.views[2].intrinsics = brown
+    for chunk_size in (3, 10000):
+      f = io.StringIO()
+      expected.dump_to_openmvg(f, chunk_size)
+      result = load_openmvg_sfm_data(io.StringIO(f.getvalue()), True)
+      assert_same_sfm_data(self, expected, result)
+
+  def test_dump_json_load(self):
+    def reject(name):
+      raise ValueError('{} is not JSON'.format(name))
+    expected = load_openmvg_sfm_data(io.StringIO(json.dumps(make_openmvg_doc())), True)
+    # tag data keys intrinsics by camera name
+    expected.intrinsics = {'camera_{}'.format(key): intrin
+      for key, intrin in expected.intrinsics.items()}
+    # structure built from objects and from tracks write the same document
+    documents = []
+    for tracks in (None, expected.tracks):
+      if tracks is not None:
+        expected.tracks = tracks
+      for chunk_size in (1, 10000):
+        f = io.StringIO()
+        expected.dump_to_openmvg(f, chunk_size)
+        doc = json.loads(f.getvalue(), parse_constant=reject)
+        self.assertEqual([intrin['key'] for intrin in doc['intrinsics']],
+          list(range(len(expected.intrinsics))))
+        self.assertTrue(all(view['value']['ptr_wrapper']['data']['id_intrinsic'] == 0
+          for view in doc['views']))
+        documents.append(f.getvalue())
+    self.assertEqual(len(set(documents)), 1)
+    result = load_openmvg_sfm_data(io.StringIO(documents[0]), True).tracks
+    self.assertTrue(np.array_equal(result.X, tracks.X))
+    self.assertTrue(np.array_equal(result.x, tracks.x))
+
+    # JSON has no nan or inf
+    for name, value in (('X', [np.nan, 0.0, 0.0]), ('x', [np.inf, 0.0])):
+      invalid = Tracks(tracks.landmark_ids, tracks.X.copy(), tracks.offsets, tracks.view_ids,
+        tracks.feat_ids, tracks.x.copy())
+      getattr(invalid, name)[3] = value
+      expected.tracks = invalid
+      with self.assertRaises(RuntimeError):
+        expected.dump_to_openmvg(io.StringIO())
+
+  def test_lazy_loader(self):
+    doc = make_openmvg_doc()
+    # structure before a camera section still works
+    doc = {key: doc[key] for key in ('sfm_data_version', 'root_path', 'views', 'structure',
+      'intrinsics', 'extrinsics', 'control_points')}
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(doc))
+      expected = load_sfm_data(path)
+      result = load_sfm_data(path, lazy=True)
+      self.assertEqual(len(result.views[0].observations), len(expected.views[0].observations))
+      assert_same_sfm_data(self, expected, result)
+      # structure is read on first access, so a file changed before that fails
+      result = load_sfm_data(path, lazy=True)
+      with path.open('a') as f:
+        f.write(' ')
+      with self.assertRaises(RuntimeError):
+        result.structure
+
+  def test_cache(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(make_openmvg_doc()))
+      expected = load_sfm_data(path)
+      result = load_sfm_data(path, cache=True)
+      self.assertTrue(sfm_cache_path(path).exists())
+      assert_same_sfm_data(self, expected, result)
+      for mmap in (True, False):
+        result = load_sfm_data(path, cache=True, mmap=mmap)
+        self.assertEqual(isinstance(result.tracks.X, np.memmap), mmap)
+        assert_same_sfm_data(self, expected, result)
+      self.assertEqual(len(load_sfm_data(path, load_structure=False, cache=True).structure), 0)
+      # touching the file keeps the cache, changing it does not
+      stat = path.stat()
+      os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+      self.assertIsInstance(load_sfm_data(path, cache=True).tracks.X, np.memmap)
+      doc = make_openmvg_doc(num_landmarks=5)
+      path.write_text(json.dumps(doc))
+      self.assertEqual(len(load_sfm_data(path, cache=True).structure), 5)
+
+  def test_cache_refreshes_source_stamp(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(make_openmvg_doc()))
+      load_sfm_data(path, cache=True)
+      stat = path.stat()
+      os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+      load_sfm_data(path, cache=True)
+      with sfm_cache_path(path).open('rb') as f:
+        f.seek(8)
+        header_size, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+      self.assertEqual(header['source']['mtime_ns'], path.stat().st_mtime_ns)
+
+  def test_corrupt_cache(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(make_openmvg_doc()))
+      expected = load_sfm_data(path)
+      load_sfm_data(path, cache=True)
+      cache_path = sfm_cache_path(path)
+      data = cache_path.read_bytes()
+      for corrupt in (data[:len(data) // 2], data[:20], data[:16] + b'x' * (len(data) - 16)):
+        cache_path.write_bytes(corrupt)
+        assert_same_sfm_data(self, expected, load_sfm_data(path, cache=True))
+        self.assertEqual(cache_path.read_bytes(), data)
+      self.assertEqual(sorted(p.name for p in Path(tmp).iterdir()), [path.name, cache_path.name])
+
+  def test_cache_source_changed_during_load(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(make_openmvg_doc()))
+      source = sfm_cache_source(path)
+      stale = load_sfm_data(path)
+      # the file changes between parsing and writing the cache
+      path.write_text(json.dumps(make_openmvg_doc(num_landmarks=5)))
+      write_sfm_cache(stale, path, source=source)
+      self.assertEqual(len(load_sfm_data(path, cache=True).structure), 5)
+
+  def test_cache_without_structure(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.json'
+      path.write_text(json.dumps(make_openmvg_doc()))
+      expected = load_sfm_data(path)
+      result = load_sfm_data(path, load_structure=False, cache=True)
+      self.assertEqual(len(result.structure), 0)
+      self.assertEqual(len(result.views), len(expected.views))
+      result = load_sfm_data(path, load_structure=False, cache=True)
+      self.assertEqual(len(result.structure), 0)
+      # the cache written without structure is a miss for a full load
+      assert_same_sfm_data(self, expected, load_sfm_data(path, cache=True))
+      assert_same_sfm_data(self, expected, load_sfm_data(path, cache=True))
+
+class TestTag(unittest.TestCase):
+  def test_lazy_loader(self):
+    sfm_data = load_openmvg_sfm_data(io.StringIO(json.dumps(make_openmvg_doc())), True)
+    intrin = sfm_data.intrinsics[0]
+    intrin.distortion_type = Intrinsics.DistortionRadial3Brown2
+    intrin.distortions = [0.01, 0.0, 0.0, 0.001, 0.0]
+    # tag intrinsics are keyed by camera name
+    sfm_data.intrinsics = {'0': intrin}
+    sfm_data.views[1].pose = None
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.bson'
+      with path.open('wb') as f:
+        sfm_data.dump_to_tag(f)
+      expected = load_sfm_data(path)
+      self.assertIsNone(expected.views[1].pose)
+      result = load_sfm_data(path, lazy=True)
+      self.assertEqual(len(result.tracks.landmark_ids), len(expected.structure))
+      assert_same_sfm_data(self, expected, result)
+      result = load_sfm_data(path, lazy=True)
+      data = path.read_bytes()
+      path.write_bytes(data + b'\x00')
+      with self.assertRaises(RuntimeError):
+        result.tracks
+      path.write_bytes(data)
+
+      # version 2 reads back the same as version 1
+      with path.open('wb') as f:
+        sfm_data.dump_to_tag(f, version=2)
+      for lazy in (False, True):
+        result = load_sfm_data(path, lazy=lazy)
+        self.assertIsNone(result.views[1].pose)
+        assert_same_sfm_data(self, expected, result)
+
+  def test_unknown_format_version(self):
+    sfm_data = load_openmvg_sfm_data(io.StringIO(json.dumps(make_openmvg_doc())), True)
+    intrin = sfm_data.intrinsics[0]
+    intrin.distortion_type = Intrinsics.DistortionRadial3Brown2
+    intrin.distortions = [0.01, 0.0, 0.0, 0.001, 0.0]
+    sfm_data.intrinsics = {'0': intrin}
+    f = io.BytesIO()
+    sfm_data.dump_to_tag(f, version=2)
+    content = bson.loads(f.getvalue())
+    content['format_version'] = 3
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.bson'
+      path.write_bytes(bson.dumps(content))
+      for lazy in (False, True):
+        with self.assertRaises(RuntimeError):
+          load_sfm_data(path, lazy=lazy)
+
+  def test_lazy_loader_element_types(self):
+    sfm_data = load_openmvg_sfm_data(io.StringIO(json.dumps(make_openmvg_doc())), True)
+    intrin = sfm_data.intrinsics[0]
+    intrin.distortion_type = Intrinsics.DistortionRadial3Brown2
+    intrin.distortions = [0.01, 0.0, 0.0, 0.001, 0.0]
+    sfm_data.intrinsics = {'0': intrin}
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'sfm_data.bson'
+      f = io.BytesIO()
+      sfm_data.dump_to_tag(f)
+      # decimal128, regex, max key and min key elements are skipped
+      extra = b'\x13dec\x00' + bytes(16) + b'\x0bre\x00a.*\x00i\x00' + b'\x7fmax\x00' + \
+        b'\xffmin\x00'
+      data = f.getvalue()
+      path.write_bytes(data)
+      expected = load_sfm_data(path)
+      path.write_bytes(struct.pack('<i', len(data) + len(extra)) + data[4:-1] + extra + b'\x00')
+      assert_same_sfm_data(self, expected, load_sfm_data(path, lazy=True))
+
+class TestSfMData(unittest.TestCase):
+  def test_empty_tracks(self):
+    sfm_data = SfMData()
+    sfm_data.tracks = None
+    self.assertEqual(sfm_data.tracks.num_landmarks(), 0)
+    self.assertEqual(sfm_data.structure, {})
+
+class TestViewArrays(unittest.TestCase):
+  def test_index_of(self):
+    sfm_data = load_openmvg_sfm_data(io.StringIO(json.dumps(make_openmvg_doc())), True)
+    view_arrays = sfm_data.view_arrays()
+    view_ids = sorted(sfm_data.views)
+    self.assertTrue(np.array_equal(view_arrays.index_of(view_ids[::-1]),
+      np.arange(len(view_ids))[::-1]))
+    self.assertEqual(view_arrays.index_of(view_ids[1]), 1)
+    for missing in ([view_ids[0], 99], -1, [max(view_ids) + 1]):
+      with self.assertRaises(KeyError):
+        view_arrays.index_of(missing)
+    with self.assertRaises(KeyError):
+      SfMData().view_arrays().index_of([0])
+
+class TestSubset(unittest.TestCase):
+  def setUp(self):
+    self.sfm_data = load_openmvg_sfm_data(io.StringIO(json.dumps(make_openmvg_doc(5, 200))), True)
+
+  def test_subset(self):
+    result = self.sfm_data.subset([1, 3, 4], min_views=2)
+    self.assertEqual(sorted(result.views), [1, 3, 4])
+    self.assertIsNot(result.views[1], self.sfm_data.views[1])
+    for key, landmark in result.structure.items():
+      original = self.sfm_data.structure[key]
+      expected = sorted(view.id for view in original.observations if view.id in (1, 3, 4))
+      self.assertGreaterEqual(len(expected), 2)
+      self.assertEqual(sorted(view.id for view in landmark.observations), expected)
+      self.assertTrue(np.allclose(landmark.X, original.X))
+    self.assertEqual(len(result.structure), sum(1 for landmark in self.sfm_data.structure.values()
+      if len([v for v in landmark.observations if v.id in (1, 3, 4)]) >= 2))
+
+    remapped = self.sfm_data.subset([1, 3, 4], min_views=2, remap_ids=True)
+    self.assertEqual(sorted(remapped.views), [0, 1, 2])
+    self.assertEqual(sorted(remapped.extrinsics), [0, 1, 2])
+    self.assertEqual(list(remapped.structure), list(range(len(result.structure))))
+    self.assertTrue(np.allclose(remapped.views[2].pose.camera_frame,
+      self.sfm_data.views[4].pose.camera_frame))
+    self.assertTrue(np.array_equal(remapped.tracks.x, result.tracks.x))
+
+  def test_subset_remap_out_of_order_ids(self):
+    sfm_data = self.sfm_data
+    # keys inserted out of id order
+    intrin = sfm_data.intrinsics[0]
+    sfm_data.views[4].intrinsics = copy.copy(intrin)
+    sfm_data.intrinsics = {5: intrin, 2: sfm_data.views[4].intrinsics}
+    sfm_data.extrinsics = dict(reversed(list(sfm_data.extrinsics.items())))
+    tracks = sfm_data.tracks
+    sfm_data.tracks = Tracks(tracks.landmark_ids[::-1].copy(), tracks.X, tracks.offsets,
+      tracks.view_ids, tracks.feat_ids, tracks.x)
+
+    result = sfm_data.subset([1, 3, 4], min_views=2)
+    remapped = sfm_data.subset([1, 3, 4], min_views=2, remap_ids=True)
+    self.assertEqual(list(remapped.intrinsics), [0, 1])
+    self.assertIs(remapped.intrinsics[0], remapped.views[2].intrinsics)
+    self.assertIs(remapped.intrinsics[1], remapped.views[0].intrinsics)
+    for key, extrin in remapped.extrinsics.items():
+      self.assertTrue(np.allclose(extrin.camera_frame,
+        sfm_data.extrinsics[sorted(result.extrinsics)[key]].camera_frame))
+    order = np.argsort(result.tracks.landmark_ids)
+    self.assertTrue(np.array_equal(remapped.tracks.landmark_ids[order],
+      np.arange(len(order))))
+
+  def test_subset_mixed_keys(self):
+    sfm_data = self.sfm_data
+    intrin = sfm_data.intrinsics[0]
+    sfm_data.views[4].intrinsics = copy.copy(intrin)
+    sfm_data.intrinsics = {'camera': intrin, 3: sfm_data.views[4].intrinsics}
+    remapped = sfm_data.subset([1, 4], remap_ids=True)
+    self.assertIs(remapped.intrinsics[0], remapped.views[1].intrinsics)
+    self.assertIs(remapped.intrinsics[1], remapped.views[0].intrinsics)
+    with self.assertRaises(KeyError) as context:
+      sfm_data.subset([1, 42])
+    self.assertEqual(context.exception.args, (42,))
+
+  def test_crop(self):
+    X = self.sfm_data.tracks.X
+    result = self.sfm_data.crop_box([-1.0, -1.0, -1.0], [1.0, 1.0, 1.0])
+    inside = np.all(np.abs(X) <= 1.0, axis=1) & (self.sfm_data.tracks.track_lengths() > 0)
+    self.assertTrue(np.array_equal(result.tracks.landmark_ids, self.sfm_data.tracks.landmark_ids[inside]))
+    self.assertEqual(sorted(result.views), sorted(np.unique(result.tracks.view_ids).tolist()))
+
+    # the same box as a polygon with a z range
+    square = [[-1.0, -1.0], [1.0, -1.0], [1.0, 1.0], [-1.0, 1.0]]
+    polygon = self.sfm_data.crop_polygon(square, z_range=(-1.0, 1.0))
+    self.assertTrue(np.array_equal(polygon.tracks.landmark_ids, result.tracks.landmark_ids))
+    # a triangle keeps the points below the diagonal
+    triangle = self.sfm_data.crop_polygon([[-5.0, -5.0], [5.0, -5.0], [5.0, 5.0]])
+    below = (X[:, 1] < X[:, 0]) & (self.sfm_data.tracks.track_lengths() > 0)
+    self.assertTrue(np.array_equal(triangle.tracks.landmark_ids, self.sfm_data.tracks.landmark_ids[below]))
+
+if __name__ == '__main__':
+  unittest.main()
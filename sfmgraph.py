@@ -0,0 +1,94 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+# positions of ids in sorted_ids, raises KeyError for an id that does not exist
+def _index_of(sorted_ids, ids):
+  ids = np.asarray(ids, dtype=np.int64)
+  index = np.searchsorted(sorted_ids, ids)
+  found = index < len(sorted_ids)
+  if len(sorted_ids):
+    found &= sorted_ids[np.where(found, index, 0)] == ids
+  if not np.all(found):
+    raise KeyError(int(ids[~found].flat[0]))
+  return index
+
+# CovisibilityGraph counts the landmarks shared by every pair of views
+# view_ids: [v] sorted view ids, rows and columns of matrix follow this order
+# matrix: [v, v] symmetric sparse shared landmark counts with an empty diagonal
+class CovisibilityGraph:
+  def __init__(self, view_ids, matrix):
+    self.view_ids = view_ids
+    self.matrix = matrix
+
+  # tracks: sfmdata.Tracks, view_ids: [v] sorted ids of all views
+  @classmethod
+  def from_tracks(cls, tracks, view_ids):
+    num_views = len(view_ids)
+    incidence = sparse.csr_matrix(
+      (np.ones(tracks.num_observations(), dtype=np.int32),
+      (tracks.landmark_index(), _index_of(view_ids, tracks.view_ids))),
+      shape=(tracks.num_landmarks(), num_views))
+    # a landmark seen twice in the same view counts once
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+    matrix = (incidence.T @ incidence).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return cls(view_ids, matrix)
+
+  def index_of(self, view_id):
+    return int(_index_of(self.view_ids, view_id))
+
+  def num_shared(self, view_a, view_b):
+    return int(self.matrix[self.index_of(view_a), self.index_of(view_b)])
+
+  # view ids sharing at least min_shared landmarks with view_id and the counts,
+  # sorted by decreasing count
+  def neighbours(self, view_id, min_shared=1):
+    i = self.index_of(view_id)
+    start, end = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+    indices = self.matrix.indices[start:end]
+    counts = self.matrix.data[start:end]
+    mask = counts >= min_shared
+    indices, counts = indices[mask], counts[mask]
+    order = np.lexsort((indices, -counts))
+    return self.view_ids[indices[order]], counts[order]
+
+  def top_k(self, view_id, k):
+    ids, counts = self.neighbours(view_id)
+    return ids[:k], counts[:k]
+
+  # top k neighbours of all views at once: ([v, k] ids, [v, k] counts), padded with -1 and 0
+  def top_k_all(self, k):
+    num_views = len(self.view_ids)
+    rows = np.repeat(np.arange(num_views), np.diff(self.matrix.indptr))
+    order = np.lexsort((self.matrix.indices, -self.matrix.data, rows))
+    rows = rows[order]
+    rank = np.arange(rows.shape[0]) - self.matrix.indptr[rows]
+    mask = rank < k
+    ids = np.full((num_views, k), -1, dtype=self.view_ids.dtype)
+    counts = np.zeros((num_views, k), dtype=self.matrix.dtype)
+    ids[rows[mask], rank[mask]] = self.view_ids[self.matrix.indices[order][mask]]
+    counts[rows[mask], rank[mask]] = self.matrix.data[order][mask]
+    return ids, counts
+
+  # view pairs (a < b) sharing at least min_shared landmarks: ([n] a ids, [n] b ids, [n] counts)
+  def pairs(self, min_shared=1):
+    upper = sparse.triu(self.matrix, k=1).tocoo()
+    mask = upper.data >= min_shared
+    return self.view_ids[upper.row[mask]], self.view_ids[upper.col[mask]], upper.data[mask]
+
+  # connected view clusters over pairs sharing at least min_shared landmarks,
+  # returns the clusters as arrays of view ids, largest first
+  def clusters(self, min_shared=1):
+    # the mask would be dense for min_shared <= 0
+    if min_shared < 1:
+      raise ValueError('min_shared must be at least 1, got {}'.format(min_shared))
+    graph = self.matrix.multiply(self.matrix >= min_shared).tocsr()
+    num_clusters, labels = csgraph.connected_components(graph, directed=False)
+    order = np.argsort(labels, kind='stable')
+    sizes = np.bincount(labels, minlength=num_clusters)
+    result = np.split(self.view_ids[order], np.cumsum(sizes)[:-1])
+    result.sort(key=len, reverse=True)
+    return result
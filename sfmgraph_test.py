@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from vcpy.sfmdata import Tracks
+from vcpy.sfmgraph import CovisibilityGraph
+
+class TestCovisibilityGraph(unittest.TestCase):
+  def test(self):
+    # views 10, 20, 30 are connected, 40 and 50 form another cluster, 60 sees nothing
+    tracks = Tracks(np.arange(5), np.zeros((5, 3)), np.array([0, 3, 5, 7, 9, 11]),
+      np.array([10, 20, 30, 10, 20, 20, 30, 40, 50, 10, 10]), np.zeros(11, dtype=np.int64),
+      np.zeros((11, 2)))
+    graph = CovisibilityGraph.from_tracks(tracks, np.array([10, 20, 30, 40, 50, 60]))
+    self.assertEqual(graph.num_shared(10, 20), 2)
+    self.assertEqual(graph.num_shared(20, 30), 2)
+    self.assertEqual(graph.num_shared(10, 30), 1)
+    self.assertEqual(graph.num_shared(10, 10), 0)
+    ids, counts = graph.neighbours(20)
+    self.assertEqual(ids.tolist(), [10, 30])
+    self.assertEqual(counts.tolist(), [2, 2])
+    self.assertEqual(graph.top_k(10, 1)[0].tolist(), [20])
+    ids, counts = graph.top_k_all(2)
+    self.assertEqual(ids.tolist(), [[20, 30], [10, 30], [20, 10], [50, -1], [40, -1], [-1, -1]])
+    self.assertEqual(counts[0].tolist(), [2, 1])
+    a, b, counts = graph.pairs(min_shared=2)
+    self.assertEqual(sorted(zip(a.tolist(), b.tolist())), [(10, 20), (20, 30)])
+    clusters = graph.clusters()
+    self.assertEqual([c.tolist() for c in clusters], [[10, 20, 30], [40, 50], [60]])
+    self.assertEqual(len(graph.clusters(min_shared=2)), 4)
+    with self.assertRaises(ValueError):
+      graph.clusters(min_shared=0)
+    with self.assertRaises(KeyError):
+      graph.num_shared(10, 15)
+
+  def test_unknown_view(self):
+    tracks = Tracks(np.arange(1), np.zeros((1, 3)), np.array([0, 2]), np.array([10, 15]),
+      np.zeros(2, dtype=np.int64), np.zeros((2, 2)))
+    for view_ids in ([10, 20], [10]):
+      with self.assertRaises(KeyError):
+        CovisibilityGraph.from_tracks(tracks, np.array(view_ids))
+
+if __name__ == '__main__':
+  unittest.main()
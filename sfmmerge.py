@@ -0,0 +1,149 @@
+import copy
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from vcpy.linearfitting import absolute_orientation
+from vcpy.quat import Quat
+from vcpy.sfmdata import SfMData, View, Extrinsic, Tracks
+
+# similarity transforms are (translation, Quat rotation, scale) as returned by
+# linearfitting.absolute_orientation, mapping p to scale * R p + translation
+IDENTITY_TRANSFORM = (np.zeros(3), Quat(), 1.0)
+
+def _view_key(view, match_views_by):
+  if match_views_by == 'id':
+    return view.id
+  elif match_views_by == 'filename':
+    return view.filename
+  raise RuntimeError('Unknown view matching {}'.format(match_views_by))
+
+def _rotation_matrix(transform):
+  return transform[1].to_mat()[:3, :3]
+
+def transform_points(transform, pts):
+  translation, _, scale = transform
+  return scale * pts @ _rotation_matrix(transform).T + translation
+
+def transform_camera_frame(transform, camera_frame):
+  result = camera_frame.copy()
+  result[:3, :3] = _rotation_matrix(transform) @ camera_frame[:3, :3]
+  result[:3, 3] = transform_points(transform, camera_frame[:3, 3])
+  return result
+
+# similarity transform taking src into the frame of dst, from the camera centers of the views
+# both contain, at least 3 shared posed views are needed
+def estimate_chunk_transform(src, dst, match_views_by='id'):
+  return _estimate_transform(src, {_view_key(view, match_views_by): view.pose.camera_frame[:3, 3]
+    for view in dst.views.values() if view.pose is not None}, match_views_by)
+
+# dst_centers: dict{view key: camera center}
+def _estimate_transform(src, dst_centers, match_views_by):
+  src_pts, dst_pts = [], []
+  for view in src.views.values():
+    key = _view_key(view, match_views_by)
+    if view.pose is not None and key in dst_centers:
+      src_pts.append(view.pose.camera_frame[:3, 3])
+      dst_pts.append(dst_centers[key])
+  if len(src_pts) < 3:
+    raise RuntimeError('Need 3 shared posed views, got {}'.format(len(src_pts)))
+  return absolute_orientation(np.array(src_pts), np.array(dst_pts))
+
+# merges SfMData chunks into a new SfMData in the frame of the first chunk
+# transforms: per chunk similarity into the merged frame, estimated from shared views when None
+# match_views_by: 'id' or 'filename', views with the same key are the same image and keep the
+# pose and intrinsics of the first chunk they appear in
+# views, intrinsics, extrinsics and landmarks are renumbered from 0; tracks sharing a
+# (view, feature) observation are unioned, their positions averaged
+def merge_sfm_data(chunks, transforms=None, match_views_by='id'):
+  result = SfMData()
+  result.root_path = chunks[0].root_path if chunks else ''
+  view_index = {}
+  centers = {}
+  intrinsics = {}
+  chunk_transforms = []
+  for i, chunk in enumerate(chunks):
+    if transforms is not None:
+      transform = transforms[i]
+    elif i == 0:
+      transform = IDENTITY_TRANSFORM
+    else:
+      transform = _estimate_transform(chunk, centers, match_views_by)
+    chunk_transforms.append(transform)
+    for view in chunk.views.values():
+      key = _view_key(view, match_views_by)
+      if key in view_index:
+        continue
+      v = View()
+      v.filename = view.filename
+      v.camera_name = view.camera_name
+      v.width = view.width
+      v.height = view.height
+      v.id = len(result.views)
+      v.tags = list(view.tags)
+      if view.intrinsics is not None:
+        params = view.intrinsics.params_key()
+        if params not in intrinsics:
+          intrin = copy.copy(view.intrinsics)
+          intrin.distortions = list(view.intrinsics.distortions)
+          intrinsics[params] = intrin
+          result.intrinsics[len(result.intrinsics)] = intrin
+        v.intrinsics = intrinsics[params]
+      if view.pose is not None:
+        v.pose = Extrinsic()
+        v.pose.camera_frame = transform_camera_frame(transform, view.pose.camera_frame)
+        result.extrinsics[len(result.extrinsics)] = v.pose
+        centers[key] = v.pose.camera_frame[:3, 3]
+      view_index[key] = v.id
+      result.views[v.id] = v
+  result.tracks = _union_tracks(chunks, chunk_transforms, view_index, match_views_by)
+  return result
+
+def _union_tracks(chunks, transforms, view_index, match_views_by):
+  X, view_ids, feat_ids, x, obs_landmark = [], [], [], [], []
+  num_landmarks = 0
+  for chunk, transform in zip(chunks, transforms):
+    tracks = chunk.tracks
+    chunk_view_ids = np.array(sorted(chunk.views), dtype=np.int64)
+    new_ids = np.array([view_index[_view_key(chunk.views[view_id], match_views_by)]
+      for view_id in chunk_view_ids.tolist()], dtype=np.int64)
+    X.append(transform_points(transform, tracks.X))
+    view_ids.append(new_ids[np.searchsorted(chunk_view_ids, tracks.view_ids)])
+    feat_ids.append(tracks.feat_ids)
+    x.append(tracks.x)
+    obs_landmark.append(tracks.landmark_index() + num_landmarks)
+    num_landmarks += tracks.num_landmarks()
+  X = np.concatenate(X + [np.zeros((0, 3))])
+  view_ids = np.concatenate(view_ids + [np.zeros(0, dtype=np.int64)])
+  feat_ids = np.concatenate(feat_ids + [np.zeros(0, dtype=np.int64)])
+  x = np.concatenate(x + [np.zeros((0, 2))])
+  obs_landmark = np.concatenate(obs_landmark + [np.zeros(0, dtype=np.int64)])
+
+  # landmarks and (view, feature) keys are the nodes of a bipartite graph, each observation
+  # an edge; the connected components are the merged tracks. Observations without a feature
+  # id (feat_id < 0, e.g. from the tag format) join nothing.
+  linked = feat_ids >= 0
+  keys, key_index = np.unique(np.column_stack((view_ids[linked], feat_ids[linked])), axis=0,
+    return_inverse=True)
+  num_nodes = num_landmarks + keys.shape[0]
+  graph = sparse.csr_matrix((np.ones(key_index.size, dtype=np.int8),
+    (obs_landmark[linked], key_index.ravel() + num_landmarks)), shape=(num_nodes, num_nodes))
+  _, labels = csgraph.connected_components(graph, directed=False)
+  # number the merged tracks in order of their first landmark
+  _, first, track = np.unique(labels[:num_landmarks], return_index=True, return_inverse=True)
+  rank = np.empty(first.shape[0], dtype=np.int64)
+  rank[np.argsort(first)] = np.arange(first.shape[0])
+  track = rank[track.ravel()]
+  num_tracks = first.shape[0]
+
+  counts = np.bincount(track, minlength=num_tracks)
+  merged_X = np.column_stack([np.bincount(track, weights=X[:, i], minlength=num_tracks)
+    for i in range(3)]) / np.maximum(counts, 1)[:, np.newaxis]
+
+  # one observation per merged track and view, the first chunk wins
+  obs_track = track[obs_landmark]
+  num_views = int(view_ids.max(initial=-1)) + 1
+  _, keep = np.unique(obs_track * num_views + view_ids, return_index=True)
+  lengths = np.bincount(obs_track[keep], minlength=num_tracks)
+  return Tracks(np.arange(num_tracks, dtype=np.int64), merged_X,
+    np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+    view_ids[keep], feat_ids[keep], x[keep])
@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+from vcpy.quat import Quat
+from vcpy.sfmdata import Tracks
+from vcpy.sfmmerge import merge_sfm_data, transform_points, transform_camera_frame
+from vcpy.sfmdata_test import make_scene
+
+class TestMerge(unittest.TestCase):
+  def test_merge_chunks(self):
+    sfm_data = make_scene(num_views=8, num_landmarks=100, seed=5)
+    transform = (np.array([1.0, -2.0, 0.5]), Quat.normalize(Quat(np.array([0.9, 0.1, -0.3, 0.2]))), 1.7)
+    # camera centers off a single line fix the rotation
+    for i, extrin in sfm_data.extrinsics.items():
+      extrin.camera_frame[1:3, 3] += [np.sin(i), np.cos(i)]
+    chunk_a = sfm_data.subset(range(0, 6))
+    chunk_b = sfm_data.subset(range(3, 8))
+    # move the second chunk into another frame
+    for extrin in chunk_b.extrinsics.values():
+      extrin.camera_frame = transform_camera_frame(transform, extrin.camera_frame)
+    tracks = chunk_b.tracks
+    tracks.X = transform_points(transform, tracks.X)
+
+    merged = merge_sfm_data([chunk_a, chunk_b])
+    self.assertEqual(len(merged.views), 8)
+    self.assertEqual(len(merged.intrinsics), 1)
+    for view in merged.views.values():
+      np.testing.assert_allclose(view.pose.camera_frame, sfm_data.views[view.id].pose.camera_frame,
+        atol=1e-9)
+    # tracks are unioned through the observations in the shared views 3 to 5, tracks seen
+    # in both chunks but not in a shared view stay split
+    expected_count = 0
+    for landmark in sfm_data.structure.values():
+      ids = {view.id for view in landmark.observations}
+      split = not ids & {3, 4, 5} and ids & {0, 1, 2} and ids & {6, 7}
+      expected_count += 2 if split else 1 if ids else 0
+    self.assertEqual(merged.tracks.num_landmarks(), expected_count)
+    expected = {landmark.id: (landmark.X, {view.id: ob for view, ob in landmark.observations.items()})
+      for landmark in sfm_data.structure.values()}
+    for landmark in merged.structure.values():
+      X, observations = expected[next(iter(landmark.observations.values())).id_feat]
+      np.testing.assert_allclose(landmark.X, X, atol=1e-9)
+      for view, ob in landmark.observations.items():
+        self.assertEqual(ob.id_feat, observations[view.id].id_feat)
+        np.testing.assert_allclose(ob.x, observations[view.id].x)
+      if set(v.id for v in landmark.observations) & {3, 4, 5}:
+        self.assertEqual(len(landmark.observations), len(observations))
+
+  def test_merge_without_feature_ids(self):
+    # the tag format has no feature ids, observations of different tracks must not be joined
+    sfm_data = make_scene(num_views=6, num_landmarks=50, seed=1)
+    tracks = sfm_data.tracks
+    sfm_data.tracks = Tracks(tracks.landmark_ids, tracks.X, tracks.offsets, tracks.view_ids,
+      np.full(tracks.feat_ids.shape, -1, dtype=np.int64), tracks.x)
+    num_landmarks = sfm_data.tracks.num_landmarks()
+    merged = merge_sfm_data([sfm_data])
+    self.assertEqual(merged.tracks.num_landmarks(), num_landmarks)
+    np.testing.assert_allclose(merged.tracks.X, sfm_data.tracks.X)
+    chunk_a = sfm_data.subset(range(0, 4))
+    chunk_b = sfm_data.subset(range(1, 6))
+    merged = merge_sfm_data([chunk_a, chunk_b])
+    self.assertEqual(merged.tracks.num_landmarks(),
+      chunk_a.tracks.num_landmarks() + chunk_b.tracks.num_landmarks())
+
+if __name__ == '__main__':
+  unittest.main()
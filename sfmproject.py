@@ -0,0 +1,114 @@
+from numba import jit, prange
+import numpy as np
+from vcpy.sfmdata import Intrinsics
+
+# fused world -> view -> distort -> pixel kernels, writing into preallocated outputs
+# distortion parameters are padded to 5 values in add_disto order
+
+_SUPPORTED_DISTORTIONS = (Intrinsics.NoDistortion, Intrinsics.DistortionRadial1,
+  Intrinsics.DistortionRadial3, Intrinsics.DistortionRadial3Brown2)
+# module level constants are frozen into the kernels
+_RADIAL1 = Intrinsics.DistortionRadial1
+_RADIAL3 = Intrinsics.DistortionRadial3
+_BROWN2 = Intrinsics.DistortionRadial3Brown2
+
+@jit(nopython=True, cache=True)
+def _distort(distortion_type, d, x, y):
+  if distortion_type == _RADIAL1:
+    r2 = x * x + y * y
+    coeff = 1.0 + d[0] * r2
+    return x * coeff, y * coeff
+  elif distortion_type == _RADIAL3:
+    r2 = x * x + y * y
+    coeff = 1.0 + r2 * (d[0] + r2 * (d[1] + r2 * d[2]))
+    return x * coeff, y * coeff
+  elif distortion_type == _BROWN2:
+    r2 = x * x + y * y
+    coeff = 1.0 + r2 * (d[0] + r2 * (d[1] + r2 * d[2]))
+    t_x = d[4] * (r2 + 2.0 * x * x) + 2.0 * d[3] * x * y
+    t_y = d[3] * (r2 + 2.0 * y * y) + 2.0 * d[4] * x * y
+    return x * coeff + t_x, y * coeff + t_y
+  return x, y
+
+@jit(nopython=True, cache=True)
+def _project_point(p, frame, params, distortion_type, distortions, out):
+  # world_2_view with the transposed camera frame rotation
+  dx = p[0] - frame[0, 3]
+  dy = p[1] - frame[1, 3]
+  dz = p[2] - frame[2, 3]
+  vx = frame[0, 0] * dx + frame[1, 0] * dy + frame[2, 0] * dz
+  vy = frame[0, 1] * dx + frame[1, 1] * dy + frame[2, 1] * dz
+  vz = frame[0, 2] * dx + frame[1, 2] * dy + frame[2, 2] * dz
+  x, y = _distort(distortion_type, distortions, vx / vz, vy / vz)
+  out[0] = params[0] * x + params[2]
+  out[1] = params[1] * y + params[3]
+
+@jit(nopython=True, parallel=True, cache=True)
+def _project_kernel(pts, frame, params, distortion_type, distortions, out):
+  for i in prange(pts.shape[0]):
+    _project_point(pts[i], frame, params, distortion_type, distortions, out[i])
+
+@jit(nopython=True, parallel=True, cache=True)
+def _project_views_kernel(pts, view_index, frames, params, distortion_types, distortions, out):
+  for i in prange(pts.shape[0]):
+    v = view_index[i]
+    if distortion_types[v] < 0:
+      out[i, 0] = np.nan
+      out[i, 1] = np.nan
+    else:
+      _project_point(pts[i], frames[v], params[v], distortion_types[v], distortions[v], out[i])
+
+# the distortion type is only checked when distorting, like Intrinsics.project
+def _distortion_params(intrinsics, distort):
+  result = np.zeros(5, dtype=np.float64)
+  if not distort:
+    return result
+  if intrinsics.distortion_type not in _SUPPORTED_DISTORTIONS:
+    raise RuntimeError('Distortion type {} unsupported'.format(intrinsics.distortion_type))
+  result[:len(intrinsics.distortions)] = intrinsics.distortions
+  return result
+
+def _output(out, n):
+  if out is None:
+    return np.empty((n, 2), dtype=np.float64)
+  if out.shape != (n, 2) or out.dtype != np.float64:
+    raise ValueError('out must be a float64 array of shape ({}, 2)'.format(n))
+  return out
+
+# pts: array of [n, 3] in world frame, returns [n, 2] pixels
+def project_points(intrinsics, camera_frame, pts, distort=True, out=None):
+  out = _output(out, pts.shape[0])
+  params = np.array([intrinsics.fx, intrinsics.fy, intrinsics.cx, intrinsics.cy], dtype=np.float64)
+  distortion_type = intrinsics.distortion_type if distort else Intrinsics.NoDistortion
+  _project_kernel(np.asarray(pts, dtype=np.float64), np.asarray(camera_frame, dtype=np.float64),
+    params, distortion_type, _distortion_params(intrinsics, distort), out)
+  return out
+
+# per view kernel parameters of a sfmdata.ViewArrays, views without pose or intrinsics get type -1
+def view_kernel_params(view_arrays, distort=True):
+  num_views = len(view_arrays.view_ids)
+  params = np.zeros((num_views, 4), dtype=np.float64)
+  distortion_types = np.full(num_views, -1, dtype=np.int64)
+  distortions = np.zeros((num_views, 5), dtype=np.float64)
+  for i, intrin in enumerate(view_arrays.intrinsics):
+    mask = (view_arrays.intrinsic_index == i) & view_arrays.has_pose
+    params[mask] = [intrin.fx, intrin.fy, intrin.cx, intrin.cy]
+    distortion_types[mask] = intrin.distortion_type if distort else Intrinsics.NoDistortion
+    distortions[mask] = _distortion_params(intrin, distort)
+  return params, distortion_types, distortions
+
+# pts: array of [n, 3] in world frame, view_index: [n] positions in view_arrays
+# returns [n, 2] pixels, nan for views without pose or intrinsics
+def project_points_views(view_arrays, pts, view_index, distort=True, out=None, kernel_params=None):
+  out = _output(out, pts.shape[0])
+  if kernel_params is None:
+    kernel_params = view_kernel_params(view_arrays, distort)
+  params, distortion_types, distortions = kernel_params
+  # the kernel does not bounds check
+  view_index = np.asarray(view_index, dtype=np.int64)
+  invalid = (view_index < 0) | (view_index >= len(view_arrays.view_ids))
+  if np.any(invalid):
+    raise IndexError('view index {} out of range'.format(view_index[invalid][0]))
+  _project_views_kernel(np.asarray(pts, dtype=np.float64), view_index,
+    view_arrays.camera_frames, params, distortion_types, distortions, out)
+  return out
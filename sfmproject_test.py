@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+from vcpy.quat import Quat
+from vcpy.sfmdata import Intrinsics, Extrinsic
+from vcpy.sfmproject import project_points, project_points_views
+from vcpy.sfmresidual import reprojection_errors
+from vcpy.sfmdata_test import make_intrinsics, make_scene
+
+class TestProjectPoints(unittest.TestCase):
+  cases = [
+    (Intrinsics.NoDistortion, []),
+    (Intrinsics.DistortionRadial1, [-0.1]),
+    (Intrinsics.DistortionRadial3, [-0.1, 0.02, -0.003]),
+    (Intrinsics.DistortionRadial3Brown2, [-0.1, 0.02, -0.003, 0.001, -0.002]),
+  ]
+
+  def setUp(self):
+    rng = np.random.default_rng(0)
+    self.pose = Extrinsic()
+    self.pose.camera_frame = Quat.normalize(Quat(np.array([0.95, 0.1, -0.2, 0.05]))).to_mat()
+    self.pose.camera_frame[:3, 3] = [0.3, -0.2, -4.0]
+    self.pts = self.pose.camera_frame[:3, :3] @ np.vstack((rng.uniform(-1.0, 1.0, (2, 50)),
+      rng.uniform(3.0, 5.0, 50))) + self.pose.camera_frame[:3, 3:]
+    self.pts = self.pts.T
+
+  def test_matches_intrinsics_project(self):
+    view_pts = self.pose.world_2_view(self.pts.T)
+    for distortion_type, distortions in self.cases:
+      intrin = make_intrinsics(distortion_type, distortions)
+      for distort in (True, False):
+        result = project_points(intrin, self.pose.camera_frame, self.pts, distort)
+        self.assertTrue(np.allclose(result, intrin.project(view_pts, distort).T))
+
+  def test_out(self):
+    intrin = make_intrinsics(*self.cases[2])
+    out = np.empty((self.pts.shape[0], 2))
+    result = project_points(intrin, self.pose.camera_frame, self.pts, out=out)
+    self.assertIs(result, out)
+    self.assertTrue(np.allclose(out, project_points(intrin, self.pose.camera_frame, self.pts)))
+    with self.assertRaises(ValueError):
+      project_points(intrin, self.pose.camera_frame, self.pts, out=np.empty((3, 2)))
+    with self.assertRaises(ValueError):
+      project_points(intrin, self.pose.camera_frame, self.pts,
+        out=np.empty((self.pts.shape[0], 2), dtype=np.float32))
+
+  def test_views_out_of_range(self):
+    sfm_data = make_scene(num_views=4)
+    view_arrays = sfm_data.view_arrays()
+    pts = sfm_data.tracks.X[:3]
+    for view_index in ([0, 1, 4], [0, -1, 2]):
+      with self.assertRaises(IndexError):
+        project_points_views(view_arrays, pts, np.array(view_index))
+    # an observation in an unknown view fails at the view lookup
+    sfm_data.tracks.view_ids[0] = 99
+    with self.assertRaises(KeyError):
+      reprojection_errors(sfm_data)
+
+  def test_unsupported_distortion(self):
+    intrin = make_intrinsics(Intrinsics.DistortionRadial1_PBA, [-0.1])
+    view_pts = self.pose.world_2_view(self.pts.T)
+    result = project_points(intrin, self.pose.camera_frame, self.pts, distort=False)
+    self.assertTrue(np.allclose(result, intrin.project(view_pts, False).T))
+    with self.assertRaises(RuntimeError):
+      project_points(intrin, self.pose.camera_frame, self.pts)
+
+if __name__ == '__main__':
+  unittest.main()
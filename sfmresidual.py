@@ -0,0 +1,101 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from vcpy.sfmbatch import process_pool_context
+from vcpy.sfmproject import project_points_views
+
+# count, rms, median and max of values per group
+# groups: [n] group index of each value in [0, num_groups)
+# empty groups get 0 count and nan stats
+def group_stats(groups, values, num_groups):
+  count = np.bincount(groups, minlength=num_groups)
+  rms = np.full(num_groups, np.nan)
+  median = np.full(num_groups, np.nan)
+  max_ = np.full(num_groups, np.nan)
+  nonempty = count > 0
+  if not np.any(nonempty):
+    return count, rms, median, max_
+
+  sum2 = np.bincount(groups, weights=values * values, minlength=num_groups)
+  rms[nonempty] = np.sqrt(sum2[nonempty] / count[nonempty])
+
+  order = np.lexsort((values, groups))
+  sorted_values = values[order]
+  ends = np.cumsum(count)
+  starts = ends - count
+  lo = starts + (count - 1) // 2
+  hi = starts + count // 2
+  median[nonempty] = 0.5 * (sorted_values[lo[nonempty]] + sorted_values[hi[nonempty]])
+  max_[nonempty] = sorted_values[ends[nonempty] - 1]
+  return count, rms, median, max_
+
+def _residual_chunk(args):
+  view_arrays, pts, view_index, x, distort = args
+  return x - project_points_views(view_arrays, pts, view_index, distort)
+
+# ReprojectionErrors stores the residual of every observation in SfMData.tracks
+# residuals: [k, 2] observed minus projected image coords, nan if the view has no pose or intrinsics
+# errors: [k] residual norms
+# valid: [k] whether the observation could be projected
+# landmark_index: [k] index into tracks.landmark_ids
+# view_index: [k] index into view_ids
+# view_* / landmark_*: per view and per landmark count, rms, median and max over valid observations
+class ReprojectionErrors:
+  def __init__(self, tracks, view_ids, view_index, residuals):
+    self.landmark_ids = tracks.landmark_ids
+    self.view_ids = view_ids
+    self.landmark_index = tracks.landmark_index()
+    self.view_index = view_index
+    self.residuals = residuals
+    self.errors = np.sqrt(np.sum(residuals * residuals, axis=1))
+    self.valid = ~np.isnan(self.errors)
+
+    errors = self.errors[self.valid]
+    self.view_count, self.view_rms, self.view_median, self.view_max = group_stats(
+      self.view_index[self.valid], errors, len(view_ids))
+    self.landmark_count, self.landmark_rms, self.landmark_median, self.landmark_max = group_stats(
+      self.landmark_index[self.valid], errors, len(self.landmark_ids))
+
+  def rms(self):
+    errors = self.errors[self.valid]
+    if errors.size == 0:
+      return np.nan
+    return np.sqrt(np.mean(errors * errors))
+
+  # [k] valid observations whose error exceeds threshold
+  def outliers(self, threshold):
+    return self.valid & (np.nan_to_num(self.errors) > threshold)
+
+  # [m] landmarks with at least min_outliers outlier observations
+  def landmark_outliers(self, threshold, min_outliers=1):
+    count = np.bincount(self.landmark_index[self.outliers(threshold)],
+      minlength=len(self.landmark_ids))
+    return count >= min_outliers
+
+  # [v] views with at least min_outliers outlier observations
+  def view_outliers(self, threshold, min_outliers=1):
+    count = np.bincount(self.view_index[self.outliers(threshold)], minlength=len(self.view_ids))
+    return count >= min_outliers
+
+# processes: run chunks of chunk_size observations in a process pool if > 1
+def reprojection_errors(sfm_data, distort=True, processes=None, chunk_size=1 << 20):
+  tracks = sfm_data.tracks
+  view_arrays = sfm_data.view_arrays()
+  view_index = view_arrays.index_of(tracks.view_ids)
+  landmark_index = tracks.landmark_index()
+
+  num_obs = tracks.num_observations()
+  chunks = ((view_arrays, tracks.X[landmark_index[start:start + chunk_size]],
+    view_index[start:start + chunk_size], tracks.x[start:start + chunk_size], distort)
+    for start in range(0, num_obs, chunk_size))
+
+  if processes is not None and processes > 1 and num_obs > chunk_size:
+    # the parent may already have run the parallel kernels, a forked copy of its numba
+    # threading layer hangs, so workers start from a forkserver (spawned where there is none)
+    with ProcessPoolExecutor(max_workers=processes,
+        mp_context=process_pool_context()) as executor:
+      results = list(executor.map(_residual_chunk, chunks))
+  else:
+    results = [_residual_chunk(chunk) for chunk in chunks]
+
+  residuals = np.concatenate(results) if results else np.zeros((0, 2), dtype=float)
+  return ReprojectionErrors(tracks, view_arrays.view_ids, view_index, residuals)
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from vcpy.sfmresidual import reprojection_errors
+from vcpy.sfmdata_test import make_scene
+
+class TestReprojectionErrors(unittest.TestCase):
+  def test_matches_per_observation_projection(self):
+    sfm_data = make_scene()
+    errors = reprojection_errors(sfm_data, chunk_size=37)
+    k = 0
+    for landmark in sfm_data.structure.values():
+      for view, ob in landmark.observations.items():
+        expected = ob.x - view.project(landmark.X[:, np.newaxis])[:, 0]
+        self.assertTrue(np.allclose(errors.residuals[k], expected))
+        k += 1
+    self.assertEqual(k, errors.errors.shape[0])
+    self.assertTrue(np.all(errors.valid))
+
+    view_errors = errors.errors[errors.view_index == 1]
+    self.assertEqual(errors.view_count[1], view_errors.size)
+    self.assertAlmostEqual(errors.view_median[1], np.median(view_errors))
+    self.assertAlmostEqual(errors.view_max[1], np.max(view_errors))
+    self.assertAlmostEqual(errors.view_rms[1], np.sqrt(np.mean(view_errors ** 2)))
+    self.assertTrue(np.array_equal(errors.outliers(1.0), errors.errors > 1.0))
+
+  def test_missing_pose(self):
+    sfm_data = make_scene()
+    sfm_data.views[2].pose = None
+    errors = reprojection_errors(sfm_data)
+    self.assertFalse(np.any(errors.valid[errors.view_index == 2]))
+    self.assertEqual(errors.view_count[2], 0)
+    self.assertTrue(np.isnan(errors.view_rms[2]))
+
+  def test_process_pool_after_serial_run(self):
+    sfm_data = make_scene(num_landmarks=200)
+    serial = reprojection_errors(sfm_data)
+    pooled = reprojection_errors(sfm_data, processes=2, chunk_size=100)
+    self.assertTrue(np.allclose(serial.residuals, pooled.residuals))
+
+if __name__ == '__main__':
+  unittest.main()
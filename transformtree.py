@@ -0,0 +1,140 @@
+import numpy as np
+from vcpy.quat import Quat, QuatArray
+from vcpy.rbt import Rbt, RbtArray
+
+# TransformTree keeps local Rbts of nodes in a hierarchy (e.g. world -> vehicle -> rig -> camera)
+# and caches their world transforms, world = world(parent) * local. Changing a local transform
+# marks only its subtree dirty, dirty world transforms are recomputed on query one tree level
+# at a time with RbtArray.
+# parent: [n] parent node, -1 for roots
+# depth: [n] number of ancestors
+# local_t, local_r: [n, 3], [n, 4] local translations and quaternions
+# world_t, world_r: [n, 3], [n, 4] cached world translations and quaternions
+# dirty: [n] world transform needs to be recomputed; a dirty node has only dirty descendants
+class TransformTree:
+  def __init__(self):
+    self.parent = np.zeros(0, dtype=np.int64)
+    self.depth = np.zeros(0, dtype=np.int64)
+    self.local_t = np.zeros((0, 3))
+    self.local_r = np.zeros((0, 4))
+    self.world_t = np.zeros((0, 3))
+    self.world_r = np.zeros((0, 4))
+    self.dirty = np.zeros(0, dtype=bool)
+    self.children = []
+    self.names = {}
+    self.size = 0
+
+  def __len__(self):
+    return self.size
+
+  # doubles the capacity of the node arrays when full
+  def _reserve(self, n):
+    capacity = self.parent.shape[0]
+    if n <= capacity:
+      return
+    capacity = max(n, 2 * capacity, 16)
+    for name in ('parent', 'depth', 'local_t', 'local_r', 'world_t', 'world_r', 'dirty'):
+      old = getattr(self, name)
+      new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+      new[:self.size] = old[:self.size]
+      setattr(self, name, new)
+
+  # returns the id of the new node, local is an Rbt (identity if None)
+  def add_node(self, local=None, parent=None, name=None):
+    if parent is not None:
+      parent = self.node_id(parent)
+    node = self.size
+    self._reserve(node + 1)
+    self.size += 1
+    self.parent[node] = -1 if parent is None else parent
+    self.depth[node] = 0 if parent is None else self.depth[parent] + 1
+    self.children.append([])
+    if parent is not None:
+      self.children[parent].append(node)
+    if name is not None:
+      self.names[name] = node
+    self._set_local(node, local if local is not None else Rbt(None, None))
+    self.dirty[node] = True
+    return node
+
+  # node ids or names to ids
+  def node_id(self, node):
+    return self.names[node] if isinstance(node, str) else int(node)
+
+  def _node_ids(self, nodes):
+    return np.array([self.node_id(node) for node in nodes], dtype=np.int64)
+
+  def _set_local(self, node, local):
+    self.local_t[node] = local.t
+    self.local_r[node] = local.r.v
+
+  def _invalidate(self, nodes):
+    stack = [node for node in nodes if not self.dirty[node]]
+    while stack:
+      node = stack.pop()
+      if not self.dirty[node]:
+        self.dirty[node] = True
+        stack.extend(self.children[node])
+
+  def local(self, node):
+    node = self.node_id(node)
+    return Rbt(self.local_t[node].copy(), Quat(self.local_r[node]))
+
+  def set_local(self, node, local):
+    node = self.node_id(node)
+    self._set_local(node, local)
+    self._invalidate([node])
+
+  # nodes: [n] ids or names, rbts: RbtArray of n local transforms
+  def set_locals(self, nodes, rbts):
+    nodes = self._node_ids(nodes)
+    self.local_t[nodes] = rbts.t
+    self.local_r[nodes] = rbts.r.v
+    self._invalidate(nodes.tolist())
+
+  # recomputes the dirty nodes among nodes and their ancestors, parents before children
+  def _update(self, nodes):
+    stack = [node for node in nodes.tolist() if self.dirty[node]]
+    pending = set()
+    while stack:
+      node = stack.pop()
+      if node in pending:
+        continue
+      pending.add(node)
+      parent = self.parent[node]
+      if parent >= 0 and self.dirty[parent]:
+        stack.append(int(parent))
+    if not pending:
+      return
+
+    pending = np.array(sorted(pending), dtype=np.int64)
+    depth = self.depth[pending]
+    for level in np.unique(depth):
+      level_nodes = pending[depth == level]
+      parents = self.parent[level_nodes]
+      world = RbtArray(self.local_t[level_nodes], self.local_r[level_nodes])
+      roots = parents < 0
+      if not np.all(roots):
+        children = level_nodes[~roots]
+        parent_world = RbtArray(self.world_t[parents[~roots]], self.world_r[parents[~roots]])
+        child_world = parent_world * RbtArray(self.local_t[children], self.local_r[children])
+        world.t[~roots] = child_world.t
+        world.r.v[~roots] = child_world.r.v
+      self.world_t[level_nodes] = world.t
+      self.world_r[level_nodes] = world.r.v
+      self.dirty[level_nodes] = False
+
+  def world(self, node):
+    node = self.node_id(node)
+    self._update(np.array([node]))
+    return Rbt(self.world_t[node].copy(), Quat(self.world_r[node]))
+
+  # nodes: [n] ids or names, returns an RbtArray of their world transforms
+  def world_rbts(self, nodes):
+    nodes = self._node_ids(nodes)
+    self._update(nodes)
+    return RbtArray(self.world_t[nodes], QuatArray(self.world_r[nodes]))
+
+  # nodes: [n] ids or names, returns [n, 4, 4] world matrices
+  def world_mats(self, nodes):
+    return self.world_rbts(nodes).to_mat()
@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+from vcpy.quat import Quat
+from vcpy.rbt import Rbt, RbtArray
+from vcpy.transformtree import TransformTree
+
+def random_rbt(rng):
+  return Rbt(rng.normal(size=3), Quat.normalize(Quat(rng.normal(size=4))))
+
+class TestTransformTree(unittest.TestCase):
+  def test(self):
+    rng = np.random.default_rng(0)
+    tree = TransformTree()
+    vehicles = [random_rbt(rng) for _ in range(2)]
+    rig = random_rbt(rng)
+    cameras = [random_rbt(rng) for _ in range(20)]
+    tree.add_node(name='world')
+    camera_nodes = []
+    for v, vehicle in enumerate(vehicles):
+      tree.add_node(vehicle, 'world', name='vehicle{}'.format(v))
+      tree.add_node(rig, 'vehicle{}'.format(v), name='rig{}'.format(v))
+      camera_nodes.append([tree.add_node(camera, 'rig{}'.format(v)) for camera in cameras])
+
+    def expected(v):
+      return [(vehicles[v] * rig * camera).to_mat() for camera in cameras]
+
+    self.assertTrue(np.allclose(tree.world_mats(camera_nodes[0]), expected(0)))
+    self.assertTrue(np.allclose(tree.world('rig1').to_mat(), (vehicles[1] * rig).to_mat()))
+    self.assertTrue(np.any(tree.dirty[camera_nodes[1]]))
+    tree.world_mats(camera_nodes[1])
+    self.assertFalse(np.any(tree.dirty[:len(tree)]))
+
+    # moving one vehicle only invalidates its own subtree
+    vehicles[0] = random_rbt(rng)
+    tree.set_local('vehicle0', vehicles[0])
+    self.assertTrue(np.all(tree.dirty[camera_nodes[0]]))
+    self.assertFalse(np.any(tree.dirty[camera_nodes[1]]))
+    self.assertTrue(np.allclose(tree.world_mats(camera_nodes[0] + camera_nodes[1]),
+      expected(0) + expected(1)))
+
+    cameras[:2] = [random_rbt(rng) for _ in range(2)]
+    tree.set_locals(camera_nodes[1][:2], RbtArray.from_rbts(cameras[:2]))
+    self.assertEqual(int(np.sum(tree.dirty[:len(tree)])), 2)
+    self.assertTrue(np.allclose(tree.world_mats(camera_nodes[1][:2]), expected(1)[:2]))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,107 @@
+import numpy as np
+from vcpy.sfmproject import project_points_views
+
+# TriangulationResult stores re-triangulated tracks, aligned with tracks.landmark_ids
+# X: [m, 3] triangulated points, nan where there are less than min_views usable observations
+# num_views: [m] usable observations per track
+# cheirality: [m] point is in front of every observing camera
+# reprojection_error: [m] max reprojection error in pixels over the observations
+# valid: [m] enough views, cheirality and reprojection_error within max_error
+class TriangulationResult:
+  def __init__(self, X, num_views, cheirality, reprojection_error, valid):
+    self.X = X
+    self.num_views = num_views
+    self.cheirality = cheirality
+    self.reprojection_error = reprojection_error
+    self.valid = valid
+
+# observation rays: ([k] usable mask, [k, 2] undistorted coords on the z = 1 plane)
+def _normalized_observations(view_arrays, view_index, x, undistort):
+  usable = view_arrays.valid[view_index]
+  result = np.full(x.shape, np.nan)
+  intrinsic_index = np.where(usable, view_arrays.intrinsic_index[view_index], -1)
+  for i, intrin in enumerate(view_arrays.intrinsics):
+    mask = intrinsic_index == i
+    if np.any(mask):
+      result[mask] = intrin.unproject(x[mask].T, undistort).T
+  return usable, result
+
+# rows of x * P3 - P1 and y * P3 - P2 with P = [R^T | -R^T c] for every observation
+def _dlt_rows(frames, xn):
+  rotation = np.transpose(frames[:, :3, :3], (0, 2, 1))
+  P = np.concatenate((rotation, -rotation @ frames[:, :3, 3:]), axis=2)
+  rows = np.empty((xn.shape[0], 2, 4))
+  rows[:, 0] = xn[:, :1] * P[:, 2] - P[:, 0]
+  rows[:, 1] = xn[:, 1:] * P[:, 2] - P[:, 1]
+  return rows
+
+def _triangulate_dlt(frames, xn, landmark_index, lengths):
+  X = np.full((lengths.shape[0], 3), np.nan)
+  rows = _dlt_rows(frames, xn)
+  obs_lengths = lengths[landmark_index]
+  # observations are ordered by track, so each group reshapes to [g, 2 * length, 4]
+  for length in np.unique(lengths[lengths >= 2]):
+    track_mask = lengths == length
+    A = rows[obs_lengths == length].reshape((-1, 2 * length, 4))
+    _, _, vh = np.linalg.svd(A)
+    h = vh[:, -1, :]
+    X[track_mask] = h[:, :3] / h[:, 3:]
+  return X
+
+def _triangulate_midpoint(frames, xn, landmark_index, lengths):
+  num_tracks = lengths.shape[0]
+  d = np.einsum('kij,kj->ki', frames[:, :3, :3], np.column_stack((xn, np.ones(xn.shape[0]))))
+  d /= np.linalg.norm(d, axis=1)[:, np.newaxis]
+  # minimize the squared distances to all rays: sum(I - d d^T) X = sum(I - d d^T) c
+  A = np.identity(3) - d[:, :, np.newaxis] * d[:, np.newaxis, :]
+  b = np.einsum('kij,kj->ki', A, frames[:, :3, 3])
+  A_sum = np.zeros((num_tracks, 3, 3))
+  b_sum = np.zeros((num_tracks, 3))
+  np.add.at(A_sum, landmark_index, A)
+  np.add.at(b_sum, landmark_index, b)
+  X = np.full((num_tracks, 3), np.nan)
+  # parallel rays leave A_sum singular
+  solvable = (lengths >= 2) & (np.abs(np.linalg.det(A_sum)) > 1e-12)
+  X[solvable] = np.linalg.solve(A_sum[solvable], b_sum[solvable][:, :, np.newaxis])[:, :, 0]
+  return X
+
+# re-triangulates every track of sfm_data from its observations, grouped by track length
+# so that each group is solved by one stacked numpy call
+# method: 'dlt' or 'midpoint'
+# max_error: reprojection error threshold in pixels for valid, None to skip the check
+def triangulate_tracks(sfm_data, method='dlt', min_views=2, max_error=None, undistort=True):
+  tracks = sfm_data.tracks
+  view_arrays = sfm_data.view_arrays()
+  view_index = view_arrays.index_of(tracks.view_ids)
+  landmark_index = tracks.landmark_index()
+  usable, xn = _normalized_observations(view_arrays, view_index, tracks.x, undistort)
+
+  landmark_index = landmark_index[usable]
+  view_index = view_index[usable]
+  xn = xn[usable]
+  frames = view_arrays.camera_frames[view_index]
+  lengths = np.bincount(landmark_index, minlength=tracks.num_landmarks())
+
+  if method == 'dlt':
+    X = _triangulate_dlt(frames, xn, landmark_index, lengths)
+  elif method == 'midpoint':
+    X = _triangulate_midpoint(frames, xn, landmark_index, lengths)
+  else:
+    raise RuntimeError('Unknown triangulation method {}'.format(method))
+  X[lengths < min_views] = np.nan
+
+  pts = X[landmark_index]
+  depth = np.einsum('ki,ki->k', frames[:, :3, 2], pts - frames[:, :3, 3])
+  behind = np.bincount(landmark_index, weights=~(depth > 0.0), minlength=tracks.num_landmarks())
+  cheirality = (behind == 0) & (lengths >= min_views)
+
+  projected = project_points_views(view_arrays, np.nan_to_num(pts), view_index, undistort)
+  errors = np.linalg.norm(tracks.x[usable] - projected, axis=1)
+  reprojection_error = np.zeros(tracks.num_landmarks())
+  np.maximum.at(reprojection_error, landmark_index, errors)
+  reprojection_error[lengths < min_views] = np.nan
+
+  valid = cheirality.copy()
+  if max_error is not None:
+    valid &= reprojection_error <= max_error
+  return TriangulationResult(X, lengths, cheirality, reprojection_error, valid)
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from vcpy.sfmdata import Tracks
+from vcpy.sfmproject import project_points_views
+from vcpy.triangulation import triangulate_tracks
+from vcpy.sfmdata_test import make_scene
+
+# replaces the observations of sfm_data by exact projections of X
+def set_exact_observations(sfm_data, X):
+  tracks = sfm_data.tracks
+  view_arrays = sfm_data.view_arrays()
+  x = project_points_views(view_arrays, X[tracks.landmark_index()],
+    view_arrays.index_of(tracks.view_ids))
+  sfm_data.tracks = Tracks(tracks.landmark_ids, X, tracks.offsets, tracks.view_ids,
+    tracks.feat_ids, x)
+
+class TestTriangulation(unittest.TestCase):
+  def test_recovers_noise_free_points(self):
+    sfm_data = make_scene(num_views=5, num_landmarks=200, seed=3)
+    X = sfm_data.tracks.X.copy()
+    set_exact_observations(sfm_data, X)
+    for method in ('dlt', 'midpoint'):
+      result = triangulate_tracks(sfm_data, method, max_error=1e-6)
+      mask = result.num_views >= 2
+      self.assertTrue(np.all(result.valid == mask))
+      np.testing.assert_allclose(result.X[mask], X[mask], atol=1e-8)
+      self.assertTrue(np.all(np.isnan(result.X[~mask])))
+
+  def test_cheirality(self):
+    sfm_data = make_scene(num_views=4, num_landmarks=50, seed=1)
+    X = sfm_data.tracks.X.copy()
+    # the cameras sit at z = -5 looking down +z, move some points behind them
+    behind = np.arange(50) % 5 == 0
+    X[behind, 2] -= 10.0
+    set_exact_observations(sfm_data, X)
+    result = triangulate_tracks(sfm_data, 'dlt')
+    mask = result.num_views >= 2
+    np.testing.assert_allclose(result.X[mask], X[mask], atol=1e-8)
+    self.assertTrue(np.all(result.cheirality[mask] == ~behind[mask]))
+    self.assertTrue(np.all(result.valid == result.cheirality))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,6 +1,7 @@
+from collections.abc import MutableSequence
 import bson
 import numpy as np
-from vcpy.m3d import gl_frustum
+from vcpy.m3d import gl_frustum, gl_frustums
 
 class ViewCamera:
   def __init__(self):
@@ -33,11 +34,182 @@ class ViewCamera:
     else:
       raise RuntimeError('can not calculate projection matrix')
 
+_ARRAY_TYPES = {'view_mats': '<f8', 'frustums': '<f8', 'znear': '<f8', 'zfar': '<f8',
+  'width': '<i8', 'height': '<i8'}
+
+def _optional_property(name, missing, convert):
+  def get(self):
+    value = getattr(self._cameras, name)[self._index]
+    return None if missing(value) else convert(value)
+  def set(self, value):
+    getattr(self._cameras, name)[self._index] = (np.nan if convert is float else -1) \
+      if value is None else value
+  return property(get, set)
+
+def _frustum_property(i):
+  def get(self):
+    return float(self._cameras.frustums[self._index, i])
+  def set(self, value):
+    self._cameras.frustums[self._index, i] = value
+  return property(get, set)
+
+# a ViewCamera that reads and writes camera index of a ViewCameras, view_mat is a view into
+# ViewCameras.view_mats
+class _ViewCameraRef(ViewCamera):
+  def __init__(self, cameras, index):
+    self._cameras = cameras
+    self._index = index
+
+  @property
+  def name(self):
+    return self._cameras.names[self._index]
+
+  @name.setter
+  def name(self, value):
+    self._cameras.names[self._index] = value
+
+  @property
+  def view_mat(self):
+    return self._cameras.view_mats[self._index]
+
+  @view_mat.setter
+  def view_mat(self, value):
+    self._cameras.view_mats[self._index] = value
+
+  left = _frustum_property(0)
+  right = _frustum_property(1)
+  bottom = _frustum_property(2)
+  top = _frustum_property(3)
+  znear = _optional_property('znear', np.isnan, float)
+  zfar = _optional_property('zfar', np.isnan, float)
+  width = _optional_property('width', lambda value: value < 0, int)
+  height = _optional_property('height', lambda value: value < 0, int)
+
+# list interface over the cameras of a ViewCameras, reads and writes go to its arrays
+class _ViewCameraList(MutableSequence):
+  def __init__(self, cameras):
+    self._cameras = cameras
+
+  def __len__(self):
+    return len(self._cameras)
+
+  def __getitem__(self, i):
+    if isinstance(i, slice):
+      return [self._cameras[j] for j in range(*i.indices(len(self)))]
+    return self._cameras[i]
+
+  def __setitem__(self, i, view):
+    self._cameras[i] = view
+
+  def __delitem__(self, i):
+    del self._cameras[i]
+
+  def insert(self, i, view):
+    self._cameras.insert(i, view)
+
+# ViewCameras keeps camera parameters in packed arrays:
+# names: [n] names, None for unnamed cameras
+# view_mats: [n, 4, 4] view matrices
+# frustums: [n, 4] left, right, bottom, top
+# znear, zfar: [n] nan if missing
+# width, height: [n] -1 if missing
+# cameras and indexing give ViewCameras that write through to the arrays
 class ViewCameras:
-  def __init__(self):
-    self.cameras = []
+  def __init__(self, n=0):
+    self.names = [None] * n
+    self.view_mats = np.tile(np.eye(4), (n, 1, 1))
+    self.frustums = np.zeros((n, 4))
+    self.znear = np.full(n, np.nan)
+    self.zfar = np.full(n, np.nan)
+    self.width = np.full(n, -1, dtype=np.int64)
+    self.height = np.full(n, -1, dtype=np.int64)
+
+  @staticmethod
+  def from_cameras(cameras):
+    result = ViewCameras(len(cameras))
+    for i, view in enumerate(cameras):
+      result[i] = view
+    return result
+
+  def __len__(self):
+    return len(self.names)
+
+  def _position(self, i):
+    i = int(i)
+    if i < -len(self) or i >= len(self):
+      raise IndexError('camera index {} out of range'.format(i))
+    return i % len(self)
+
+  def __getitem__(self, i):
+    return _ViewCameraRef(self, self._position(i))
+
+  def __setitem__(self, i, view):
+    i = self._position(i)
+    self.names[i] = view.name
+    self.view_mats[i] = view.view_mat
+    self.frustums[i] = (view.left, view.right, view.bottom, view.top)
+    self.znear[i] = np.nan if view.znear is None else view.znear
+    self.zfar[i] = np.nan if view.zfar is None else view.zfar
+    self.width[i] = -1 if view.width is None else view.width
+    self.height[i] = -1 if view.height is None else view.height
+
+  def __delitem__(self, i):
+    i = self._position(i)
+    del self.names[i]
+    for name in _ARRAY_TYPES:
+      setattr(self, name, np.delete(getattr(self, name), i, axis=0))
+
+  def __iter__(self):
+    return (self[i] for i in range(len(self)))
+
+  @property
+  def cameras(self):
+    return _ViewCameraList(self)
+
+  @cameras.setter
+  def cameras(self, cameras):
+    vars(self).update(vars(ViewCameras.from_cameras(list(cameras))))
+
+  # inserts before position i, like list.insert
+  def insert(self, i, view):
+    i = min(max(i + len(self) if i < 0 else i, 0), len(self))
+    other = ViewCameras.from_cameras([view])
+    self.names.insert(i, view.name)
+    for name in _ARRAY_TYPES:
+      setattr(self, name, np.insert(getattr(self, name), i, getattr(other, name)[0], axis=0))
+
+  def append(self, view):
+    self.extend([view])
+
+  def extend(self, views):
+    other = ViewCameras.from_cameras(list(views))
+    self.names = self.names + other.names
+    for name in _ARRAY_TYPES:
+      setattr(self, name, np.concatenate((getattr(self, name), getattr(other, name))))
+
+  # vectorized ViewCamera.projection_mat, returns [n, 4, 4]
+  def projection_mats(self, dmin=None, dmax=None):
+    left, right, bottom, top = self.frustums.T
+    if (dmin is not None) and (dmax is not None):
+      scale = dmin / np.where(np.isnan(self.znear), 1.0, self.znear)
+      return gl_frustums(left * scale, right * scale, bottom * scale, top * scale, dmin, dmax)
+    elif not (np.any(np.isnan(self.znear)) or np.any(np.isnan(self.zfar))):
+      return gl_frustums(left, right, bottom, top, self.znear, self.zfar)
+    else:
+      raise RuntimeError('can not calculate projection matrix')
+
+  # version 2 stores the camera arrays as packed little endian blobs, version 1 stays the
+  # default for existing readers
+  def dump(self, f, version=1):
+    if version == 2:
+      views_data = {name: np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes()
+        for name, dtype in _ARRAY_TYPES.items()}
+      views_data['names'] = self.names
+      f.write(bson.dumps({'format_version': 2, 'views': views_data}))
+      return
+    elif version != 1:
+      raise RuntimeError('Unsupported view camera format version {}'.format(version))
 
-  def dump(self, f):
     views_data = {}
     views_data['views'] = []
     for view in self.cameras:
@@ -61,27 +233,34 @@ class ViewCameras:
 
     f.write(bson.dumps(views_data))
 
+def __load_view_cameras_v2(views_data):
+  result = ViewCameras()
+  result.names = list(views_data['names'])
+  for name, dtype in _ARRAY_TYPES.items():
+    setattr(result, name, np.frombuffer(views_data[name], dtype=dtype).copy())
+  result.view_mats = result.view_mats.reshape((-1, 4, 4))
+  result.frustums = result.frustums.reshape((-1, 4))
+  return result
+
 def load_view_camera_data(file_fn):
   with open(file_fn, 'rb') as f:
     content = bson.loads(f.read())
-    result = ViewCameras()
-    for view_data in content['views']:
-      view_camera = ViewCamera()
-      if 'name' in view_data:
-        view_camera.name = view_data['name']
-      view_camera.view_mat = np.array(view_data['view_mat']).reshape((4, 4))
-      view_camera.left = view_data['left']
-      view_camera.right = view_data['right']
-      view_camera.bottom = view_data['bottom']
-      view_camera.top = view_data['top']
-      if 'znear' in view_data:
-        view_camera.znear = view_data['znear']
-      if 'zfar' in view_data:
-        view_camera.zfar = view_data['zfar']
-      if 'width' in view_data:
-        view_camera.width = view_data['width']
-      if 'height' in view_data:
-        view_camera.height = view_data['height']
-      result.cameras.append(view_camera)
+
+  version = content.get('format_version', 1)
+  if version == 2:
+    return __load_view_cameras_v2(content['views'])
+  elif version != 1:
+    raise RuntimeError('Unsupported view camera format version {}'.format(version))
+
+  views = content['views']
+  result = ViewCameras(len(views))
+  for i, view_data in enumerate(views):
+    result.names[i] = view_data.get('name')
+    result.view_mats[i] = np.array(view_data['view_mat']).reshape((4, 4))
+    result.frustums[i] = (view_data['left'], view_data['right'], view_data['bottom'], view_data['top'])
+    result.znear[i] = view_data.get('znear', np.nan)
+    result.zfar[i] = view_data.get('zfar', np.nan)
+    result.width[i] = view_data.get('width', -1)
+    result.height[i] = view_data.get('height', -1)
 
   return result
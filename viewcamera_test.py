@@ -0,0 +1,81 @@
+import unittest, tempfile
+from pathlib import Path
+import bson
+import numpy as np
+from vcpy.viewcamera import ViewCamera, ViewCameras, load_view_camera_data
+
+def make_view_camera(i, with_depth=True):
+  view = ViewCamera()
+  view.name = 'view_{}'.format(i) if i % 2 == 0 else None
+  view.view_mat = np.arange(16, dtype=float).reshape((4, 4)) + i
+  view.left, view.right, view.bottom, view.top = -0.5 - i, 0.5, -0.4, 0.3 + i
+  if with_depth:
+    view.znear = 0.5 + i
+    view.zfar = 100.0
+  view.width = 640 + i
+  view.height = 480
+  return view
+
+class TestViewCameras(unittest.TestCase):
+  def assert_same_cameras(self, a, b):
+    self.assertEqual(len(a), len(b))
+    for view, other in zip(a, b):
+      for key in vars(ViewCamera()):
+        if key == 'view_mat':
+          self.assertTrue(np.array_equal(view.view_mat, other.view_mat))
+        else:
+          self.assertEqual(getattr(view, key), getattr(other, key))
+
+  def test_dump_load(self):
+    views = [make_view_camera(i, i != 2) for i in range(4)]
+    cameras = ViewCameras.from_cameras(views[:3])
+    cameras.append(views[3])
+    with tempfile.TemporaryDirectory() as tmp:
+      for version in (1, 2):
+        path = Path(tmp) / 'cameras_{}.bson'.format(version)
+        with path.open('wb') as f:
+          cameras.dump(f, version)
+        loaded = load_view_camera_data(path)
+        self.assert_same_cameras(loaded.cameras, views)
+
+  def test_unknown_format_version(self):
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'cameras.bson'
+      path.write_bytes(bson.dumps({'format_version': 3, 'views': []}))
+      with self.assertRaises(RuntimeError):
+        load_view_camera_data(path)
+
+  def test_mutate_cameras(self):
+    views = [make_view_camera(i) for i in range(3)]
+    cameras = ViewCameras.from_cameras(views[:2])
+    cameras.cameras.append(views[2])
+    del cameras.cameras[0]
+    cameras.cameras.insert(0, views[0])
+    cameras.cameras[0].view_mat = np.eye(4)
+    cameras.cameras[1].view_mat[:3, 3] = [1.0, 2.0, 3.0]
+    cameras[2].znear = None
+    cameras[2].name = 'last'
+    views[0].view_mat = np.eye(4)
+    views[1].view_mat[:3, 3] = [1.0, 2.0, 3.0]
+    views[2].znear = None
+    views[2].name = 'last'
+    self.assert_same_cameras(cameras.cameras, views)
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / 'cameras.bson'
+      with path.open('wb') as f:
+        cameras.dump(f)
+      self.assert_same_cameras(load_view_camera_data(path).cameras, views)
+
+  def test_projection_mats(self):
+    views = [make_view_camera(i) for i in range(3)]
+    cameras = ViewCameras.from_cameras(views)
+    mats = cameras.projection_mats()
+    self.assertTrue(np.allclose(mats, [view.projection_mat() for view in views]))
+    mats = cameras.projection_mats(0.1, 10.0)
+    self.assertTrue(np.allclose(mats, [view.projection_mat(0.1, 10.0) for view in views]))
+    cameras.append(make_view_camera(3, False))
+    with self.assertRaises(RuntimeError):
+      cameras.projection_mats()
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,95 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+# ViewIndex answers "which views see these points / this box" and "which views are near
+# this location" with a KD-tree over camera centers followed by vectorized frustum plane
+# tests on the candidates only.
+# view_ids: [v] ids of the indexed views, views without pose or intrinsics are left out
+# centers: [v, 3] camera centers
+# planes: [v, 6, 4] inward world frame frustum planes (n, d), inside when n . p + d >= 0
+class ViewIndex:
+  def __init__(self, sfm_data, z_near, z_far):
+    views = [view for _, view in sorted(sfm_data.views.items())
+      if view.pose is not None and view.intrinsics is not None]
+    self.view_ids = np.array([view.id for view in views], dtype=np.int64)
+    self.z_near = z_near
+    self.z_far = z_far
+    num_views = len(views)
+    frames = np.array([view.pose.camera_frame for view in views], dtype=float).reshape((-1, 4, 4))
+    self.centers = frames[:, :3, 3].copy()
+
+    # frustum_vec is in GL convention (y up, looking down -z), the sfm camera frame
+    # has y down and looks down +z
+    frustums = np.array([view.intrinsics.frustum_vec(z_near, z_far) for view in views],
+      dtype=float).reshape((-1, 6))
+    left, right, bottom, top = (frustums[:, i] / z_near for i in range(4))
+    camera_planes = np.zeros((num_views, 6, 4))
+    camera_planes[:, 0, [0, 2]] = np.column_stack((np.ones(num_views), -left))
+    camera_planes[:, 1, [0, 2]] = np.column_stack((-np.ones(num_views), right))
+    camera_planes[:, 2, [1, 2]] = np.column_stack((np.ones(num_views), top))
+    camera_planes[:, 3, [1, 2]] = np.column_stack((-np.ones(num_views), -bottom))
+    camera_planes[:, 4, 2] = 1.0
+    camera_planes[:, 4, 3] = -z_near
+    camera_planes[:, 5, 2] = -1.0
+    camera_planes[:, 5, 3] = z_far
+
+    self.planes = np.zeros_like(camera_planes)
+    self.planes[:, :, :3] = np.einsum('vij,vpj->vpi', frames[:, :3, :3], camera_planes[:, :, :3])
+    self.planes[:, :, 3] = camera_planes[:, :, 3] - np.einsum('vpi,vi->vp', self.planes[:, :, :3],
+      self.centers)
+
+    # distance from the center to the farthest frustum corner bounds the KD-tree search
+    half_width = np.maximum(np.abs(left), np.abs(right))
+    half_height = np.maximum(np.abs(bottom), np.abs(top))
+    reach = z_far * np.sqrt(1.0 + half_width ** 2 + half_height ** 2)
+    self.max_reach = float(np.max(reach)) if num_views else 0.0
+    self.tree = cKDTree(self.centers)
+
+  # flattens ragged KD-tree results into ([n] query index, [n] view index)
+  @staticmethod
+  def _flatten(neighbours):
+    lengths = np.fromiter((len(n) for n in neighbours), dtype=np.int64, count=len(neighbours))
+    query_index = np.repeat(np.arange(len(neighbours)), lengths)
+    if query_index.size == 0:
+      return query_index, np.zeros(0, dtype=np.int64)
+    return query_index, np.concatenate([np.asarray(n, dtype=np.int64) for n in neighbours])
+
+  # pts: [n, 3], returns ([k] point index, [k] view ids) of views within radius of each point
+  def views_near(self, pts, radius):
+    pts = np.atleast_2d(pts)
+    point_index, view_index = self._flatten(self.tree.query_ball_point(pts, radius))
+    return point_index, self.view_ids[view_index]
+
+  # pts: [n, 3], returns ([n, k] view ids, [n, k] distances) of the k nearest cameras, the
+  # last dimension is dropped for k=1; view id -1 and distance inf when there are fewer
+  # than k views
+  def nearest_views(self, pts, k=1):
+    distances, view_index = self.tree.query(np.atleast_2d(pts), k=k)
+    num_views = len(self.view_ids)
+    missing = (view_index >= num_views) | ~np.isfinite(distances)
+    view_ids = np.append(self.view_ids, -1)[np.where(missing, num_views, view_index)]
+    return view_ids, np.where(missing, np.inf, distances)
+
+  # pts: [n, 3], returns ([k] point index, [k] view ids) of the views whose frustum contains
+  # each point, ordered by point
+  def views_containing(self, pts):
+    pts = np.atleast_2d(pts)
+    point_index, view_index = self._flatten(self.tree.query_ball_point(pts, self.max_reach))
+    planes = self.planes[view_index]
+    dist = np.einsum('kpi,ki->kp', planes[:, :, :3], pts[point_index]) + planes[:, :, 3]
+    mask = np.all(dist >= 0.0, axis=1)
+    return point_index[mask], self.view_ids[view_index[mask]]
+
+  # views whose frustum may intersect the axis aligned box [box_min, box_max]; conservative,
+  # a box outside of any single frustum plane is culled
+  def views_intersecting_box(self, box_min, box_max):
+    box_min = np.asarray(box_min, dtype=float)
+    box_max = np.asarray(box_max, dtype=float)
+    center = 0.5 * (box_min + box_max)
+    radius = self.max_reach + 0.5 * np.linalg.norm(box_max - box_min)
+    view_index = np.array(self.tree.query_ball_point(center, radius), dtype=np.int64)
+    planes = self.planes[view_index]
+    # the box corner farthest along each plane normal
+    corners = np.where(planes[:, :, :3] >= 0.0, box_max, box_min)
+    dist = np.sum(planes[:, :, :3] * corners, axis=2) + planes[:, :, 3]
+    return np.sort(self.view_ids[view_index[np.all(dist >= 0.0, axis=1)]])
@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+from vcpy.quat import Quat
+from vcpy.sfmdata import SfMData, View, Intrinsics, Extrinsic
+from vcpy.viewindex import ViewIndex
+
+def make_views(num_views, rng):
+  sfm_data = SfMData()
+  intrin = Intrinsics()
+  intrin.width, intrin.height = 64, 48
+  intrin.fx, intrin.fy, intrin.cx, intrin.cy = 40.0, 42.0, 30.0, 20.0
+  for i in range(num_views):
+    view = View()
+    view.id = i
+    view.intrinsics = intrin
+    view.pose = Extrinsic()
+    view.pose.camera_frame = Quat.normalize(Quat(rng.normal(size=4))).to_mat()
+    view.pose.camera_frame[:3, 3] = rng.uniform(-5.0, 5.0, 3)
+    sfm_data.views[i] = view
+  sfm_data.views[num_views] = View()
+  return sfm_data, intrin
+
+class TestViewIndex(unittest.TestCase):
+  def test_views_containing(self):
+    rng = np.random.default_rng(0)
+    sfm_data, intrin = make_views(30, rng)
+
+    index = ViewIndex(sfm_data, 0.1, 6.0)
+    pts = rng.uniform(-6.0, 6.0, (500, 3))
+    point_index, view_ids = index.views_containing(pts)
+
+    expected = set()
+    for view_id, view in sfm_data.views.items():
+      if view.pose is None:
+        continue
+      view_pts = view.pose.world_2_view(pts.T)
+      px = intrin.project(view_pts, False)
+      mask = (view_pts[2] > 0.1) & (view_pts[2] < 6.0) & (px[0] >= -0.5) & (px[1] >= -0.5) & \
+        (px[0] <= intrin.width - 0.5) & (px[1] <= intrin.height - 0.5)
+      expected |= {(i, view_id) for i in np.flatnonzero(mask)}
+    self.assertEqual(set(zip(point_index.tolist(), view_ids.tolist())), expected)
+
+    inside = {view_id for i, view_id in expected if np.all(np.abs(pts[i]) <= 1.0)}
+    self.assertTrue(inside <= set(index.views_intersecting_box([-1.0] * 3, [1.0] * 3).tolist()))
+
+  def test_nearest_views(self):
+    rng = np.random.default_rng(1)
+    sfm_data, _ = make_views(3, rng)
+    index = ViewIndex(sfm_data, 0.1, 6.0)
+    pts = rng.uniform(-6.0, 6.0, (10, 3))
+    view_ids, distances = index.nearest_views(pts, k=5)
+    self.assertEqual(view_ids.shape, (10, 5))
+    self.assertTrue(np.all(view_ids[:, 3:] == -1))
+    self.assertTrue(np.all(np.isinf(distances[:, 3:])))
+    for i in range(3):
+      expected = np.linalg.norm(pts - sfm_data.views[i].pose.camera_frame[:3, 3], axis=1)
+      self.assertTrue(np.allclose(distances[:, :3][view_ids[:, :3] == i], expected))
+
+    index = ViewIndex(make_views(0, rng)[0], 0.1, 6.0)
+    view_ids, distances = index.nearest_views(pts)
+    self.assertTrue(np.all(view_ids == -1) and np.all(np.isinf(distances)))
+    self.assertEqual(index.views_containing(pts)[0].size, 0)
+    self.assertEqual(index.views_intersecting_box([-1.0] * 3, [1.0] * 3).size, 0)
+
+if __name__ == '__main__':
+  unittest.main()